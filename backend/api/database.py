@@ -1,24 +1,89 @@
-from typing import AsyncGenerator
+import asyncio
+import functools
+import weakref
+from typing import Any, AsyncGenerator, Callable, Optional
+from uuid import uuid4
 
-import redis
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+import redis.asyncio
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .settings import settings
+from .utils.metrics import instrument_engine, instrument_pool
+from .utils.query_counter import count_queries
+from .utils.tracing import trace_engine
 
-async_engine = create_async_engine(
-    settings.db_uri, echo=False, future=True, poolclass=NullPool
-)
+# Bound to get_engine() or get_replica_engine() when a session is opened
+async_session = async_sessionmaker(class_=AsyncSession, expire_on_commit=False)
+
+
+@functools.cache
+def get_engine() -> AsyncEngine:
+    """Primary engine, created on first use"""
+    return create_engine(settings.db_uri, "primary")
+
+
+@functools.cache
+def get_replica_engine() -> Optional[AsyncEngine]:
+    if not settings.db_replica_uri:
+        return None
+    return create_engine(
+        settings.db_replica_uri,
+        "replica",
+        execution_options={"postgresql_readonly": True},
+    )
+
+
+def create_engine(url: str, name: str, **kwargs: Any) -> AsyncEngine:
+    engine = create_async_engine(
+        url, echo=False, future=True, **get_pool_options(), **kwargs
+    )
+    instrument_engine(engine.sync_engine, name)
+    instrument_pool(engine.sync_engine, name)
+    trace_engine(engine.sync_engine)
+    count_queries(engine.sync_engine)
+    return engine
+
+
+def get_pool_options() -> dict[str, Any]:
+    if settings.db_pgbouncer:
+        # pgbouncer hands every transaction a different server connection, where
+        # statements prepared by another one don't exist
+        return {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": get_prepared_statement_name,
+            },
+        }
+    return {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {
+            "prepared_statement_cache_size": settings.db_statement_cache_size
+        },
+    }
+
+
+def get_prepared_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
+def get_session_maker() -> Callable[[], AsyncSession]:
+    """Dependency of routes using a session after they return, such as in the
+    body of a StreamingResponse, where the get_async_session one may be closed"""
+    return functools.partial(async_session, bind=get_engine())
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     try:
-        async_session = sessionmaker(  # type: ignore
-            bind=async_engine, class_=AsyncSession, expire_on_commit=False
-        )
-        async with async_session() as session:
+        async with async_session(bind=get_engine()) as session:
             yield session
     except Exception:
         await session.rollback()
@@ -27,7 +92,45 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         await session.close()
 
 
-def get_cache() -> redis.Redis:
-    return redis.Redis(
-        host="redis", decode_responses=True, password=settings.redis_pass
-    )
+async def get_async_replica_session() -> (AsyncGenerator[Optional[AsyncSession], None]):
+    replica_engine = get_replica_engine()
+    if replica_engine is None:
+        yield None
+        return
+    async with async_session(bind=replica_engine) as session:
+        yield session
+
+
+# Connections belong to the event loop that opened them, so every loop gets a
+# pool: the API and Celery worker processes each run a single loop
+_async_caches: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, redis.asyncio.Redis
+] = weakref.WeakKeyDictionary()
+
+
+def get_async_cache() -> redis.asyncio.Redis:
+    """Client of the running event loop's connection pool, created on first use"""
+    loop = asyncio.get_running_loop()
+    if (cache := _async_caches.get(loop)) is None:
+        cache = _async_caches[loop] = redis.asyncio.Redis(
+            host="redis", decode_responses=True, password=settings.redis_pass
+        )
+    return cache
+
+
+async def close_async_cache() -> None:
+    """Disconnects the running event loop's pool, before the loop is closed"""
+    if (cache := _async_caches.pop(asyncio.get_running_loop(), None)) is not None:
+        await cache.aclose()
+
+
+async def close_connections() -> None:
+    """Closes the connections opened on the running event loop, before the loop
+    is closed"""
+    await close_async_cache()
+    # Without creating engines that were never used
+    if get_engine.cache_info().currsize:
+        await get_engine().dispose()
+    if get_replica_engine.cache_info().currsize:
+        if (replica_engine := get_replica_engine()) is not None:
+            await replica_engine.dispose()
@@ -0,0 +1,55 @@
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.database import get_async_session, get_session_maker
+from api.models.user import User
+from api.permissions import get_current_user
+from api.utils.export import (
+    get_export_query,
+    stream_csv,
+    stream_export_rows,
+    stream_parquet,
+)
+from api.utils.search import get_search_by_id
+
+router = APIRouter()
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+@router.get("/searches/{search_id}")
+async def export_search(
+    search_id: int,
+    format: ExportFormat = ExportFormat.CSV,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_async_session),
+    session_maker: Callable[[], AsyncSession] = Depends(get_session_maker),
+    user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    if not await get_search_by_id(session, search_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Search with provided id doesn't exist",
+        )
+    # Rows are read while the response is sent, after the request session closed
+    rows = stream_export_rows(
+        session_maker, get_export_query(search_id, date_from, date_to)
+    )
+    filename = f"search_{search_id}.{format.value}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == ExportFormat.PARQUET:
+        return StreamingResponse(
+            stream_parquet(rows),
+            media_type="application/vnd.apache.parquet",
+            headers=headers,
+        )
+    return StreamingResponse(stream_csv(rows), media_type="text/csv", headers=headers)
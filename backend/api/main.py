@@ -1,28 +1,39 @@
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.requests import HTTPConnection
 from sqlmodel.ext.asyncio.session import AsyncSession
-from strawberry.fastapi import GraphQLRouter
 from strawberry.schema import BaseSchema
 
-from api.database import get_async_session
+from api.database import close_connections, get_async_replica_session, get_async_session
+from api.export import router as export_router
+from api.metrics import router as metrics_router
 from api.schema import schema
-from api.settings import settings
+from api.settings import settings, setup_logging
 from api.utils.celery_utils import create_celery
+from api.utils.persisted_queries import PersistedQueryRouter
+from api.utils.replica import get_read_session
+from api.utils.tracing import setup_tracing
 
 
 async def get_context(
+    request: HTTPConnection,
     session: AsyncSession = Depends(get_async_session),
+    replica_session: Optional[AsyncSession] = Depends(get_async_replica_session),
 ) -> dict[str, Any]:
     return {
         "session": session,
+        # Query resolvers read through it, mutations and tasks use the primary
+        "read_session": await get_read_session(request, session, replica_session),
     }
 
 
 def create_app() -> FastAPI:
+    setup_logging()
+    setup_tracing()
     graphiql = settings.debug
-    graphql_app: GraphQLRouter[BaseSchema, None] = GraphQLRouter(
+    graphql_app: PersistedQueryRouter[BaseSchema, None] = PersistedQueryRouter(
         schema=schema, graphiql=graphiql, context_getter=get_context  # type: ignore
     )
     app = FastAPI(debug=settings.debug)
@@ -34,8 +45,11 @@ def create_app() -> FastAPI:
             f"https://{settings.traefik_host}",
         ],
         allow_credentials=True,
-        allow_methods=["POST"],
+        allow_methods=["GET", "POST"],
         allow_headers=["*"],
     )
     app.include_router(graphql_app, prefix="/graphql")
+    app.include_router(export_router, prefix="/export")
+    app.include_router(metrics_router, prefix="/metrics")
+    app.add_event_handler("shutdown", close_connections)
     return app
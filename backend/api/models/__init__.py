@@ -1,8 +1,23 @@
 from .category import Category
 from .estate import Estate
+from .estate_fingerprint import EstateFingerprint, EstateLshBucket
 from .price import Price
+from .price_change import PriceChange
 from .search import Search
 from .search_event import SearchEvent
+from .search_status import SearchStatus
 from .user import SearchUser, User
 
-__all__ = ["Category", "Estate", "Price", "Search", "SearchEvent", "SearchUser", "User"]
+__all__ = [
+    "Category",
+    "Estate",
+    "EstateFingerprint",
+    "EstateLshBucket",
+    "Price",
+    "PriceChange",
+    "Search",
+    "SearchEvent",
+    "SearchStatus",
+    "SearchUser",
+    "User",
+]
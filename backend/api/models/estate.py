@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import BigInteger, Column
+from sqlalchemy import BigInteger, Column, Computed, ForeignKey, Index, Text
 from sqlmodel import Field, Relationship, SQLModel
 
 from .search_event import SearchEvent, SearchEventEstate
@@ -10,7 +10,23 @@ if TYPE_CHECKING:
     from . import Price
 
 
+# Everything searchEstates matches against, kept in sync by the database
+SEARCH_TEXT_EXPRESSION = (
+    "coalesce(title, '') || ' ' || coalesce(location, '') || ' ' "
+    "|| coalesce(street, '') || ' ' || coalesce(city, '')"
+)
+
+
 class Estate(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_estate_search_text",
+            "search_text",
+            postgresql_using="gist",
+            postgresql_ops={"search_text": "gist_trgm_ops"},
+        ),
+    )
+
     id: int = Field(
         default=None,
         sa_column=Column(BigInteger(), primary_key=True, autoincrement=False),
@@ -22,6 +38,19 @@ class Estate(SQLModel, table=True):
     location: Optional[str] = Field(default=None)
     date_created: Optional[datetime] = Field(default=None)
     url: str
+    # GiST indexed as a point in postgres
+    latitude: Optional[float] = Field(default=None)
+    longitude: Optional[float] = Field(default=None)
+    # Most recent observed price, kept up to date by parse_scan_data
+    last_price: Optional[int] = Field(default=None)
+    # Earliest listing this one is a near duplicate of, see link_duplicate_estates
+    duplicate_of_id: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger(), ForeignKey("estate.id"))
+    )
+    search_text: Optional[str] = Field(
+        default=None,
+        sa_column=Column(Text(), Computed(SEARCH_TEXT_EXPRESSION, persisted=True)),
+    )
     search_events: List[SearchEvent] = Relationship(
         back_populates="estates", link_model=SearchEventEstate
     )
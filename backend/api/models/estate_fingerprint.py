@@ -0,0 +1,24 @@
+from typing import List
+
+from sqlalchemy import JSON, BigInteger, Column, ForeignKey
+from sqlmodel import Field, SQLModel
+
+
+class EstateFingerprint(SQLModel, table=True):
+    """MinHash signature of an estate's title, location and area"""
+
+    estate_id: int = Field(
+        sa_column=Column(BigInteger(), ForeignKey("estate.id"), primary_key=True)
+    )
+    signature: List[int] = Field(sa_column=Column(JSON, nullable=False))
+
+
+class EstateLshBucket(SQLModel, table=True):
+    """LSH band of a signature, estates sharing a bucket are duplicate candidates"""
+
+    bucket: int = Field(
+        sa_column=Column(BigInteger(), primary_key=True, autoincrement=False)
+    )
+    estate_id: int = Field(
+        sa_column=Column(BigInteger(), ForeignKey("estate.id"), primary_key=True)
+    )
@@ -1,15 +1,27 @@
-from typing import TYPE_CHECKING, Optional
+from datetime import datetime
+from typing import Any, Optional
 
-from sqlalchemy import BigInteger, Column, ForeignKey
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, event, inspect, select
 from sqlmodel import Field, Relationship, SQLModel
 
 from .estate import Estate
-
-if TYPE_CHECKING:
-    from . import SearchEvent
+from .search_event import SearchEvent
 
 
 class Price(SQLModel, table=True):
+    # Partitioned by month on date in postgres, see
+    # migrations/versions/8c4e2d7a1f03_partition_price_and_searchevent.py
+    __table_args__ = (
+        Index("ix_price_search_event_id_date", "search_event_id", "date"),
+        # Covers price history lookups, see api/utils/estate.py
+        Index(
+            "ix_price_estate_id_date",
+            "estate_id",
+            "date",
+            postgresql_include=["price", "price_per_square_meter"],
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     price: int
     price_per_square_meter: Optional[int] = Field(default=None)
@@ -19,5 +31,24 @@ class Price(SQLModel, table=True):
         default=None, sa_column=Column(BigInteger(), ForeignKey("estate.id"))
     )
     estate: Estate = Relationship(back_populates="prices")
+    # Composite (search_event_id, date) key in postgres, see migrations/env.py
     search_event_id: Optional[int] = Field(default=None, foreign_key="searchevent.id")
-    search_event: "SearchEvent" = Relationship(back_populates="prices")
+    search_event: SearchEvent = Relationship(back_populates="prices")
+    date: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+@event.listens_for(Price, "before_insert")
+def copy_search_event_date(mapper: Any, connection: Any, target: Price) -> None:
+    # Price rows live in the same monthly partition as their search event, and
+    # (search_event_id, date) references it in postgres
+    search_event = inspect(target).attrs.search_event.loaded_value  # type: ignore
+    event_date = getattr(search_event, "date", None)
+    if event_date is None and target.search_event_id is not None:
+        # Built with the id only, e.g. Price(search_event_id=...)
+        event_date = connection.scalar(
+            select(SearchEvent.date).where(  # type: ignore
+                SearchEvent.id == target.search_event_id
+            )
+        )
+    if event_date is not None:
+        target.date = event_date
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, Column, ForeignKey, Index
+from sqlmodel import Field, SQLModel
+
+
+class PriceChange(SQLModel, table=True):
+    """Price drop, raise or first sighting of an estate, recorded at ingest.
+
+    Estates are shared by searches, a change belongs to every search observing
+    the estate, see api.utils.search.get_price_changes.
+    """
+
+    __table_args__ = (Index("ix_pricechange_estate_id_date", "estate_id", "date"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    date: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    estate_id: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger(), ForeignKey("estate.id"))
+    )
+    # None when the estate is seen for the first time
+    old_price: Optional[int] = Field(default=None)
+    new_price: int
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
@@ -8,6 +9,12 @@ if TYPE_CHECKING:
 
 
 class ScanFailure(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_scanfailure_search_id_date", "search_id", "date"),
+        # searchFailRate reads the recent failures of every search
+        Index("ix_scanfailure_date", "date", "search_id", "status_code"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     date: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     search_id: int | None = Field(default=None, foreign_key="search.id")
@@ -27,6 +27,11 @@ class Search(SQLModel, table=True):
     location: str = Field(index=True)
     distance_radius: Optional[int] = Field(default=0)
     coordinates: Optional[str] = Field(default=None)
+    # Bounding box of the search, GiST indexed as a box in postgres
+    sw_lat: Optional[float] = Field(default=None)
+    sw_lng: Optional[float] = Field(default=None)
+    ne_lat: Optional[float] = Field(default=None)
+    ne_lng: Optional[float] = Field(default=None)
     from_price: Optional[int]
     to_price: Optional[int]
     from_surface: Optional[int]
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import BigInteger, Column, ForeignKey
+from sqlalchemy import BigInteger, Column, ForeignKey, Index
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
@@ -9,6 +9,9 @@ if TYPE_CHECKING:
 
 
 class SearchEventEstate(SQLModel, table=True):
+    # searchevent is partitioned, so postgres checks this key with triggers
+    # instead of a constraint, see
+    # migrations/versions/9d3a6e1f5c27_check_searcheventestate_search_event.py
     search_event_id: Optional[int] = Field(
         default=None, foreign_key="searchevent.id", primary_key=True
     )
@@ -19,6 +22,14 @@ class SearchEventEstate(SQLModel, table=True):
 
 
 class SearchEvent(SQLModel, table=True):
+    # Partitioned by month on date in postgres, see
+    # migrations/versions/8c4e2d7a1f03_partition_price_and_searchevent.py
+    __table_args__ = (
+        Index("ix_searchevent_search_id_date", "search_id", "date"),
+        # searchFailRate reads the recent events of every search
+        Index("ix_searchevent_date", "date", "search_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     date: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     estates: List["Estate"] = Relationship(
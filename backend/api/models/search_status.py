@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import case, event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlmodel import Field, SQLModel
+
+from .scan_failure import ScanFailure
+from .search_event import SearchEvent
+
+
+class SearchStatus(SQLModel, table=True):
+    search_id: int = Field(foreign_key="search.id", primary_key=True)
+    last_success: Optional[datetime] = Field(default=None)
+    last_failure: Optional[datetime] = Field(default=None)
+    last_status_code: Optional[int] = Field(default=None)
+    consecutive_failures: int = Field(default=0)
+    # Duration of the last finished scan in seconds
+    last_duration: Optional[float] = Field(default=None)
+
+    @property
+    def status(self) -> str:
+        if self.last_failure is None and self.last_success is None:
+            return "unknown"
+        if self.last_failure is None:
+            return "success"
+        if self.last_success is None or self.last_failure >= self.last_success:
+            return "failed"
+        return "success"
+
+
+def upsert_search_status(
+    connection: Connection,
+    search_id: int,
+    values: dict[str, Any],
+    updated_values: dict[str, Any],
+) -> None:
+    insert = sqlite_insert if connection.dialect.name == "sqlite" else postgresql_insert
+    statement = insert(SearchStatus).values(search_id=search_id, **values)
+    connection.execute(
+        statement.on_conflict_do_update(  # type: ignore
+            index_elements=[SearchStatus.search_id], set_=updated_values
+        )
+    )
+
+
+def _latest(column: Any, value: datetime) -> Any:
+    return case((column > value, column), else_=value)
+
+
+@event.listens_for(SearchEvent, "after_insert")
+def record_scan_success(mapper: Any, connection: Connection, target: Any) -> None:
+    # Runs in the same transaction as the insert, so the status never drifts
+    if target.search_id is None:
+        return
+    upsert_search_status(
+        connection,
+        target.search_id,
+        {"last_success": target.date, "consecutive_failures": 0},
+        {
+            "last_success": _latest(SearchStatus.last_success, target.date),
+            "consecutive_failures": 0,
+        },
+    )
+
+
+@event.listens_for(ScanFailure, "after_insert")
+def record_scan_failure(mapper: Any, connection: Connection, target: Any) -> None:
+    if target.search_id is None:
+        return
+    upsert_search_status(
+        connection,
+        target.search_id,
+        {
+            "last_failure": target.date,
+            "last_status_code": target.status_code,
+            "consecutive_failures": 1,
+        },
+        {
+            "last_failure": _latest(SearchStatus.last_failure, target.date),
+            "last_status_code": target.status_code,
+            "consecutive_failures": SearchStatus.consecutive_failures + 1,
+        },
+    )
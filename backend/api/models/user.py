@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING, List, Optional
 
+from sqlalchemy import Index
 from sqlmodel import JSON, Column, Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
@@ -7,6 +8,8 @@ if TYPE_CHECKING:
 
 
 class SearchUser(SQLModel, table=True):
+    __table_args__ = (Index("ix_searchuser_user_id_search_id", "user_id", "search_id"),)
+
     search_id: Optional[int] = Field(
         default=None, foreign_key="search.id", primary_key=True
     )
@@ -4,11 +4,14 @@ import jmespath
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from api.models import Category, Estate, Price, Search, SearchEvent
+from api.models import Category, Estate, Price, PriceChange, Search, SearchEvent
 from api.models.search import encode_url
 from api.models.user import User
-from api.schedulers import setup_scan_periodic_task
-from api.types.scan import PydanticScanSchedule
+from api.schedulers import PydanticScanSchedule, setup_scan_periodic_task
+from api.utils.estate import link_duplicate_estates
+from api.utils.tracing import traced, tracer
+
+TOTAL_PAGES_PATH = "pageProps.data.searchAds.pagination.totalPages"
 
 CATEGORY_MAP = {"terrain": "Plot", "flat": "Apartment", "house": "House"}
 
@@ -31,6 +34,47 @@ def parse_coordinates(
     return output.removesuffix(", ")
 
 
+def detect_price_changes(
+    prices: list[Price],
+    estates: dict[int, Estate],
+    new_estate_ids: set[int],
+    search_event: SearchEvent,
+) -> list[PriceChange]:
+    """Compare prices with the last known price of their estates"""
+    changes = []
+    for price in prices:
+        estate = estates.get(price.estate_id)  # type: ignore
+        if estate is None or estate.last_price == price.price:
+            continue
+        if estate.id in new_estate_ids or estate.last_price is not None:
+            changes.append(
+                PriceChange(
+                    date=search_event.date,
+                    estate_id=estate.id,
+                    old_price=estate.last_price,
+                    new_price=price.price,
+                )
+            )
+        estate.last_price = price.price
+    return changes
+
+
+def parse_bounding_box(
+    coordinates_org: dict[str, str | float] | None,
+    coordinates_alt: dict[str, str | float] | None,
+) -> dict[str, float | None]:
+    coordinates = coordinates_org or coordinates_alt or {}
+    return {
+        field: float(value) if (value := coordinates.get(key)) is not None else None
+        for field, key in (
+            ("sw_lat", "swLat"),
+            ("sw_lng", "swLng"),
+            ("ne_lat", "neLat"),
+            ("ne_lng", "neLng"),
+        )
+    }
+
+
 def update_estate(
     existing_estate: Estate,
     new_estate: Estate,
@@ -48,6 +92,7 @@ def update_estate(
         session.add(existing_estate)
 
 
+@traced("parse_search_info")
 async def parse_search_info(
     url: str,
     schedule: Optional[PydanticScanSchedule],
@@ -82,6 +127,7 @@ async def parse_search_info(
                 location=jmespath.search("locations[0].fullName", search_params),
                 distance_radius=search_params.get("distanceRadius"),
                 coordinates=parse_coordinates(coordinates_org, coordinates_alt),
+                **parse_bounding_box(coordinates_org, coordinates_alt),
                 from_price=search_params.get("priceMin"),
                 to_price=search_params.get("priceMax"),
                 from_surface=search_params.get("areaMin"),
@@ -111,6 +157,7 @@ async def parse_search_info(
     return search_event
 
 
+@traced("parse_scan_data")
 async def parse_scan_data(
     url: str,
     body: dict[str, Any],
@@ -118,7 +165,7 @@ async def parse_scan_data(
     search_event: SearchEvent | None = None,
     schedule: Optional[PydanticScanSchedule] = None,
     user: User | None = None,
-) -> None:
+) -> int:
     if not search_event:
         search_event = await parse_search_info(url, schedule, body, session, user)
     ads = jmespath.search("pageProps.data.searchAds.items", body)
@@ -133,6 +180,8 @@ async def parse_scan_data(
                 location=jmespath.search("locationLabel.value", ad),
                 date_created=ad.get("dateCreatedFirst") or ad.get("dateCreated"),
                 url=ad.get("slug"),
+                latitude=jmespath.search("location.coordinates.latitude", ad),
+                longitude=jmespath.search("location.coordinates.longitude", ad),
             )
         )
         for ad in ads
@@ -149,6 +198,10 @@ async def parse_scan_data(
         if estate.id not in (existing.id for existing in existing_estates)
     ]
     session.add_all(new_estates)
+    areas = {ad.get("id"): ad.get("areaInSquareMeters") for ad in ads}
+    await link_duplicate_estates(
+        session, [(estate, areas.get(estate.id)) for estate in new_estates]
+    )
     for existing_estate in existing_estates:
         new_estate = next(
             (estate for estate in estates if estate.id == existing_estate.id)
@@ -161,6 +214,8 @@ async def parse_scan_data(
             "location",
             "url",
         ]
+        if new_estate.latitude is not None and new_estate.longitude is not None:
+            fields_to_update.extend(["latitude", "longitude"])
         update_estate(existing_estate, new_estate, fields_to_update, session)
     prices = [
         Price(
@@ -175,4 +230,11 @@ async def parse_scan_data(
         if jmespath.search("totalPrice.value", ad) is not None
     ]
     session.add_all(prices)
-    await session.commit()
+    new_estate_ids = {estate.id for estate in new_estates}
+    estates_by_id = {estate.id: estate for estate in [*new_estates, *existing_estates]}
+    session.add_all(
+        detect_price_changes(prices, estates_by_id, new_estate_ids, search_event)
+    )
+    with tracer.start_as_current_span("commit"):
+        await session.commit()
+    return len(ads)
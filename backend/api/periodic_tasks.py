@@ -1,5 +1,6 @@
 import asyncio
 import random
+import time
 from typing import Any
 
 import jmespath
@@ -8,49 +9,77 @@ from curl_cffi import requests
 from loguru import logger
 from redbeat import RedBeatSchedulerEntry
 
-from api.database import get_async_session, get_cache
-from api.parsing import CategoryNotFoundError, parse_scan_data, parse_search_info
-from api.schemas.scan import TOTAL_PAGES_PATH
+from api.database import async_session, get_async_cache, get_engine
+from api.parsing import (
+    TOTAL_PAGES_PATH,
+    CategoryNotFoundError,
+    parse_scan_data,
+    parse_search_info,
+)
 from api.settings import settings
 from api.utils.celery_utils import async_task
 from api.utils.fetching import handle_failed_scan, make_request
+from api.utils.metrics import observe_scan
+from api.utils.partitions import create_future_partitions, detach_old_partitions
+from api.utils.scan_progress import ScanProgressStatus, publish_scan_progress
+from api.utils.search import record_scan_duration
 from api.utils.url_parsing import parse_url
 
-cache = get_cache()
-
 
 @async_task(celery_app)  # type: ignore
 async def run_periodic_scan(url: str, search_id, **kwargs: dict[str, Any]) -> None:
     logger.info(f"Running periodic scan for {url}")
+    started = time.monotonic()
+    await publish_scan_progress(search_id, ScanProgressStatus.STARTED)
+    ads = 0
     api_url = parse_url(url)
     status_code, body, req_session = await make_request(api_url)
-    async for session in get_async_session():
+    async with async_session(bind=get_engine()) as session:
+        # A failed scan stops at the first failed page, like adhocScan, and
+        # publishes FAILED as its only terminal status
         if status_code != 200:
             await handle_failed_scan(status_code, api_url, url, session, search_id)
-        else:
-            try:
-                search_event = await parse_search_info(url, None, body, session)
-                await parse_scan_data(url, body, session, search_event)
-            except (CategoryNotFoundError, TypeError):
-                logger.critical(f"Parsing document for {url} has failed.")
+            return
+        try:
+            search_event = await parse_search_info(url, None, body, session)
+            ads += await parse_scan_data(url, body, session, search_event)
+        except (CategoryNotFoundError, TypeError):
+            await handle_failed_parsing(url, search_id)
+            return
         # Check for pagination
         total_pages = jmespath.search(TOTAL_PAGES_PATH, body) or 1
-        if total_pages > 1:
-            for page_number in range(2, total_pages + 1):
-                next_url = api_url + f"&page={page_number}"
-                status_code, body, req_session = await make_request(
-                    url=next_url,
-                    wait_before_request=random.randint(10, 20),
-                    session=req_session,
-                )
-                if status_code != 200:
-                    await handle_failed_scan(
-                        status_code, next_url, url, session, search_id
-                    )
-                try:
-                    await parse_scan_data(url, body, session, search_event)
-                except (CategoryNotFoundError, TypeError):
-                    logger.critical(f"Parsing document for {url} has failed.")
+        await publish_scan_progress(
+            search_id, ScanProgressStatus.PAGE_PARSED, 1, total_pages
+        )
+        for page_number in range(2, total_pages + 1):
+            next_url = api_url + f"&page={page_number}"
+            status_code, body, req_session = await make_request(
+                url=next_url,
+                wait_before_request=random.randint(10, 20),
+                session=req_session,
+            )
+            if status_code != 200:
+                await handle_failed_scan(status_code, next_url, url, session, search_id)
+                return
+            try:
+                ads += await parse_scan_data(url, body, session, search_event)
+            except (CategoryNotFoundError, TypeError):
+                await handle_failed_parsing(url, search_id)
+                return
+            await publish_scan_progress(
+                search_id, ScanProgressStatus.PAGE_PARSED, page_number, total_pages
+            )
+        duration = time.monotonic() - started
+        await record_scan_duration(session, search_id, duration)
+        observe_scan("periodic", total_pages, ads, duration)
+        await publish_scan_progress(search_id, ScanProgressStatus.FINISHED)
+
+
+async def handle_failed_parsing(url: str, search_id: int) -> None:
+    logger.critical(f"Parsing document for {url} has failed.")
+    await publish_scan_progress(
+        search_id, ScanProgressStatus.FAILED, message="Document parsing failed."
+    )
 
 
 @async_task(celery_app)  # type: ignore
@@ -58,7 +87,7 @@ async def verify_ip(**kwargs: dict[str, Any]) -> None:
     logger.info("Verifying IP address")
     new_ip_resp = requests.get("http://ident.me/")
     new_ip: str = new_ip_resp.text
-    configured_ip: str | None = cache.get("configured_ip")  # type: ignore
+    configured_ip: str | None = await get_async_cache().get("configured_ip")
     if new_ip == configured_ip:
         if new_ip and len(new_ip) > 2:
             logger.info(f"No changes to IP address: ...{new_ip[-3::]}")
@@ -109,10 +138,24 @@ async def verify_ip(**kwargs: dict[str, Any]) -> None:
             )
         )
     else:
-        cache.set("configured_ip", new_ip)
+        await get_async_cache().set("configured_ip", new_ip)
         logger.info(f"New IP address set to ...{new_ip[-3::]}")
 
 
+@async_task(celery_app)  # type: ignore
+async def maintain_partitions(**kwargs: dict[str, Any]) -> None:
+    async with async_session(bind=get_engine()) as session:
+        created = await create_future_partitions(
+            session, settings.partition_months_ahead
+        )
+        logger.info(f"Ensured {len(created)} partitions exist")
+        if settings.partition_retention_months is not None:
+            detached = await detach_old_partitions(
+                session, settings.partition_retention_months
+            )
+            logger.info(f"Archived {len(detached)} partitions")
+
+
 def remove_scan_periodic_task(url: str) -> None:
     entry = None
     try:
@@ -1,13 +1,18 @@
 from typing import Any
 
-from fastapi import Request
+from fastapi import Depends, HTTPException, Request, status
+from sqlmodel.ext.asyncio.session import AsyncSession
 from strawberry.permission import BasePermission
 from strawberry.types import Info
 
+from api.database import get_async_session
+from api.models.user import User
 from api.utils.jwt import (
+    JWT_UNAUTHORIZED_MSG,
     PermissionDeniedError,
     extract_token_from_request,
-    get_jwt_payload,
+    get_request_payload,
+    get_request_user,
     get_user_from_token,
 )
 
@@ -18,14 +23,11 @@ class IsAuthenticated(BasePermission):
     async def has_permission(  # type: ignore
         self, source: Any, info: Info, **kwargs  # type: ignore
     ) -> bool:
-        request: Request = info.context["request"]
-        token = extract_token_from_request(request)
-        if not token:
-            return False
         try:
-            user = await get_user_from_token(token, info.context["session"])
+            user = await get_request_user(info.context)
         except PermissionDeniedError:
             return False
+        request: Request = info.context["request"]
         if user:
             request.state.user = user
             return True
@@ -38,14 +40,11 @@ class IsAdminUser(BasePermission):
     async def has_permission(  # type: ignore
         self, source: Any, info: Info, **kwargs  # type: ignore
     ) -> bool:
-        request: Request = info.context["request"]
-        token = extract_token_from_request(request)
-        if not token:
-            return False
         try:
-            user = await get_user_from_token(token, info.context["session"])
+            user = await get_request_user(info.context)
         except PermissionDeniedError:
             return False
+        request: Request = info.context["request"]
         if user and isinstance(user.roles, list) and "admin" in user.roles:
             request.state.user = user
             return True
@@ -58,16 +57,11 @@ class HasValidRefreshToken(BasePermission):
     async def has_permission(  # type: ignore
         self, source: Any, info: Info, **kwargs  # type: ignore
     ) -> bool:
-        request: Request = info.context["request"]
-        token = extract_token_from_request(request)
-        if not token:
-            return False
         try:
-            user = await get_user_from_token(
-                token, info.context["session"], refresh=True
-            )
+            user = await get_request_user(info.context, refresh=True)
         except PermissionDeniedError:
             return False
+        request: Request = info.context["request"]
         if user:
             request.state.user = user
             return True
@@ -80,12 +74,28 @@ class IsFreshToken(BasePermission):
     def has_permission(
         self, source: Any, info: Info, **kwargs: Any  # type: ignore
     ) -> bool:
-        request: Request = info.context["request"]
-        token = extract_token_from_request(request)
-        if not token:
+        try:
+            decoded_token = get_request_payload(info.context)
+        except PermissionDeniedError:
             return False
-        decoded_token = get_jwt_payload(token)
         if not isinstance(is_fresh := decoded_token.get("fresh"), bool):
             return False
         else:
             return is_fresh
+
+
+async def get_current_user(
+    request: Request, session: AsyncSession = Depends(get_async_session)
+) -> User:
+    """IsAuthenticated counterpart for plain FastAPI routes"""
+    token = extract_token_from_request(request)
+    try:
+        if not token:
+            raise PermissionDeniedError()
+        user = await get_user_from_token(token, session)
+    except PermissionDeniedError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail=JWT_UNAUTHORIZED_MSG
+        )
+    request.state.user = user
+    return user
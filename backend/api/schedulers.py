@@ -2,8 +2,17 @@ from typing import Any
 
 from celery import current_app as celery_app
 from celery.schedules import crontab
+from pydantic import BaseModel
 from redbeat import RedBeatSchedulerEntry
 
+from api.utils.tracing import get_trace_context
+
+
+class PydanticScanSchedule(BaseModel):
+    day_of_week: int
+    hour: int
+    minute: int
+
 
 def setup_scan_periodic_task(
     url: str, schedule_input: dict[str, Any], search_id: int
@@ -13,7 +22,7 @@ def setup_scan_periodic_task(
         task="api.periodic_tasks.run_periodic_scan",
         schedule=crontab(**schedule_input),
         args=[url, search_id],
-        kwargs={"schedule_name": url},
+        kwargs={"schedule_name": url, "trace_context": get_trace_context()},
         app=celery_app,
     )
     entry.save()
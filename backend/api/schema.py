@@ -1,15 +1,22 @@
 import strawberry
 
 import api.schemas.category
+import api.schemas.estate
 import api.schemas.scan
 import api.schemas.search
 import api.schemas.search_event
 import api.schemas.user
+from api.settings import settings
+from api.utils.documents import DocumentCache
+from api.utils.graphql_extensions import GraphQLTracing, QueryCounter, ResolverMetrics
+from api.utils.query_cost import QueryCost, QueryDepthLimit
+from api.utils.replica import ReadYourWrites
 
 
 @strawberry.type
 class Query(
     api.schemas.category.Query,
+    api.schemas.estate.Query,
     api.schemas.search_event.Query,
     api.schemas.search.Query,
     api.schemas.user.Query,
@@ -27,4 +34,23 @@ class Mutation(
     pass
 
 
-schema = strawberry.Schema(Query, Mutation)
+@strawberry.type
+class Subscription(api.schemas.scan.Subscription):
+    pass
+
+
+schema = strawberry.Schema(
+    Query,
+    Mutation,
+    Subscription,
+    extensions=[
+        QueryDepthLimit,
+        DocumentCache,
+        QueryCost,
+        ReadYourWrites,
+        ResolverMetrics,
+        # Adds a span per resolver, only worth it when spans are exported
+        *([GraphQLTracing] if settings.tracing_exporter else []),
+        *([QueryCounter] if settings.debug else []),
+    ],
+)
@@ -20,7 +20,7 @@ from api.types.general import InputValidationError
 
 
 async def resolve_categories(root: Any, info: Info[Any, Any]) -> list[CategoryType]:
-    session: AsyncSession = info.context["session"]
+    session: AsyncSession = info.context["read_session"]
     query = select(Category)
     categories_db = (await session.exec(query)).all()
     return [convert_category_from_db(cat) for cat in categories_db]
@@ -0,0 +1,151 @@
+from typing import Any, Optional
+
+import strawberry
+from strawberry.types import Info
+
+from api.permissions import IsAuthenticated
+from api.types.estate import (
+    MAX_HISTORY_ESTATES,
+    BoundingBoxInput,
+    EstateDoesntExistError,
+    EstateFiltersInput,
+    EstatePriceHistoryInput,
+    EstatePriceHistoryResponse,
+    EstatesLocationResponse,
+    EstatesPriceHistoryInput,
+    EstatesPriceHistoryResponse,
+    EstatesPriceHistoryType,
+    NearestEstatesInput,
+    SearchEstatesResponse,
+    SearchTextTooShortError,
+    TooManyEstatesError,
+    convert_estates_location_from_db,
+    convert_price_history,
+)
+from api.types.general import InvalidCursorError, PageSizeOutOfRangeError
+from api.utils.estate import (
+    get_estates_in_box,
+    get_estates_price_history,
+    get_existing_estate_ids,
+    get_nearest_estates,
+    get_search_words,
+    search_estates,
+)
+from api.utils.pagination import (
+    MAX_PAGE_SIZE,
+    CursorDecodeError,
+    decode_distance_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    is_valid_page_size,
+    split_page,
+)
+
+
+@strawberry.type
+class Query:
+    @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
+    async def estate_price_history(
+        self, info: Info[Any, Any], input: EstatePriceHistoryInput
+    ) -> EstatePriceHistoryResponse:
+        session = info.context["read_session"]
+        if not await get_existing_estate_ids(session, [input.estate_id]):
+            return EstateDoesntExistError()
+        history = await get_estates_price_history(
+            session, [input.estate_id], input.date_from, input.date_to
+        )
+        return convert_price_history(input.estate_id, history[input.estate_id])
+
+    @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
+    async def estates_price_history(
+        self, info: Info[Any, Any], input: EstatesPriceHistoryInput
+    ) -> EstatesPriceHistoryResponse:
+        if len(input.estate_ids) > MAX_HISTORY_ESTATES:
+            return TooManyEstatesError()
+        session = info.context["read_session"]
+        estate_ids = list(dict.fromkeys(input.estate_ids))
+        existing_ids = await get_existing_estate_ids(session, estate_ids)
+        history = await get_estates_price_history(
+            session, estate_ids, input.date_from, input.date_to
+        )
+        return EstatesPriceHistoryType(
+            histories=[
+                convert_price_history(estate_id, history[estate_id])
+                for estate_id in estate_ids
+                if estate_id in existing_ids
+            ]
+        )
+
+    @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
+    async def estates_in_box(
+        self,
+        info: Info[Any, Any],
+        input: BoundingBoxInput,
+        first: int = MAX_PAGE_SIZE,
+        after: Optional[str] = None,
+    ) -> EstatesLocationResponse:
+        if not is_valid_page_size(first):
+            return PageSizeOutOfRangeError()
+        try:
+            after_id = decode_id_cursor(after) if after else None
+        except CursorDecodeError:
+            return InvalidCursorError()
+        session = info.context["read_session"]
+        estates = await get_estates_in_box(
+            session,
+            input.sw_lat,
+            input.sw_lng,
+            input.ne_lat,
+            input.ne_lng,
+            first,
+            after_id,
+        )
+        page, has_next_page = split_page(list(estates), first)
+        return convert_estates_location_from_db(page, has_next_page)
+
+    @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
+    async def nearest_estates(
+        self, info: Info[Any, Any], input: NearestEstatesInput
+    ) -> EstatesLocationResponse:
+        if not is_valid_page_size(input.first):
+            return PageSizeOutOfRangeError()
+        session = info.context["read_session"]
+        estates = await get_nearest_estates(
+            session, input.latitude, input.longitude, input.first
+        )
+        return convert_estates_location_from_db(estates)
+
+    @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
+    async def search_estates(
+        self,
+        info: Info[Any, Any],
+        text: str,
+        filters: Optional[EstateFiltersInput] = None,
+        first: int = MAX_PAGE_SIZE,
+        after: Optional[str] = None,
+    ) -> SearchEstatesResponse:
+        if not is_valid_page_size(first):
+            return PageSizeOutOfRangeError()
+        if not get_search_words(text):
+            return SearchTextTooShortError()
+        try:
+            after_distance = decode_distance_cursor(after) if after else None
+        except CursorDecodeError:
+            return InvalidCursorError()
+        filters = filters or EstateFiltersInput()
+        session = info.context["read_session"]
+        results = await search_estates(
+            session,
+            text,
+            first,
+            after_distance,
+            city=filters.city,
+            province=filters.province,
+            min_price=filters.min_price,
+            max_price=filters.max_price,
+        )
+        page, has_next_page = split_page(results, first)
+        end_cursor = encode_cursor(page[-1][1], page[-1][0].id) if page else None
+        return convert_estates_location_from_db(
+            [estate for estate, _ in page], has_next_page, end_cursor
+        )
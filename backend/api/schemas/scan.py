@@ -1,5 +1,7 @@
 import random
-from typing import Any
+import time
+from datetime import datetime
+from typing import Any, AsyncGenerator
 
 import jmespath
 import strawberry
@@ -8,20 +10,31 @@ from pydantic import ValidationError
 from sqlmodel.ext.asyncio.session import AsyncSession
 from strawberry.types import Info
 
-from api.parsing import CategoryNotFoundError, parse_scan_data, parse_search_info
+from api.parsing import (
+    TOTAL_PAGES_PATH,
+    CategoryNotFoundError,
+    parse_scan_data,
+    parse_search_info,
+)
 from api.permissions import IsAuthenticated
 from api.types.general import InputValidationError
 from api.types.scan import (
     AdhocScanInput,
     AdhocScanResponse,
     ScanFailedError,
+    ScanProgressType,
     ScanSucceeded,
 )
 from api.utils.fetching import handle_failed_scan, make_request
+from api.utils.metrics import observe_scan
+from api.utils.scan_progress import (
+    ScanProgressStatus,
+    listen_scan_progress,
+    publish_scan_progress,
+)
+from api.utils.search import record_scan_duration
 from api.utils.url_parsing import parse_url
 
-TOTAL_PAGES_PATH = "pageProps.data.searchAds.pagination.totalPages"
-
 
 @strawberry.type
 class Mutation:
@@ -33,6 +46,7 @@ class Mutation:
             data = input.to_pydantic()
         except ValidationError as error:
             return InputValidationError(message=str(error))
+        started = time.monotonic()
         base_url = str(data.url)
         url = parse_url(base_url)
         status_code, body, req_session = await make_request(url)
@@ -48,13 +62,24 @@ class Mutation:
             search_event = await parse_search_info(
                 base_url, data.schedule, body, session, user
             )
-            await parse_scan_data(base_url, body, session, search_event)
+            await publish_scan_progress(
+                search_event.search_id, ScanProgressStatus.STARTED
+            )
+            ads = await parse_scan_data(base_url, body, session, search_event)
         except (CategoryNotFoundError, TypeError):
             logger.critical(f"Parsing document for {url} has failed.")
             return ScanFailedError(message="Document parsing failed.")
         # Check for pagination
         total_pages = jmespath.search(TOTAL_PAGES_PATH, body) or 1
+        search_id = search_event.search_id
+        await publish_scan_progress(
+            search_id, ScanProgressStatus.PAGE_PARSED, 1, total_pages
+        )
         if total_pages <= 1:
+            duration = time.monotonic() - started
+            await record_scan_duration(session, search_id, duration)
+            observe_scan("adhoc", total_pages, ads, duration)
+            await publish_scan_progress(search_id, ScanProgressStatus.FINISHED)
             return ScanSucceeded  # type: ignore
         for page_number in range(2, total_pages + 1):
             next_url = url + f"&page={page_number}"
@@ -68,5 +93,46 @@ class Mutation:
                 return ScanFailedError(
                     message=f"Scan has failed with {status_code} status code."
                 )
-            await parse_scan_data(base_url, body, session, search_event)
+            ads += await parse_scan_data(base_url, body, session, search_event)
+            await publish_scan_progress(
+                search_id, ScanProgressStatus.PAGE_PARSED, page_number, total_pages
+            )
+        duration = time.monotonic() - started
+        await record_scan_duration(session, search_id, duration)
+        observe_scan("adhoc", total_pages, ads, duration)
+        await publish_scan_progress(search_id, ScanProgressStatus.FINISHED)
         return ScanSucceeded  # type: ignore
+
+
+@strawberry.type
+class Subscription:
+    @strawberry.subscription
+    async def scan_progress(
+        self, info: Info[Any, Any], search_id: int
+    ) -> AsyncGenerator[ScanProgressType, None]:
+        # Permission classes await the resolver, which fails for async generators
+        permission = IsAuthenticated()
+        try:
+            if not await permission.has_permission(self, info):
+                raise PermissionError(permission.message)
+        finally:
+            # The sessions live as long as the websocket, don't let them hold
+            # a connection for it
+            await info.context["session"].close()
+            if read_session := info.context.get("read_session"):
+                await read_session.close()
+        return scan_progress_events(search_id)
+
+
+async def scan_progress_events(
+    search_id: int,
+) -> AsyncGenerator[ScanProgressType, None]:
+    async for event in listen_scan_progress(search_id):
+        yield ScanProgressType(
+            search_id=event["search_id"],
+            status=ScanProgressStatus(event["status"]),
+            date=datetime.fromisoformat(event["date"]),
+            page=event["page"],
+            total_pages=event["total_pages"],
+            message=event["message"],
+        )
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Optional
 
 import strawberry
 from pydantic import ValidationError
@@ -8,8 +8,15 @@ from strawberry.types import Info
 from api.models.search import decode_url
 from api.permissions import IsAuthenticated
 from api.schedulers import remove_scan_periodic_task, setup_scan_periodic_task
-from api.types.event_stats import EventStatsType
-from api.types.general import InputValidationError
+from api.types.estate import PointInput
+from api.types.event_stats import convert_event_stats
+from api.types.general import (
+    InputValidationError,
+    InvalidCursorError,
+    PageInfo,
+    PageSizeOutOfRangeError,
+)
+from api.types.price import PriceChangesInput, convert_price_changes_from_db
 from api.types.search_stats import (
     AssignSearchInput,
     AssignSearchResponse,
@@ -22,6 +29,7 @@ from api.types.search_stats import (
     GetSearchStatsResponse,
     NoSearchesAvailableError,
     NoSearchEventError,
+    PriceChangesResponse,
     ScheduleEditedSuccessfully,
     SearchAssignSuccessfully,
     SearchDoesntExistError,
@@ -32,15 +40,31 @@ from api.types.search_stats import (
     SearchFailRateResponse,
     SearchStatsInput,
     convert_search_fail_rate,
+    convert_search_fail_rate_histogram,
     convert_search_stats_from_db,
     convert_searches_from_db,
     get_last_statuses,
 )
-from api.utils.search import get_search_by_id, get_searches
+from api.utils.pagination import (
+    CursorDecodeError,
+    decode_date_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    is_valid_page_size,
+    split_page,
+)
+from api.utils.search import (
+    get_price_changes,
+    get_search_by_id,
+    get_search_events_page,
+    get_searches,
+    get_searches_covering_point,
+)
 from api.utils.search_event import (
+    dedupe_prices,
     get_search_event_avg_stats,
     get_search_event_min_prices,
-    get_search_event_prices,
+    get_search_events_prices,
 )
 from api.utils.user import add_favorite_search
 
@@ -51,7 +75,7 @@ class Query:
     async def search_stats(
         self, info: Info[Any, Any], input: SearchStatsInput
     ) -> GetSearchStatsResponse:
-        session = info.context["session"]
+        session = info.context["read_session"]
         user = info.context["request"].state.user
         search_id = input.id or user.favorite_search_id
         if not search_id:
@@ -61,55 +85,111 @@ class Query:
             return SearchDoesntExistError()
         date_from = input.date_from or datetime.utcnow() - timedelta(days=365)
         date_to = input.date_to or datetime.utcnow()
-        return await convert_search_stats_from_db(session, search, date_from, date_to)
+        return await convert_search_stats_from_db(
+            session, search, date_from, date_to, input.dedupe
+        )
 
     @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
-    async def all_searches(self, info: Info[Any, Any]) -> GetSearchesResponse:
-        session = info.context["session"]
-        searches_db = await get_searches(session=session)
+    async def all_searches(
+        self,
+        info: Info[Any, Any],
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> GetSearchesResponse:
+        if not is_valid_page_size(first):
+            return PageSizeOutOfRangeError()
+        try:
+            after_id = decode_id_cursor(after) if after else None
+        except CursorDecodeError:
+            return InvalidCursorError()
+        session = info.context["read_session"]
+        searches_db = await get_searches(session=session, first=first, after=after_id)
         if len(searches_db) == 0:
             return NoSearchesAvailableError()
-        return convert_searches_from_db(searches_db)
+        page, has_next_page = split_page(searches_db, first)
+        return convert_searches_from_db(page, has_next_page)
 
     @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
-    async def users_searches(self, info: Info[Any, Any]) -> GetSearchesResponse:
-        session = info.context["session"]
+    async def users_searches(
+        self,
+        info: Info[Any, Any],
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> GetSearchesResponse:
+        if not is_valid_page_size(first):
+            return PageSizeOutOfRangeError()
+        try:
+            after_id = decode_id_cursor(after) if after else None
+        except CursorDecodeError:
+            return InvalidCursorError()
+        session = info.context["read_session"]
         user = info.context["request"].state.user
-        searches_db = await get_searches(session=session, user_id=user.id)
+        searches_db = await get_searches(
+            session=session, user_id=user.id, first=first, after=after_id
+        )
         if len(searches_db) == 0:
             return NoSearchesAvailableError()
-        parsed_searches = convert_searches_from_db(searches_db)
+        page, has_next_page = split_page(searches_db, first)
+        parsed_searches = convert_searches_from_db(page, has_next_page)
         parsed_searches.favorite_id = user.favorite_search_id
         return parsed_searches
 
+    @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
+    async def searches_covering_point(
+        self, info: Info[Any, Any], input: PointInput
+    ) -> GetSearchesResponse:
+        session = info.context["read_session"]
+        searches_db = await get_searches_covering_point(
+            session, input.latitude, input.longitude
+        )
+        if len(searches_db) == 0:
+            return NoSearchesAvailableError()
+        return convert_searches_from_db(searches_db)
+
     @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
     async def search_events_stats(
         self, info: Info[Any, Any], input: SearchEventsStatsInput
     ) -> GetSearchEventsStatsResponse:
-        session = info.context["session"]
+        if not is_valid_page_size(input.first):
+            return PageSizeOutOfRangeError()
+        try:
+            after = decode_date_cursor(input.after) if input.after else None
+        except CursorDecodeError:
+            return InvalidCursorError()
+        session = info.context["read_session"]
         if not (search_id := input.id):
             user = info.context["request"].state.user
             if not isinstance(user.favorite_search_id, int):
                 return FavoriteSearchDoesntExistError()
             search_id = user.favorite_search_id
-        search = await get_search_by_id(session, search_id, with_events=True)
-        if not search or len(search.search_events) == 0:
+        search_events = await get_search_events_page(
+            session, search_id, input.first, after
+        )
+        if len(search_events) == 0:
             return NoSearchEventError()
+        page, has_next_page = split_page(search_events, input.first)
+        prices_by_event = await get_search_events_prices(session, page)
         search_event_stats = []
-        for search_event in search.search_events:
-            prices = await get_search_event_prices(session, search_event)
+        for search_event in page:
+            prices = prices_by_event.get(search_event.id, [])  # type: ignore
+            if input.dedupe:
+                prices = dedupe_prices(prices)
             if len(prices) == 0:
                 continue
             stats = get_search_event_avg_stats(prices)
             stats.update(get_search_event_min_prices(prices))
             stats["date"] = search_event.date  # type: ignore
             stats["id"] = search_event.id
-            search_event_stats.append(EventStatsType(**stats))  # type: ignore
-        return SearchEventsStatsType(search_events=search_event_stats)
+            search_event_stats.append(convert_event_stats(stats))
+        end_cursor = encode_cursor(page[-1].date, page[-1].id)  # type: ignore
+        return SearchEventsStatsType(
+            search_events=search_event_stats,
+            page_info=PageInfo(has_next_page=has_next_page, end_cursor=end_cursor),
+        )
 
     @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
     async def searches_last_status(self, info: Info[Any, Any]) -> SearchesStatusType:
-        session = info.context["session"]
+        session = info.context["read_session"]
         return await get_last_statuses(session=session)
 
     @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
@@ -118,9 +198,24 @@ class Query:
     ) -> SearchFailRateResponse:
         if input.days > 180:
             return DaysOutOfRangeError()
-        session = info.context["session"]
+        session = info.context["read_session"]
+        if input.bucket is not None:
+            return await convert_search_fail_rate_histogram(
+                session, input.days, input.bucket
+            )
         return await convert_search_fail_rate(session, input.days)
 
+    @strawberry.field(permission_classes=[IsAuthenticated])  # type: ignore
+    async def price_changes(
+        self, info: Info[Any, Any], input: PriceChangesInput
+    ) -> PriceChangesResponse:
+        session = info.context["read_session"]
+        search = await get_search_by_id(session, input.search_id)
+        if not search:
+            return SearchDoesntExistError()
+        changes = await get_price_changes(session, input.search_id, input.since)
+        return convert_price_changes_from_db(changes)
+
 
 @strawberry.type
 class Mutation:
@@ -33,11 +33,11 @@ from api.types.auth import (
     convert_users_from_db,
 )
 from api.types.general import InputValidationError
-from api.utils.jwt import create_jwt_token
+from api.utils.jwt import create_jwt_token, invalidate_cached_user
 from api.utils.user import (
+    async_get_password_hash,
     authenticate_user,
     get_all_users,
-    get_password_hash,
     get_user_by_email,
 )
 
@@ -46,7 +46,7 @@ from api.utils.user import (
 class Query:
     @strawberry.field(permission_classes=[IsAdminUser])  # type: ignore
     async def all_users(self, info: Info[Any, Any]) -> UsersList:
-        session = info.context["session"]
+        session = info.context["read_session"]
         users_db = await get_all_users(session=session)
         return convert_users_from_db(users_db)
 
@@ -105,7 +105,7 @@ class Mutation:
         temporary_password = pwd.genword(entropy=68, charset="ascii_72")
         new_user = User(
             email=email,
-            password=get_password_hash(temporary_password),
+            password=await async_get_password_hash(temporary_password),
             is_active=False,
         )
         session.add(new_user)
@@ -129,6 +129,7 @@ class Mutation:
         user.is_active = False
         session.add(user)
         await session.commit()
+        invalidate_cached_user(user.id)  # type: ignore
         return DeactivateAccountSuccess()
 
     @strawberry.mutation
@@ -147,7 +148,7 @@ class Mutation:
             return ActivateAccountError()
         if user.is_active or "user" not in user.roles or "deactivated" in user.roles:
             return ActivateAccountError()
-        user.password = get_password_hash(data.new_password)
+        user.password = await async_get_password_hash(data.new_password)
         user.is_active = True
         session.add(user)
         await session.commit()
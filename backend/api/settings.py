@@ -1,8 +1,9 @@
+import functools
+from typing import Literal, Optional
+
 from loguru import logger
 from pydantic_settings import BaseSettings
 
-logger.add("file_{time:YYYY-MM-DD}.log", rotation="50 MB", retention="10 days")
-
 
 class Settings(BaseSettings):
     debug: bool
@@ -25,10 +26,63 @@ class Settings(BaseSettings):
     bd_token: str
     unblock_url: str
     imports: tuple[str] = ("api.periodic_tasks",)
+    partition_months_ahead: int = 3
+    # Partitions older than that are detached into the archive schema,
+    # None keeps every partition attached
+    partition_retention_months: Optional[int] = None
+    # Connection pool of each engine, per process
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    # Connections older than that many seconds are replaced, -1 keeps them
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Prepared statements kept per connection
+    db_statement_cache_size: int = 100
+    # Behind pgbouncer in transaction mode, which pools the connections and
+    # doesn't keep prepared statements between transactions
+    db_pgbouncer: bool = False
+    # Optional read only replica used by Query resolvers
+    db_replica_host: Optional[str] = None
+    db_replica_port: Optional[int] = None
+    # Users read from the primary for that long after their own writes
+    replica_max_lag_seconds: int = 5
+    # Authenticated users are kept in process for that long, 0 disables it
+    user_cache_ttl_seconds: int = 0
+    # Threads hashing and verifying passwords, bcrypt releases the GIL
+    password_hash_workers: int = 2
+    # Parsed and validated GraphQL documents kept per process
+    graphql_document_cache_size: int = 256
+    # Automatic persisted queries registered by clients, kept per process
+    persisted_query_cache_size: int = 1000
+    # Limits checked before executing a GraphQL operation, see api.utils.query_cost
+    graphql_max_depth: int = 10
+    graphql_max_cost: int = 50000
+    # Port of the Prometheus exporter started by Celery workers, None or 0
+    # disables it
+    worker_metrics_port: Optional[int] = 9808
+    # Span exporter, None disables tracing. "file" appends JSON lines to
+    # tracing_file, "otlp" sends to OTEL_EXPORTER_OTLP_ENDPOINT
+    tracing_exporter: Optional[Literal["file", "otlp"]] = None
+    tracing_file: str = "traces.jsonl"
+    tracing_service_name: str = "plotstats"
 
     @property
     def db_uri(self) -> str:
         return f"postgresql+asyncpg://{self.db_user}:{self.db_pass}@{self.db_host}:{self.db_port}/{self.db_name}"
 
+    @property
+    def db_replica_uri(self) -> Optional[str]:
+        if not self.db_replica_host:
+            return None
+        port = self.db_replica_port or self.db_port
+        return f"postgresql+asyncpg://{self.db_user}:{self.db_pass}@{self.db_replica_host}:{port}/{self.db_name}"
+
 
 settings = Settings()
+
+
+@functools.cache
+def setup_logging() -> None:
+    """Adds the daily log file, once per process"""
+    logger.add("file_{time:YYYY-MM-DD}.log", rotation="50 MB", retention="10 days")
@@ -1,6 +1,20 @@
+from datetime import datetime
+from typing import Annotated, Optional, Sequence, Union
+
 import strawberry
 
 from api.models.estate import Estate
+from api.settings import settings
+from api.types.general import (
+    Error,
+    InvalidCursorError,
+    PageInfo,
+    PageSizeOutOfRangeError,
+)
+from api.utils.pagination import encode_cursor
+
+# Upper limit of estates in a single batch history query
+MAX_HISTORY_ESTATES = 100
 
 
 @strawberry.experimental.pydantic.type(
@@ -14,3 +28,163 @@ class EstateType:
     location: strawberry.auto
     date_created: strawberry.auto
     url: strawberry.auto
+
+
+@strawberry.input
+class EstatePriceHistoryInput:
+    estate_id: int
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+@strawberry.input
+class EstatesPriceHistoryInput:
+    estate_ids: list[int]
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+@strawberry.input
+class PointInput:
+    latitude: float
+    longitude: float
+
+
+@strawberry.input
+class BoundingBoxInput:
+    sw_lat: float
+    sw_lng: float
+    ne_lat: float
+    ne_lng: float
+
+
+@strawberry.input
+class NearestEstatesInput:
+    latitude: float
+    longitude: float
+    first: int = 10
+
+
+@strawberry.input
+class EstateFiltersInput:
+    city: Optional[str] = None
+    province: Optional[str] = None
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+
+
+@strawberry.type
+class EstateLocationType:
+    id: int
+    title: str
+    city: Optional[str] = None
+    url: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    last_price: Optional[int] = None
+
+
+@strawberry.type
+class EstatesLocationType:
+    estates: list[EstateLocationType]
+    page_info: Optional[PageInfo] = None
+
+
+def convert_estates_location_from_db(
+    estates: Sequence[Estate],
+    has_next_page: Optional[bool] = None,
+    end_cursor: Optional[str] = None,
+) -> EstatesLocationType:
+    page_info = None
+    if has_next_page is not None:
+        if end_cursor is None and estates:
+            end_cursor = encode_cursor(estates[-1].id)
+        page_info = PageInfo(has_next_page=has_next_page, end_cursor=end_cursor)
+    return EstatesLocationType(
+        estates=[
+            EstateLocationType(
+                id=estate.id,
+                title=estate.title,
+                city=estate.city,
+                url=f"{settings.base_url}pl/oferta/{estate.url}",
+                latitude=estate.latitude,
+                longitude=estate.longitude,
+                last_price=estate.last_price,
+            )
+            for estate in estates
+        ],
+        page_info=page_info,
+    )
+
+
+@strawberry.type
+class PricePointType:
+    date: datetime
+    price: int
+    price_per_square_meter: Optional[int] = None
+
+
+@strawberry.type
+class EstatePriceHistoryType:
+    estate_id: int
+    prices: list[PricePointType]
+
+
+@strawberry.type
+class EstatesPriceHistoryType:
+    histories: list[EstatePriceHistoryType]
+
+
+def convert_price_history(
+    estate_id: int, history: list[tuple[datetime, int, Optional[int]]]
+) -> EstatePriceHistoryType:
+    return EstatePriceHistoryType(
+        estate_id=estate_id,
+        prices=[
+            PricePointType(
+                date=date, price=price, price_per_square_meter=price_per_square_meter
+            )
+            for date, price, price_per_square_meter in history
+        ],
+    )
+
+
+@strawberry.type
+class EstateDoesntExistError(Error):
+    message: str = "Estate with provided id doesn't exist"
+
+
+@strawberry.type
+class SearchTextTooShortError(Error):
+    message: str = "Provide at least one word of 3 or more characters"
+
+
+@strawberry.type
+class TooManyEstatesError(Error):
+    message: str = f"Provide at most {MAX_HISTORY_ESTATES} estates"
+
+
+EstatePriceHistoryResponse = Annotated[
+    Union[EstatePriceHistoryType, EstateDoesntExistError],
+    strawberry.union("EstatePriceHistoryResponse"),
+]
+
+EstatesPriceHistoryResponse = Annotated[
+    Union[EstatesPriceHistoryType, TooManyEstatesError],
+    strawberry.union("EstatesPriceHistoryResponse"),
+]
+
+EstatesLocationResponse = Annotated[
+    Union[EstatesLocationType, InvalidCursorError, PageSizeOutOfRangeError],
+    strawberry.union("EstatesLocationResponse"),
+]
+
+SearchEstatesResponse = Annotated[
+    Union[
+        EstatesLocationType,
+        InvalidCursorError,
+        PageSizeOutOfRangeError,
+        SearchTextTooShortError,
+    ],
+    strawberry.union("SearchEstatesResponse"),
+]
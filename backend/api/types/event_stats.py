@@ -1,16 +1,18 @@
 from datetime import datetime
-from typing import Annotated, Optional, Union
+from typing import Annotated, Any, Optional, Union
 
 import strawberry
 
 from api.types.general import Error
-from api.types.price import PriceType
+from api.types.price import PriceType, convert_price_from_db
 
 
 @strawberry.input
 class EventStatsInput:
     id: int
     top_prices: Optional[int] = strawberry.UNSET
+    # Count near duplicate listings of the same estate once
+    dedupe: bool = False
 
 
 @strawberry.type
@@ -28,6 +30,17 @@ class EventStatsType:
     min_prices_per_square_meter: Optional[list[PriceType]] = strawberry.UNSET
 
 
+def convert_event_stats(stats: dict[str, Any]) -> EventStatsType:
+    """Stats from api.utils.search_event, which keep the prices as db rows"""
+    converted = {**stats}
+    for key in ("min_price", "min_price_per_square_meter"):
+        converted[key] = convert_price_from_db(stats[key])
+    for key in ("min_prices", "min_prices_per_square_meter"):
+        if key in stats:
+            converted[key] = [convert_price_from_db(p) for p in stats[key]]
+    return EventStatsType(**converted)
+
+
 @strawberry.type
 class SearchEventDoesntExistError(Error):
     message: str = "Search Event with provided id doesn't exist"
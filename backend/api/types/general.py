@@ -1,3 +1,5 @@
+from typing import Optional
+
 import strawberry
 
 
@@ -9,3 +11,19 @@ class Error:
 @strawberry.type
 class InputValidationError(Error):
     pass
+
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: Optional[str] = None
+
+
+@strawberry.type
+class InvalidCursorError(Error):
+    message: str = "Provided cursor is invalid"
+
+
+@strawberry.type
+class PageSizeOutOfRangeError(Error):
+    message: str = "Provided page size is out of range"
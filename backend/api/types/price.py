@@ -1,7 +1,11 @@
+from datetime import datetime
+from typing import Optional, Sequence
+
 import strawberry
 
 from api.models.estate import Estate
 from api.models.price import Price
+from api.models.price_change import PriceChange
 from api.settings import settings
 from api.types.estate import EstateType
 
@@ -34,3 +38,38 @@ def convert_price_from_db(price: Price) -> PriceType:
         terrain_area_in_square_meters=price.terrain_area_in_square_meters,
         estate=estate,
     )
+
+
+@strawberry.input
+class PriceChangesInput:
+    search_id: int
+    since: datetime
+
+
+@strawberry.type
+class PriceChangeType:
+    estate_id: int
+    date: datetime
+    old_price: Optional[int] = None
+    new_price: int
+    is_new_listing: bool
+
+
+@strawberry.type
+class PriceChangesType:
+    changes: list[PriceChangeType]
+
+
+def convert_price_changes_from_db(changes: Sequence[PriceChange]) -> PriceChangesType:
+    return PriceChangesType(
+        changes=[
+            PriceChangeType(
+                estate_id=change.estate_id,  # type: ignore
+                date=change.date,
+                old_price=change.old_price,
+                new_price=change.new_price,
+                is_new_listing=change.old_price is None,
+            )
+            for change in changes
+        ]
+    )
@@ -1,17 +1,14 @@
+from datetime import datetime
 from typing import Annotated, Optional, Union
 
 import strawberry
 from pydantic import BaseModel, HttpUrl, field_validator
 from strawberry import LazyType
 
+from api.schedulers import PydanticScanSchedule
 from api.settings import settings
 from api.types.general import Error, InputValidationError
-
-
-class PydanticScanSchedule(BaseModel):
-    day_of_week: int
-    hour: int
-    minute: int
+from api.utils.scan_progress import ScanProgressStatus
 
 
 @strawberry.experimental.pydantic.input(model=PydanticScanSchedule)
@@ -53,3 +50,17 @@ AdhocScanResponse = Annotated[
     Union[InputValidationError, ScanFailedError, ScanSucceeded],
     strawberry.union("AdhocScanResponse"),
 ]
+
+
+# Published by workers, which don't import strawberry
+strawberry.enum(ScanProgressStatus)
+
+
+@strawberry.type
+class ScanProgressType:
+    search_id: int
+    status: ScanProgressStatus
+    date: datetime
+    page: Optional[int] = None
+    total_pages: Optional[int] = None
+    message: Optional[str] = None
@@ -1,23 +1,37 @@
 from datetime import datetime, timedelta
+from enum import Enum
 from typing import Annotated, List, Optional, Union
 
 import strawberry
 from pydantic import BaseModel
-from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from strawberry import LazyType
 
 from api.models.search import Search, decode_url
+from api.schedulers import PydanticScanSchedule
 from api.types.category import CategoryType, convert_category_from_db
-from api.types.event_stats import EventStatsType, NoPricesFoundError
-from api.types.general import Error, InputValidationError
-from api.types.scan import PydanticScanSchedule, ScanSchedule
+from api.types.event_stats import (
+    EventStatsType,
+    NoPricesFoundError,
+    convert_event_stats,
+)
+from api.types.general import (
+    Error,
+    InputValidationError,
+    InvalidCursorError,
+    PageInfo,
+    PageSizeOutOfRangeError,
+)
+from api.types.price import PriceChangesType
+from api.types.scan import ScanSchedule
+from api.utils.pagination import encode_cursor
 from api.utils.search import (
-    get_last_failures,
-    get_last_successes,
     get_search_events_for_search,
+    get_search_failure_buckets,
     get_search_failures,
     get_search_stats,
+    get_search_statuses,
+    get_search_success_buckets,
     get_search_successes,
 )
 
@@ -27,6 +41,8 @@ class SearchStatsInput:
     id: Optional[int] = strawberry.UNSET
     date_from: Optional[datetime] = strawberry.UNSET
     date_to: Optional[datetime] = strawberry.UNSET
+    # Count near duplicate listings of the same estate once
+    dedupe: bool = False
 
 
 class PydanticEditScheduleInput(BaseModel):
@@ -48,6 +64,10 @@ class EditScheduleInput:
 @strawberry.input
 class SearchEventsStatsInput:
     id: Optional[int] = strawberry.UNSET
+    first: Optional[int] = None
+    after: Optional[str] = None
+    # Count near duplicate listings of the same estate once
+    dedupe: bool = False
 
 
 @strawberry.experimental.pydantic.type(Search)
@@ -92,18 +112,25 @@ class SearchType:
 @strawberry.type
 class SearchesType:
     searches: List[SearchType]
+    page_info: PageInfo
     favorite_id: Optional[int] = None
 
 
 @strawberry.type
 class SearchEventsStatsType:
     search_events: List[EventStatsType]
+    page_info: PageInfo
 
 
 @strawberry.type
 class SearchStatusType:
     id: int
     status: str
+    last_success: Optional[datetime] = None
+    last_failure: Optional[datetime] = None
+    last_status_code: Optional[int] = None
+    consecutive_failures: int = 0
+    last_duration: Optional[float] = None
 
 
 @strawberry.type
@@ -136,9 +163,44 @@ class SearchFailRateType:
     successes: list[SearchSuccessesType]
 
 
+@strawberry.enum
+class FailRateBucket(Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+
+@strawberry.type
+class StatusCodeCountType:
+    status: int
+    count: int
+
+
+@strawberry.type
+class FailRateBucketType:
+    start: datetime
+    successes: int
+    failures: int
+    statuses: list[StatusCodeCountType]
+
+
+@strawberry.type
+class SearchFailRateBucketsType:
+    search_id: int
+    buckets: list[FailRateBucketType]
+
+
+@strawberry.type
+class SearchFailRateHistogramType:
+    bucket: FailRateBucket
+    searches: list[SearchFailRateBucketsType]
+
+
 @strawberry.input
 class SearchFailRateInput:
     days: int
+    # Aggregate in the database instead of returning every scan
+    bucket: Optional[FailRateBucket] = None
 
 
 async def convert_search_stats_from_db(
@@ -146,9 +208,14 @@ async def convert_search_stats_from_db(
     search: Search,
     date_from: datetime = datetime.utcnow() - timedelta(days=365),
     date_to: datetime = datetime.utcnow(),
+    dedupe: bool = False,
 ) -> SearchStatsType:
     search_events = await get_search_events_for_search(
-        session=session, search=search, date_from=date_from, date_to=date_to
+        session=session,
+        search=search,
+        date_from=date_from,
+        date_to=date_to,
+        dedupe=dedupe,
     )
     search_stats = get_search_stats(search_events)
     return SearchStatsType(
@@ -168,12 +235,12 @@ async def convert_search_stats_from_db(
         ),
         avg_area_total=search_stats.get("avg_area_total"),
         avg_terrain_total=search_stats.get("avg_terrain_total"),
-        events=search_events,
+        events=[convert_event_stats(stats) for stats in search_events],
     )
 
 
 def convert_searches_from_db(
-    searches: list[Search],
+    searches: list[Search], has_next_page: bool = False
 ) -> SearchesType:
     converted = []
     for search in searches:
@@ -196,30 +263,30 @@ def convert_searches_from_db(
                 schedule=schedule,
             )
         )
-    return SearchesType(searches=converted)
+    end_cursor = encode_cursor(searches[-1].id) if searches else None  # type: ignore
+    return SearchesType(
+        searches=converted,
+        page_info=PageInfo(has_next_page=has_next_page, end_cursor=end_cursor),
+    )
 
 
 async def get_last_statuses(session: AsyncSession) -> SearchesStatusType:
     statuses = []
-    last_failures = await get_last_failures(session)
-    last_successes = await get_last_successes(session)
-    all_searches_ids = (await session.exec(select(Search.id))).all()
-    for id in all_searches_ids:
-        if not isinstance(id, int):
-            continue
-        if not (id in last_successes or id in last_failures):
+    for id, search_status in await get_search_statuses(session):
+        if search_status is None:
             statuses.append(SearchStatusType(id=id, status="unknown"))
-        elif id not in last_failures:
-            statuses.append(SearchStatusType(id=id, status="success"))
-        elif id not in last_successes:
-            statuses.append(SearchStatusType(id=id, status="failed"))
-        else:
-            last_failed = last_failures.get(id)
-            last_success = last_successes.get(id)
-            status = (
-                "success" if last_success > last_failed else "failed"  # type: ignore
+            continue
+        statuses.append(
+            SearchStatusType(
+                id=id,
+                status=search_status.status,
+                last_success=search_status.last_success,
+                last_failure=search_status.last_failure,
+                last_status_code=search_status.last_status_code,
+                consecutive_failures=search_status.consecutive_failures,
+                last_duration=search_status.last_duration,
             )
-            statuses.append(SearchStatusType(id=id, status=status))
+        )
     return SearchesStatusType(statuses=statuses)
 
 
@@ -249,6 +316,33 @@ async def convert_search_fail_rate(
     return SearchFailRateType(failures=all_failures, successes=successes)
 
 
+async def convert_search_fail_rate_histogram(
+    session: AsyncSession, days: int, bucket: FailRateBucket
+) -> SearchFailRateHistogramType:
+    successes_db = await get_search_success_buckets(session, days, bucket.value)
+    failures_db = await get_search_failure_buckets(session, days, bucket.value)
+    searches = []
+    for search_id in sorted(successes_db.keys() | failures_db.keys()):
+        search_successes = successes_db.get(search_id, {})
+        search_failures = failures_db.get(search_id, {})
+        buckets = []
+        for start in sorted(search_successes.keys() | search_failures.keys()):
+            statuses = search_failures.get(start, {})
+            buckets.append(
+                FailRateBucketType(
+                    start=start,
+                    successes=search_successes.get(start, 0),
+                    failures=sum(statuses.values()),
+                    statuses=[
+                        StatusCodeCountType(status=status, count=count)
+                        for status, count in sorted(statuses.items())
+                    ],
+                )
+            )
+        searches.append(SearchFailRateBucketsType(search_id=search_id, buckets=buckets))
+    return SearchFailRateHistogramType(bucket=bucket, searches=searches)
+
+
 @strawberry.type
 class FavoriteSearchDoesntExistError(Error):
     message: str = "Select your favorite search first"
@@ -290,7 +384,12 @@ GetSearchStatsResponse = Annotated[
 ]
 
 GetSearchesResponse = Annotated[
-    Union[SearchesType, NoSearchesAvailableError],
+    Union[
+        SearchesType,
+        NoSearchesAvailableError,
+        InvalidCursorError,
+        PageSizeOutOfRangeError,
+    ],
     strawberry.union("GetSearchesResponse"),
 ]
 
@@ -305,6 +404,8 @@ GetSearchEventsStatsResponse = Annotated[
         FavoriteSearchDoesntExistError,
         NoSearchEventError,
         NoPricesFoundError,
+        InvalidCursorError,
+        PageSizeOutOfRangeError,
     ],
     strawberry.union("GetSearchEventsStatsResponse"),
 ]
@@ -315,6 +416,11 @@ EditScheduleResponse = Annotated[
 ]
 
 SearchFailRateResponse = Annotated[
-    Union[SearchFailRateType, DaysOutOfRangeError],
+    Union[SearchFailRateType, SearchFailRateHistogramType, DaysOutOfRangeError],
     strawberry.union("SearchFailRateResponse"),
 ]
+
+PriceChangesResponse = Annotated[
+    Union[PriceChangesType, SearchDoesntExistError],
+    strawberry.union("PriceChangesResponse"),
+]
@@ -1,14 +1,35 @@
+import asyncio
 from functools import wraps
-from typing import Any, Callable, Coroutine, ParamSpec, TypeVar
+from typing import Any, Callable, Coroutine, Optional, ParamSpec, TypeVar
 
-from asgiref import sync
-from celery import Celery, Task, current_app as current_celery_app
+from celery import Celery, Task, current_app as current_celery_app, signals
+from kombu import Queue
+from loguru import logger
 
+from api.database import close_connections, get_engine
 from api.settings import settings
+from api.utils.fetching import close_http_session, get_http_session
+from api.utils.metrics import start_worker_exporter, task_finished, task_started
+from api.utils.query_counter import collect_queries
+from api.utils.tracing import task_span
 
 _P = ParamSpec("_P")
 _R = TypeVar("_R")
 
+# Each queue has its own workers, so latency sensitive tasks never wait behind
+# a burst of scheduled scans, see config/backend/run_celery.sh
+INTERACTIVE_QUEUE = "interactive"
+SCHEDULED_QUEUE = "scheduled"
+MAINTENANCE_QUEUE = "maintenance"
+# Every task went to Celery's default queue before the split, the scheduled
+# workers drain what is left in it. Drop it in the next release.
+LEGACY_QUEUE = "celery"
+# The Redis transport keeps a list per step and serves the lowest one first
+PRIORITY_STEPS = [0, 3, 6, 9]
+HIGH_PRIORITY = 0
+DEFAULT_PRIORITY = 6
+LOW_PRIORITY = 9
+
 
 def create_celery() -> Celery:
     celery_app = current_celery_app
@@ -18,19 +39,125 @@ def create_celery() -> Celery:
             "task": "api.periodic_tasks.verify_ip",
             "schedule": 3600.0,
         },
+        "maintain_partitions": {
+            "task": "api.periodic_tasks.maintain_partitions",
+            "schedule": 86400.0,
+        },
+    }
+    celery_app.conf.task_queues = [
+        Queue(INTERACTIVE_QUEUE),
+        Queue(SCHEDULED_QUEUE),
+        Queue(MAINTENANCE_QUEUE),
+        Queue(LEGACY_QUEUE),
+    ]
+    celery_app.conf.task_default_queue = SCHEDULED_QUEUE
+    celery_app.conf.task_default_priority = DEFAULT_PRIORITY
+    celery_app.conf.task_routes = {
+        "api.periodic_tasks.run_periodic_scan": {"queue": SCHEDULED_QUEUE},
+        # The proxy rejects every scan until the new IP address is registered
+        "api.periodic_tasks.verify_ip": {
+            "queue": INTERACTIVE_QUEUE,
+            "priority": HIGH_PRIORITY,
+        },
+        "api.periodic_tasks.maintain_partitions": {
+            "queue": MAINTENANCE_QUEUE,
+            "priority": LOW_PRIORITY,
+        },
+    }
+    celery_app.conf.broker_transport_options = {
+        "queue_order_strategy": "priority",
+        "priority_steps": PRIORITY_STEPS,
+        "sep": ":",
     }
+    # A scan takes minutes, a prefetched task would wait behind the running one
+    # instead of going to an idle worker
+    celery_app.conf.worker_prefetch_multiplier = 1
     return celery_app
 
 
+# Event loop of the worker process, every task runs on it so connections pooled
+# by the engine, Redis and the HTTP session outlive the task that opened them
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+
 def async_task(app: Celery, *args: Any, **kwargs: Any) -> Task:
     def _decorator(func: Callable[_P, Coroutine[Any, Any, _R]]) -> Task:
-        sync_call = sync.AsyncToSync(func)
+        @wraps(func)
+        async def _traced(
+            *args: Any, trace_context: Optional[dict[str, str]] = None, **kwargs: Any
+        ) -> _R:
+            with task_span(func.__name__, trace_context), collect_queries() as queries:
+                result = await func(*args, **kwargs)
+            logger.info(
+                f"{func.__name__} ran {queries.count} SQL statements "
+                f"in {queries.seconds:.3f}s"
+            )
+            return result
 
         @app.task(*args, **kwargs)  # type: ignore
         @wraps(func)
         def _decorated(*args: _P.args, **kwargs: _P.kwargs) -> _R:
-            return sync_call(*args, **kwargs)
+            return get_worker_loop().run_until_complete(
+                _traced(*args, **kwargs)  # type: ignore[arg-type]
+            )
 
         return _decorated
 
     return _decorator
+
+
+@signals.worker_process_init.connect  # type: ignore
+def setup_worker_process(**kwargs: Any) -> None:
+    """Creates the event loop, engine and HTTP session shared by the tasks of
+    a worker process"""
+    # Pooled connections inherited from the parent belong to it
+    if get_engine.cache_info().currsize:
+        get_engine().sync_engine.dispose(close=False)
+        get_engine.cache_clear()
+    get_worker_loop()
+    get_engine()
+    get_http_session()
+
+
+@signals.worker_process_shutdown.connect  # type: ignore
+@signals.worker_shutdown.connect  # type: ignore
+def shutdown_worker_process(**kwargs: Any) -> None:
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+    _worker_loop.run_until_complete(close_connections())
+    _worker_loop.run_until_complete(_worker_loop.shutdown_asyncgens())
+    _worker_loop.close()
+    close_http_session()
+
+
+@signals.worker_init.connect  # type: ignore
+def start_metrics_exporter(sender: Any, **kwargs: Any) -> None:
+    if not settings.worker_metrics_port:
+        return
+    # Every declared queue, not only the ones consumed by this worker
+    queues = sender.app.amqp.queues
+    start_worker_exporter(
+        settings.worker_metrics_port,
+        settings.celery_broker_url,
+        lambda: list(queues),
+        PRIORITY_STEPS,
+    )
+
+
+@signals.task_prerun.connect  # type: ignore
+def record_task_start(task_id: str, **kwargs: Any) -> None:
+    task_started(task_id)
+
+
+@signals.task_postrun.connect  # type: ignore
+def record_task_end(task_id: str, task: Task, state: str, **kwargs: Any) -> None:
+    task_finished(task_id, task.name, state)
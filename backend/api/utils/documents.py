@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from typing import Generic, Iterator, Optional, TypeVar
+
+from graphql import DocumentNode
+from strawberry.extensions import SchemaExtension
+
+from api.settings import settings
+
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+
+class LRUCache(Generic[_K, _V]):
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._items: OrderedDict[_K, _V] = OrderedDict()
+
+    def get(self, key: _K) -> Optional[_V]:
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key: _K, value: _V) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# Query text -> document that parsed and passed validation
+documents: LRUCache[str, DocumentNode] = LRUCache(settings.graphql_document_cache_size)
+
+
+class DocumentCache(SchemaExtension):
+    """Skips parsing and validation of documents seen before.
+
+    Only valid documents are cached, the validation rules don't depend on
+    variables, so a document valid once stays valid.
+    """
+
+    cached = False
+
+    def on_parse(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        if execution_context.query is not None and (
+            document := documents.get(execution_context.query)
+        ):
+            execution_context.graphql_document = document
+            self.cached = True
+        yield
+
+    def on_validate(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        if self.cached:
+            # Strawberry (0.217, _run_validation) only validates when errors
+            # are still None, test_document_cache fails if that changes
+            execution_context.errors = []
+        yield
+        if (
+            not self.cached
+            and not execution_context.errors
+            and execution_context.query is not None
+            and execution_context.graphql_document is not None
+        ):
+            documents.put(execution_context.query, execution_context.graphql_document)
@@ -0,0 +1,231 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import REAL, and_, cast, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.models.estate import Estate
+from api.models.estate_fingerprint import EstateFingerprint, EstateLshBucket
+from api.models.price import Price
+from api.utils.minhash import (
+    DUPLICATE_THRESHOLD,
+    estimate_similarity,
+    get_lsh_buckets,
+    get_signature,
+)
+from api.utils.sql import PointDistance, PointInBox, TextDistance
+
+# Trigrams need at least that many characters to use the index
+MIN_SEARCH_WORD_LENGTH = 3
+
+
+def get_search_words(text: str) -> list[str]:
+    return [word for word in text.split() if len(word) >= MIN_SEARCH_WORD_LENGTH]
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def get_existing_estate_ids(
+    session: AsyncSession, estate_ids: Sequence[int]
+) -> set[int]:
+    query = select(Estate.id).where(Estate.id.in_(estate_ids))  # type: ignore
+    return set((await session.exec(query)).all())
+
+
+async def get_estates_price_history(
+    session: AsyncSession,
+    estate_ids: Sequence[int],
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> dict[int, list[tuple[datetime, int, Optional[int]]]]:
+    # Only columns stored in ix_price_estate_id_date, so postgres can answer
+    # with an index only scan
+    query = (
+        select(Price.estate_id, Price.date, Price.price, Price.price_per_square_meter)
+        .where(Price.estate_id.in_(estate_ids))  # type: ignore
+        .order_by(Price.estate_id, Price.date)  # type: ignore
+    )
+    if date_from is not None:
+        query = query.where(Price.date >= date_from)
+    if date_to is not None:
+        query = query.where(Price.date <= date_to)
+    history: dict[int, list[tuple[datetime, int, Optional[int]]]] = defaultdict(list)
+    for estate_id, date, price, price_per_square_meter in (
+        await session.exec(query)
+    ).all():
+        history[estate_id].append((date, price, price_per_square_meter))  # type: ignore
+    return history
+
+
+async def get_estates_in_box(
+    session: AsyncSession,
+    sw_lat: float,
+    sw_lng: float,
+    ne_lat: float,
+    ne_lng: float,
+    first: int,
+    after: Optional[int] = None,
+) -> Sequence[Estate]:
+    query = (
+        select(Estate)
+        .where(
+            PointInBox(
+                Estate.longitude, Estate.latitude, sw_lng, sw_lat, ne_lng, ne_lat
+            )
+        )
+        .order_by(Estate.id)  # type: ignore
+        # Fetch one more row to tell whether there is a next page
+        .limit(first + 1)
+    )
+    if after is not None:
+        query = query.where(Estate.id > after)
+    return (await session.exec(query)).all()
+
+
+async def get_nearest_estates(
+    session: AsyncSession, latitude: float, longitude: float, first: int
+) -> Sequence[Estate]:
+    query = (
+        select(Estate)
+        .where(
+            Estate.latitude.is_not(None),  # type: ignore
+            Estate.longitude.is_not(None),  # type: ignore
+        )
+        .order_by(PointDistance(Estate.longitude, Estate.latitude, longitude, latitude))
+        .limit(first)
+    )
+    return (await session.exec(query)).all()
+
+
+async def search_estates(
+    session: AsyncSession,
+    text: str,
+    first: int,
+    after: Optional[tuple[float, int]] = None,
+    city: Optional[str] = None,
+    province: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+) -> list[tuple[Estate, float]]:
+    distance = TextDistance(text, Estate.search_text)
+    query = (
+        select(Estate, distance).where(
+            *(
+                Estate.search_text.ilike(  # type: ignore
+                    f"%{escape_like(word)}%", escape="\\"
+                )
+                for word in get_search_words(text)
+            )
+        )
+        # Nearest first, read from the index instead of sorting every match
+        .order_by(distance, Estate.id)  # type: ignore
+        # Fetch one more row to tell whether there is a next page
+        .limit(first + 1)
+    )
+    if city is not None:
+        query = query.where(Estate.city == city)
+    if province is not None:
+        query = query.where(Estate.province == province)
+    if min_price is not None:
+        query = query.where(Estate.last_price >= min_price)  # type: ignore
+    if max_price is not None:
+        query = query.where(Estate.last_price <= max_price)  # type: ignore
+    if after is not None:
+        after_distance, after_id = after
+        # The distance is a REAL and the cursor keeps it digit for digit, cast
+        # back it compares equal to the last estate's
+        after_value = cast(after_distance, REAL)
+        query = query.where(
+            or_(
+                distance > after_value,
+                and_(distance == after_value, Estate.id > after_id),  # type: ignore
+            )
+        )
+    results = (await session.exec(query)).all()
+    return [(estate, estate_distance) for estate, estate_distance in results]
+
+
+# (estate id, signature, id of the listing it duplicates or its own id)
+DuplicateCandidate = tuple[int, list[int], int]
+
+
+async def get_duplicate_candidates(
+    session: AsyncSession, buckets: set[int]
+) -> dict[int, list[DuplicateCandidate]]:
+    query = (
+        select(
+            EstateLshBucket.bucket,
+            EstateFingerprint.estate_id,
+            EstateFingerprint.signature,
+            Estate.duplicate_of_id,
+        )
+        .join(
+            EstateFingerprint,
+            EstateFingerprint.estate_id == EstateLshBucket.estate_id,  # type: ignore
+        )
+        .join(Estate, Estate.id == EstateLshBucket.estate_id)  # type: ignore
+        .where(EstateLshBucket.bucket.in_(buckets))  # type: ignore
+    )
+    candidates: dict[int, list[DuplicateCandidate]] = defaultdict(list)
+    for bucket, estate_id, signature, duplicate_of_id in (
+        await session.exec(query)
+    ).all():
+        candidates[bucket].append(
+            (estate_id, list(signature), duplicate_of_id or estate_id)
+        )
+    return candidates
+
+
+def find_duplicate(
+    signature: list[int], candidates: Iterable[DuplicateCandidate]
+) -> Optional[int]:
+    best_similarity, duplicate_of_id = DUPLICATE_THRESHOLD, None
+    for _, candidate_signature, canonical_id in candidates:
+        similarity = estimate_similarity(signature, candidate_signature)
+        if similarity >= best_similarity:
+            best_similarity, duplicate_of_id = similarity, canonical_id
+    return duplicate_of_id
+
+
+async def link_duplicate_estates(
+    session: AsyncSession, estates: Sequence[tuple[Estate, Optional[float]]]
+) -> None:
+    """Fingerprint new estates and point near duplicates at the earliest listing
+
+    Only estates sharing an LSH bucket are compared, so the cost doesn't grow with
+    the number of stored listings.
+    """
+    fingerprints = {}
+    for estate, area in estates:
+        signature = get_signature(estate.title, estate.location, area)
+        fingerprints[estate.id] = (signature, set(get_lsh_buckets(signature, area)))
+    buckets = {bucket for _, keys in fingerprints.values() for bucket in keys}
+    if not buckets:
+        return
+    # Flushing here would insert the estates before duplicate_of_id is known
+    with session.no_autoflush:
+        candidates = await get_duplicate_candidates(session, buckets)
+    for estate, _ in estates:
+        signature, keys = fingerprints[estate.id]
+        estate.duplicate_of_id = find_duplicate(
+            signature,
+            (
+                candidate
+                for bucket in keys
+                for candidate in candidates.get(bucket, [])
+                if candidate[0] != estate.id
+            ),
+        )
+        session.add(EstateFingerprint(estate_id=estate.id, signature=signature))
+        session.add_all(
+            EstateLshBucket(bucket=bucket, estate_id=estate.id) for bucket in keys
+        )
+        # Later estates of the same scan can duplicate this one
+        for bucket in keys:
+            candidates[bucket].append(
+                (estate.id, signature, estate.duplicate_of_id or estate.id)
+            )
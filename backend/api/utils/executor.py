@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional, TypeVar
+
+from api.utils.metrics import (
+    EXECUTOR_QUEUED,
+    EXECUTOR_RUN_SECONDS,
+    EXECUTOR_RUNNING,
+    EXECUTOR_WAIT_SECONDS,
+)
+
+_R = TypeVar("_R")
+
+
+@dataclass
+class ExecutorStats:
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    run_seconds_total: float = 0.0
+
+
+class MeteredExecutor:
+    """Fixed size thread pool for blocking work, records how long calls queue.
+
+    The numbers are exported to /metrics labelled by the pool name, stats()
+    returns the ones of this process.
+    """
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = ExecutorStats()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use, so forked workers don't inherit its threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=self.name
+            )
+        return self._executor
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return asdict(self._stats)
+
+    def _call(self, queued_at: float, func: Callable[..., _R], *args: Any) -> _R:
+        started_at = time.perf_counter()
+        wait = started_at - queued_at
+        with self._lock:
+            self._stats.queued -= 1
+            self._stats.running += 1
+            self._stats.wait_seconds_total += wait
+            self._stats.wait_seconds_max = max(self._stats.wait_seconds_max, wait)
+        EXECUTOR_QUEUED.labels(self.name).dec()
+        EXECUTOR_RUNNING.labels(self.name).inc()
+        EXECUTOR_WAIT_SECONDS.labels(self.name).observe(wait)
+        try:
+            return func(*args)
+        finally:
+            duration = time.perf_counter() - started_at
+            with self._lock:
+                self._stats.running -= 1
+                self._stats.completed += 1
+                self._stats.run_seconds_total += duration
+            EXECUTOR_RUNNING.labels(self.name).dec()
+            EXECUTOR_RUN_SECONDS.labels(self.name).observe(duration)
+
+    async def run(self, func: Callable[..., _R], *args: Any) -> _R:
+        with self._lock:
+            self._stats.queued += 1
+        EXECUTOR_QUEUED.labels(self.name).inc()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._call, time.perf_counter(), func, *args
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
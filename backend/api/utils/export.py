@@ -0,0 +1,146 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Select, and_, literal
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.models.estate import Estate
+from api.models.price import Price
+from api.models.search_event import SearchEvent
+from api.settings import settings
+
+# Rows fetched from the server side cursor (and parquet row group size)
+EXPORT_CHUNK_SIZE = 10000
+EXPORT_COLUMNS = (
+    ("search_event_id", pa.int64()),
+    ("date", pa.timestamp("us")),
+    ("estate_id", pa.int64()),
+    ("title", pa.string()),
+    ("street", pa.string()),
+    ("city", pa.string()),
+    ("province", pa.string()),
+    ("location", pa.string()),
+    ("url", pa.string()),
+    ("price", pa.int64()),
+    ("price_per_square_meter", pa.int64()),
+    ("area_in_square_meters", pa.int64()),
+    ("terrain_area_in_square_meters", pa.int64()),
+)
+
+
+def get_export_query(
+    search_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Select[Any]:
+    query = (
+        select(  # type: ignore
+            SearchEvent.id,
+            SearchEvent.date,
+            Estate.id,
+            Estate.title,
+            Estate.street,
+            Estate.city,
+            Estate.province,
+            Estate.location,
+            literal(f"{settings.base_url}pl/oferta/").concat(Estate.url),
+            Price.price,
+            Price.price_per_square_meter,
+            Price.area_in_square_meters,
+            Price.terrain_area_in_square_meters,
+        )
+        .select_from(Price)
+        .join(
+            SearchEvent,
+            # Matches the partitioned foreign key, so postgres joins partition-wise
+            and_(
+                Price.search_event_id == SearchEvent.id,  # type: ignore
+                Price.date == SearchEvent.date,  # type: ignore
+            ),
+        )
+        .join(Estate, Price.estate_id == Estate.id)
+        .where(SearchEvent.search_id == search_id)
+        .order_by(SearchEvent.date, SearchEvent.id, Price.id)
+    )
+    if date_from is not None:
+        query = query.where(SearchEvent.date >= date_from)
+    if date_to is not None:
+        query = query.where(SearchEvent.date <= date_to)
+    return query  # type: ignore
+
+
+async def stream_export_rows(
+    session_maker: Callable[[], AsyncSession], query: Select[Any]
+) -> AsyncIterator[Sequence[Any]]:
+    """Yield chunks of rows without loading the whole result into memory"""
+    async with session_maker() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+
+def _export_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def stream_csv(rows: AsyncIterator[Sequence[Any]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in EXPORT_COLUMNS)
+    async for chunk in rows:
+        writer.writerows([_export_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+class ChunkedSink(io.RawIOBase):
+    """Write-only file which hands out everything written since the last drain.
+
+    The parquet writer keeps track of offsets with tell(), so the position keeps
+    growing even though the written bytes are released.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self.chunks.append(chunk)
+        self.position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def stream_parquet(rows: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    schema = pa.schema(EXPORT_COLUMNS)
+    sink = ChunkedSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        async for chunk in rows:
+            # One row group per chunk
+            writer.write_table(
+                pa.Table.from_pylist(
+                    [dict(zip(schema.names, row)) for row in chunk], schema=schema
+                )
+            )
+            yield sink.drain()
+    yield sink.drain()
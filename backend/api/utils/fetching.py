@@ -1,5 +1,6 @@
 import asyncio
 import random
+import time
 from typing import Any
 
 import lxml.html
@@ -7,10 +8,13 @@ from curl_cffi import requests
 from loguru import logger
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from api.database import get_cache
+from api.database import get_async_cache
 from api.models.scan_failure import ScanFailure
 from api.settings import settings
+from api.utils.metrics import FETCH_RETRIES, observe_fetch
+from api.utils.scan_progress import ScanProgressStatus, publish_scan_progress
 from api.utils.search import get_search_id_by_url
+from api.utils.tracing import traced, tracer
 
 HEADERS = {
     "user-agent": (
@@ -28,17 +32,44 @@ HEADERS = {
 
 BROWSERS = ["chrome120", "edge101", "safari17_0"]
 
-cache = get_cache()
 
+_http_session: requests.Session | None = None
 
-def extract_token(html_body: str) -> None:
+
+def get_http_session() -> requests.Session:
+    """Session of the process, scans reuse its connections to the proxy"""
+    global _http_session
+    if _http_session is None:
+        _http_session = requests.Session(impersonate="chrome120")
+    return _http_session
+
+
+def replace_http_session(
+    blocked_session: requests.Session, session: requests.Session
+) -> None:
+    """Later scans of the process don't go back to a blocked session"""
+    global _http_session
+    # Not closed, scans paginating with it may still hold it
+    if blocked_session is _http_session:
+        _http_session = session
+
+
+def close_http_session() -> None:
+    global _http_session
+    if _http_session is not None:
+        _http_session.close()
+        _http_session = None
+
+
+async def extract_token(html_body: str) -> None:
     parser = lxml.html.fromstring(html_body)
     parsed = parser.xpath('//script[contains(@src, "Manifest.js")]/@src')
     extracted_url = next(iter(parsed), "/")
     token = extracted_url.split("/")[-2]
-    cache.set("token", token)
+    await get_async_cache().set("token", token)
 
 
+@traced("make_request")
 async def make_request(
     url: str,
     wait_before_request: int = 0,
@@ -46,14 +77,19 @@ async def make_request(
     last_status_code: int | None = None,
 ) -> tuple[int, dict[str, Any], requests.Session | None]:
     await wait_before_first_request(wait_before_request)
-    formatted_url = get_formatted_url(url)
+    token, retries = await get_request_state(url)
+    formatted_url = url.format(api_key=token)
     logger.info(f"Sending request to {formatted_url}")
-    retries = get_number_of_retries(url)
-    session = session or requests.Session(impersonate="chrome120")
+    session = session or get_http_session()
+    started = time.perf_counter()
     try:
-        resp = session.get(formatted_url, proxies={"https": settings.dc1_url})
+        with tracer.start_as_current_span("fetch") as span:
+            resp = session.get(formatted_url, proxies={"https": settings.dc1_url})
+            span.set_attribute("http.status_code", resp.status_code)
     except requests.errors.RequestsError:
+        observe_fetch("error", time.perf_counter() - started)
         return 401, {}, None
+    observe_fetch(resp.status_code, time.perf_counter() - started)
     if (resp.status_code in (404, 403) and retries < 4) or (
         resp.status_code == 404 and last_status_code == 403 and retries < 7
     ):
@@ -62,40 +98,36 @@ async def make_request(
         )
         delay = random.randint(20, 40)
         logger.info(f"waiting for {delay} seconds...")
-        cache.incr(f"retried_{url}", 1)
-        await asyncio.sleep(delay)
+        await get_async_cache().incr(f"retried_{url}", 1)
+        FETCH_RETRIES.labels(str(resp.status_code)).inc()
+        await sleep(delay)
         if resp.status_code == 403:
-            return await handle_403_response(url)
+            return await handle_403_response(url, session)
         body = resp.text
-        extract_token(body)
+        await extract_token(body)
         return await make_request(url, session=session, last_status_code=404)
-    clean_cached_retries(url)
+    await get_async_cache().delete(f"retried_{url}")
     if resp.status_code != 200:
         return resp.status_code, {}, None
     return handle_successful_scan(resp, session, url)
 
 
-def get_formatted_url(url: str) -> str:
-    token = cache.get("token") or ""
-    return url.format(api_key=token)
-
-
-def get_number_of_retries(url: str) -> int:
-    retries = cache.get(f"retried_{url}") or 0
-    if not isinstance(retries, int):
-        retries = int(retries)  # type: ignore
-    return retries
+async def get_request_state(url: str) -> tuple[str, int]:
+    """API token and the number of retries of the url, in one round trip"""
+    token, retries = await get_async_cache().mget("token", f"retried_{url}")
+    return token or "", int(retries or 0)
 
 
 async def handle_403_response(
-    url: str,
+    url: str, blocked_session: requests.Session
 ) -> tuple[int, dict[str, Any], requests.Session | None]:
     # For blocked requests wait longer and try other browser
     delay = random.randint(20, 40)
     new_session = requests.Session(impersonate=random.choice(BROWSERS))
+    replace_http_session(blocked_session, new_session)
     logger.info(f"waiting for {delay} seconds due to blocked request...")
-    await asyncio.sleep(delay)
-    cache.set("token", "")
+    await sleep(delay)
+    await get_async_cache().set("token", "")
     return await make_request(url, session=new_session, last_status_code=403)
 
 
@@ -110,15 +142,15 @@ def handle_successful_scan(
     return 200, body, session
 
 
-def clean_cached_retries(url: str) -> None:
-    if cache.get(f"retried_{url}"):
-        cache.delete(f"retried_{url}")
-
-
 async def wait_before_first_request(wait_time: int) -> None:
     if wait_time > 0:
         logger.info(f"waiting for {wait_time} seconds before next request...")
-        await asyncio.sleep(wait_time)
+        await sleep(wait_time)
+
+
+@traced("sleep")
+async def sleep(seconds: int) -> None:
+    await asyncio.sleep(seconds)
 
 
 async def report_failure(
@@ -143,3 +175,8 @@ async def handle_failed_scan(
         await report_failure(
             session=session, status_code=status_code, search_id=search_id
         )
+        await publish_scan_progress(
+            search_id,
+            ScanProgressStatus.FAILED,
+            message=f"Scan has failed with {status_code} status code.",
+        )
@@ -0,0 +1,103 @@
+import time
+from inspect import isawaitable
+from typing import Any, Awaitable, Callable, Generator, Optional
+
+from graphql import GraphQLResolveInfo
+from opentelemetry.trace import SpanKind
+from prometheus_client import Histogram
+from strawberry.extensions import SchemaExtension
+from strawberry.extensions.base_extension import LifecycleStep
+from strawberry.extensions.tracing import OpenTelemetryExtension
+from strawberry.extensions.tracing.utils import should_skip_tracing
+
+from api.utils.metrics import RESOLVER_SECONDS
+from api.utils.query_counter import QueryStats, collect_queries
+
+# Kept apart from metrics, tracing and query_counter, so Celery workers using
+# those don't import Strawberry
+
+
+class ResolverMetrics(SchemaExtension):
+    """Records the duration of every resolver that isn't a plain attribute"""
+
+    def resolve(
+        self,
+        _next: Callable[..., Any],
+        root: Any,
+        info: GraphQLResolveInfo,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        if should_skip_tracing(_next, info):
+            return _next(root, info, *args, **kwargs)
+        histogram = RESOLVER_SECONDS.labels(info.parent_type.name, info.field_name)
+        started = time.perf_counter()
+        result = _next(root, info, *args, **kwargs)
+        if isawaitable(result):
+            return observe_awaitable(result, histogram, started)
+        histogram.observe(time.perf_counter() - started)
+        return result
+
+
+async def observe_awaitable(
+    result: Awaitable[Any], histogram: Histogram, started: float
+) -> Any:
+    try:
+        return await result
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+class QueryCounter(SchemaExtension):
+    """Reports the statements an operation ran in the response extensions"""
+
+    stats: Optional[QueryStats] = None
+
+    def on_operation(self) -> Generator[None, None, None]:
+        with collect_queries() as self.stats:
+            yield
+
+    def get_results(self) -> dict[str, Any]:
+        if self.stats is None:
+            return {}
+        return {
+            "sql": {
+                "queries": self.stats.count,
+                "seconds": round(self.stats.seconds, 4),
+            }
+        }
+
+
+class GraphQLTracing(OpenTelemetryExtension):
+    """Spans of GraphQL operations and resolvers.
+
+    The query text is left out and only scalar arguments are kept, both may
+    contain passwords.
+    """
+
+    def __init__(self, *, execution_context: Any = None) -> None:
+        super().__init__(
+            execution_context=execution_context, arg_filter=filter_arguments
+        )
+        # Strawberry keeps the spans on the class, shared by concurrent requests
+        self._span_holder = {}
+
+    def on_operation(self) -> Generator[None, None, None]:
+        span = self._tracer.start_span("GraphQL Operation", kind=SpanKind.SERVER)
+        span.set_attribute("component", "graphql")
+        self._span_holder[LifecycleStep.OPERATION] = span
+        yield
+        # Known once the document is parsed
+        if operation_name := self.execution_context.operation_name:
+            span.update_name(f"GraphQL Operation: {operation_name}")
+        span.end()
+
+
+def filter_arguments(
+    arguments: dict[str, Any], info: GraphQLResolveInfo
+) -> dict[str, Any]:
+    return {
+        name: value
+        for name, value in arguments.items()
+        if isinstance(value, (bool, int, float, str)) and "password" not in name
+    }
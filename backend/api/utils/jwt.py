@@ -1,9 +1,12 @@
+import asyncio
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
-from fastapi import Request
+from fastapi.requests import HTTPConnection
 from jose import JWTError, jwt
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -14,6 +17,9 @@ JWT_UNAUTHORIZED_MSG = "401_UNAUTHORIZED"
 JWT_EXPIRED_MSG = "JWT_EXPIRED"
 JWT_AUTH_HEADER_PREFIX = "Bearer"
 
+# sub -> jti -> (expiry, user columns), see settings.user_cache_ttl_seconds
+_user_cache: dict[str, dict[str, tuple[float, dict[str, Any]]]] = {}
+
 
 class PermissionDeniedError(Exception):
     def __init__(self, message: str = JWT_UNAUTHORIZED_MSG):
@@ -95,11 +101,100 @@ async def get_user_from_token(
     return await get_user_from_payload(payload, session, refresh)
 
 
-def extract_token_from_request(request: Request) -> Optional[str]:
+def cache_user(payload: dict[str, Any], user: User) -> None:
+    now = time.monotonic()
+    tokens = _user_cache.setdefault(payload["sub"], {})
+    for jti in [jti for jti, (expiry, _) in tokens.items() if expiry <= now]:
+        del tokens[jti]
+    tokens[payload["jti"]] = (
+        now + settings.user_cache_ttl_seconds,
+        user.model_dump(),
+    )
+
+
+async def get_cached_user(
+    payload: dict[str, Any], session: AsyncSession
+) -> Optional[User]:
+    expiry, values = _user_cache.get(payload["sub"], {}).get(payload["jti"], (0.0, {}))
+    if expiry <= time.monotonic():
+        return None
+    user = User(**values)
+    make_transient_to_detached(user)
+    # Bound to the request's session without a query, like a loaded user
+    return await session.merge(user, load=False)
+
+
+def invalidate_cached_user(user_id: int | str) -> None:
+    _user_cache.pop(str(user_id), None)
+
+
+async def get_user_from_request_payload(
+    payload: dict[str, Any], session: AsyncSession, refresh: bool
+) -> User:
+    if not settings.user_cache_ttl_seconds:
+        return await get_user_from_payload(payload, session, refresh)
+    verify_token_type(payload["type"], refresh)
+    if user := await get_cached_user(payload, session):
+        return user
+    user = await get_user_from_payload(payload, session, refresh)
+    cache_user(payload, user)
+    return user
+
+
+def get_request_payload(context: dict[str, Any]) -> dict[str, Any]:
+    """Decoded token of the request, decoded once per request"""
+    if "token_payload" not in context:
+        token = extract_token_from_request(context["request"])
+        if not token:
+            token = extract_token_from_connection_params(
+                context.get("connection_params")
+            )
+        try:
+            if not token:
+                raise PermissionDeniedError()
+            context["token_payload"] = get_jwt_payload(token)
+        except PermissionDeniedError as error:
+            context["token_payload"] = error
+    payload = context["token_payload"]
+    if isinstance(payload, PermissionDeniedError):
+        raise payload
+    return payload  # type: ignore
+
+
+async def get_request_user(context: dict[str, Any], refresh: bool = False) -> User:
+    """User of the request's token, every protected field shares one lookup"""
+    users: dict[bool, asyncio.Future[User]] = context.setdefault("users", {})
+    if refresh not in users:
+        payload = get_request_payload(context)
+        # Fields are resolved concurrently, they all await the same lookup
+        users[refresh] = asyncio.ensure_future(
+            get_user_from_request_payload(payload, context["session"], refresh)
+        )
+    return await users[refresh]
+
+
+def extract_token_from_request(request: HTTPConnection) -> Optional[str]:
     auth = (
         request.headers.get("Authorization", "").split()
         or request.headers.get("authorization", "").split()
     )
+    return extract_token_from_auth(auth)
+
+
+def extract_token_from_connection_params(connection_params: Any) -> Optional[str]:
+    """Token of websocket clients that can't set headers, sent in the payload of
+    connection_init, as {"Authorization": "Bearer <token>"}"""
+    if not isinstance(connection_params, dict):
+        return None
+    auth = connection_params.get("Authorization") or connection_params.get(
+        "authorization"
+    )
+    if not isinstance(auth, str):
+        return None
+    return extract_token_from_auth(auth.split())
+
+
+def extract_token_from_auth(auth: list[str]) -> Optional[str]:
     prefix = JWT_AUTH_HEADER_PREFIX
 
     if len(auth) != 2 or auth[0].lower() != prefix.lower():
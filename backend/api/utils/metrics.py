@@ -0,0 +1,257 @@
+import os
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+import redis
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Processes started with PROMETHEUS_MULTIPROC_DIR set (gunicorn workers, prefork
+# Celery children) write their samples there and are merged when scraped.
+# The 403 rate is rate(plotstats_fetch_seconds_count{status_code="403"}) over
+# rate(plotstats_fetch_seconds_count).
+
+RESOLVER_SECONDS = Histogram(
+    "plotstats_graphql_resolver_seconds",
+    "Time spent in GraphQL resolvers",
+    ["type", "field"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERY_SECONDS = Histogram(
+    "plotstats_db_query_seconds",
+    "Duration of SQL statements",
+    ["engine", "operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+FETCH_SECONDS = Histogram(
+    "plotstats_fetch_seconds",
+    "Duration of requests for listing pages by response status code",
+    ["status_code"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+FETCH_RETRIES = Counter(
+    "plotstats_fetch_retries",
+    "Listing page requests retried by response status code",
+    ["status_code"],
+)
+SCAN_PAGES = Histogram(
+    "plotstats_scan_pages",
+    "Pages parsed per scan",
+    ["kind"],
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+SCAN_ADS = Histogram(
+    "plotstats_scan_ads",
+    "Ads ingested per scan",
+    ["kind"],
+    buckets=(0, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+SCAN_SECONDS = Histogram(
+    "plotstats_scan_seconds",
+    "Duration of scans including the waits between pages",
+    ["kind"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "plotstats_db_pool_connections",
+    "Open database connections of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "plotstats_db_pool_checked_out",
+    "Database connections in use",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTS = Counter(
+    "plotstats_db_pool_connects",
+    "Database connections opened, a high rate means the pool is too small",
+    ["engine"],
+)
+TASK_SECONDS = Histogram(
+    "plotstats_celery_task_seconds",
+    "Duration of Celery tasks by final state",
+    ["task", "state"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800),
+)
+EXECUTOR_QUEUED = Gauge(
+    "plotstats_executor_queued",
+    "Calls waiting for a thread of the pool",
+    ["executor"],
+    multiprocess_mode="livesum",
+)
+EXECUTOR_RUNNING = Gauge(
+    "plotstats_executor_running",
+    "Calls running in the pool",
+    ["executor"],
+    multiprocess_mode="livesum",
+)
+EXECUTOR_WAIT_SECONDS = Histogram(
+    "plotstats_executor_wait_seconds",
+    "Time calls waited for a thread of the pool, grows during login storms",
+    ["executor"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EXECUTOR_RUN_SECONDS = Histogram(
+    "plotstats_executor_run_seconds",
+    "Time calls ran in the pool",
+    ["executor"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+SQL_OPERATIONS = ("select", "insert", "update", "delete")
+
+# Celery task id -> time the task started
+_task_started: dict[str, float] = {}
+
+
+def get_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)  # type: ignore
+    return registry
+
+
+def collect_metrics() -> bytes:
+    return generate_latest(get_registry())
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Times every statement executed through the engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn: Any, *args: Any) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        conn: Any, cursor: Any, statement: str, *args: Any
+    ) -> None:
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(name, get_sql_operation(statement)).observe(duration)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context: Any) -> None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    """Tracks connections opened by the engine's pool and the ones in use"""
+    connections = DB_POOL_CONNECTIONS.labels(name)
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+
+    @event.listens_for(engine, "connect")
+    def connect(*args: Any) -> None:
+        DB_POOL_CONNECTS.labels(name).inc()
+        connections.inc()
+
+    @event.listens_for(engine, "close")
+    def close(*args: Any) -> None:
+        connections.dec()
+
+    @event.listens_for(engine, "close_detached")
+    def close_detached(*args: Any) -> None:
+        connections.dec()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(*args: Any) -> None:
+        checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(*args: Any) -> None:
+        checked_out.dec()
+
+
+def get_sql_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].lower() if statement else ""
+    return operation if operation in SQL_OPERATIONS else "other"
+
+
+def observe_fetch(status_code: int | str, duration: float) -> None:
+    FETCH_SECONDS.labels(str(status_code)).observe(duration)
+
+
+def observe_scan(kind: str, pages: int, ads: int, duration: float) -> None:
+    SCAN_PAGES.labels(kind).observe(pages)
+    SCAN_ADS.labels(kind).observe(ads)
+    SCAN_SECONDS.labels(kind).observe(duration)
+
+
+def task_started(task_id: str) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id: str, task_name: str, state: Optional[str]) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_SECONDS.labels(task_name, state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+class QueueDepthCollector(Collector):
+    """Number of messages waiting in the broker, read when scraped"""
+
+    def __init__(
+        self,
+        broker_url: str,
+        queues: Callable[[], Iterable[str]],
+        priority_steps: Sequence[int] = (0,),
+    ) -> None:
+        self.broker_url = broker_url
+        self.queues = queues
+        self.priority_steps = priority_steps
+        self._client: Optional[redis.Redis] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.broker_url)
+        return self._client  # type: ignore
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        gauge = GaugeMetricFamily(
+            "plotstats_celery_queue_length",
+            "Messages waiting in a Celery queue",
+            labels=["queue"],
+        )
+        try:
+            for queue in self.queues():
+                gauge.add_metric([queue], self.get_length(queue))
+        except redis.RedisError:
+            return
+        yield gauge
+
+    def get_length(self, queue: str) -> int:
+        # Messages with a priority are kept in a list per step, "queue:3"
+        with self.client.pipeline(transaction=False) as pipeline:
+            for step in self.priority_steps:
+                pipeline.llen(f"{queue}:{step}" if step else queue)
+            return sum(pipeline.execute())  # type: ignore[no-untyped-call]
+
+
+def start_worker_exporter(
+    port: int,
+    broker_url: str,
+    queues: Callable[[], Iterable[str]],
+    priority_steps: Sequence[int] = (0,),
+) -> None:
+    registry = get_registry()
+    registry.register(QueueDepthCollector(broker_url, queues, priority_steps))
+    start_http_server(port, registry=registry)
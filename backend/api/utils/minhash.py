@@ -0,0 +1,71 @@
+import random
+import re
+import zlib
+from typing import Optional, Sequence
+
+# 16 bands of 4 rows: pairs with a Jaccard similarity of 0.5 share a bucket with
+# ~64% probability and at 0.8 with ~99.9%, candidates are then checked against
+# DUPLICATE_THRESHOLD on the full signatures
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed, stored signatures must stay comparable between releases
+_random = random.Random(20240101)
+_PERMUTATIONS = [
+    (_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def get_shingles(*texts: Optional[str]) -> set[str]:
+    text = " ".join(
+        re.sub(r"[\W_]+", " ", value.lower()).strip() for value in texts if value
+    )
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {"".join(chars) for chars in zip(*(text[i:] for i in range(SHINGLE_SIZE)))}
+
+
+def build_signature(shingles: set[str]) -> list[int]:
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+    return [
+        min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def get_signature(
+    title: str, location: Optional[str], area: Optional[float]
+) -> list[int]:
+    return build_signature(get_shingles(title, location, area_token(area)))
+
+
+def area_token(area: Optional[float]) -> str:
+    return f"area{round(area)}" if area else "area"
+
+
+def get_lsh_buckets(signature: Sequence[int], area: Optional[float]) -> list[int]:
+    """Bucket keys of every band, only listings of the same area can collide"""
+    # Shifted by 31 so keys stay below 2**63 and fit a bigint column
+    area_key = zlib.crc32(area_token(area).encode("utf-8")) << 31
+    rows = iter(signature)
+    return [
+        area_key ^ hash_band(band, [next(rows) for _ in range(ROWS_PER_BAND)])
+        for band in range(BANDS)
+    ]
+
+
+def hash_band(band: int, rows: Sequence[int]) -> int:
+    return zlib.crc32(",".join(map(str, (band, *rows))).encode("ascii"))
+
+
+def estimate_similarity(signature: Sequence[int], other: Sequence[int]) -> float:
+    matching = sum(
+        1 for value, other_value in zip(signature, other) if value == other_value
+    )
+    return matching / NUM_PERMUTATIONS
@@ -0,0 +1,76 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Sequence, TypeVar
+
+MAX_PAGE_SIZE = 100
+CURSOR_SEPARATOR = "|"
+
+_T = TypeVar("_T")
+
+
+class CursorDecodeError(Exception):
+    pass
+
+
+def encode_cursor(*values: int | float | str | datetime) -> str:
+    raw = CURSOR_SEPARATOR.join(
+        value.isoformat() if isinstance(value, datetime) else str(value)
+        for value in values
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise CursorDecodeError()
+    return raw.split(CURSOR_SEPARATOR)
+
+
+def decode_id(value: str) -> int:
+    # isnumeric() also accepts characters like "²" which int() rejects
+    if not value.isdecimal():
+        raise CursorDecodeError()
+    return int(value)
+
+
+def decode_id_cursor(cursor: str) -> int:
+    values = decode_cursor(cursor)
+    if len(values) != 1:
+        raise CursorDecodeError()
+    return decode_id(values[0])
+
+
+def decode_date_cursor(cursor: str) -> tuple[datetime, int]:
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise CursorDecodeError()
+    try:
+        date = datetime.fromisoformat(values[0])
+    except ValueError:
+        raise CursorDecodeError()
+    return date, decode_id(values[1])
+
+
+def decode_distance_cursor(cursor: str) -> tuple[float, int]:
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise CursorDecodeError()
+    try:
+        distance = float(values[0])
+    except ValueError:
+        raise CursorDecodeError()
+    return distance, decode_id(values[1])
+
+
+def is_valid_page_size(first: int | None) -> bool:
+    return first is None or 0 < first <= MAX_PAGE_SIZE
+
+
+def split_page(items: Sequence[_T], first: int | None) -> tuple[list[_T], bool]:
+    # Queries fetch one extra row to find out whether there is a next page
+    if first is None:
+        return list(items), False
+    return list(items[:first]), len(items) > first
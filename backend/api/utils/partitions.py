@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# price references searchevent, so its partitions are created after and
+# detached before the matching searchevent partitions
+PARTITIONED_TABLES = ("searchevent", "price")
+PRICE_SEARCH_EVENT_FK = "fk_price_searchevent"
+ARCHIVE_SCHEMA = "archive"
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def parse_partition_month(table: str, name: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(name.removeprefix(f"{table}_p"), "%Y_%m")
+    except ValueError:
+        # e.g. the default partition
+        return None
+
+
+def create_partition_statement(table: str, month: datetime) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+        f"PARTITION OF {table} FOR VALUES FROM ('{month:%Y-%m-%d}') "
+        f"TO ('{add_months(month, 1):%Y-%m-%d}')"
+    )
+
+
+async def get_partitions(session: AsyncSession, table: str) -> list[str]:
+    query = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :table"
+    )
+    return list((await session.execute(query, {"table": table})).scalars().all())
+
+
+async def create_future_partitions(
+    session: AsyncSession, months_ahead: int, now: Optional[datetime] = None
+) -> list[str]:
+    current_month = month_start(now or datetime.utcnow())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current_month, offset)
+        for table in PARTITIONED_TABLES:
+            await session.execute(text(create_partition_statement(table, month)))
+            created.append(partition_name(table, month))
+    await session.commit()
+    return created
+
+
+async def detach_old_partitions(
+    session: AsyncSession, retention_months: int, now: Optional[datetime] = None
+) -> list[str]:
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    detached = []
+    for table in reversed(PARTITIONED_TABLES):
+        for name in sorted(await get_partitions(session, table)):
+            month = parse_partition_month(table, name)
+            if month is None or month >= cutoff:
+                continue
+            logger.info(f"Archiving partition {name}")
+            await session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            if table == "price":
+                # Archived prices must not block detaching their search events
+                await session.execute(
+                    text(
+                        f"ALTER TABLE {name} "
+                        f"DROP CONSTRAINT IF EXISTS {PRICE_SEARCH_EVENT_FK}"
+                    )
+                )
+            await session.execute(
+                text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+            )
+            detached.append(name)
+    await session.commit()
+    return detached
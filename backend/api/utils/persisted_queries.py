@@ -0,0 +1,88 @@
+import hashlib
+from typing import Any, Mapping, Optional, Union
+
+from graphql import GraphQLError
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http.exceptions import HTTPException
+from strawberry.http.typevars import Context, RootValue
+from strawberry.types import ExecutionResult
+
+from api.settings import settings
+from api.utils.documents import LRUCache
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+
+# sha256 of the query text -> query text, registered by clients
+persisted_queries: LRUCache[str, str] = LRUCache(settings.persisted_query_cache_size)
+
+
+class PersistedQueryNotFoundError(Exception):
+    pass
+
+
+def get_persisted_query_hash(extensions: Any) -> Optional[str]:
+    if not isinstance(extensions, dict):
+        return None
+    if not isinstance(persisted_query := extensions.get("persistedQuery"), dict):
+        return None
+    if persisted_query.get("version") != 1:
+        raise HTTPException(400, "Unsupported persisted query version")
+    if not isinstance(query_hash := persisted_query.get("sha256Hash"), str):
+        raise HTTPException(400, "Persisted query hash is missing")
+    return query_hash
+
+
+def resolve_persisted_query(data: Any) -> Any:
+    """Fills in the query of hash only requests, registers the ones with text"""
+    if not isinstance(data, dict):
+        return data
+    if (query_hash := get_persisted_query_hash(data.get("extensions"))) is None:
+        return data
+    if (query := data.get("query")) is None:
+        data["query"] = persisted_queries.get(query_hash)
+        if data["query"] is None:
+            raise PersistedQueryNotFoundError()
+        return data
+    if hashlib.sha256(query.encode("utf-8")).hexdigest() != query_hash:
+        raise HTTPException(400, "Provided sha does not match query")
+    persisted_queries.put(query_hash, query)
+    return data
+
+
+class PersistedQueryRouter(GraphQLRouter[Context, RootValue]):
+    """GraphQLRouter speaking the Apollo automatic persisted queries protocol"""
+
+    def parse_json(self, data: Union[str, bytes]) -> Any:
+        return resolve_persisted_query(super().parse_json(data))
+
+    def parse_query_params(
+        self, params: Mapping[str, Optional[Union[str, list[str]]]]
+    ) -> dict[str, Any]:
+        data = super().parse_query_params(params)
+        if isinstance(extensions := data.get("extensions"), str):
+            # Not self.parse_json, the extensions aren't a request
+            data["extensions"] = super().parse_json(extensions)
+        return resolve_persisted_query(data)  # type: ignore
+
+    def should_render_graphql_ide(self, request: Any) -> bool:
+        return (
+            "extensions" not in request.query_params
+            and super().should_render_graphql_ide(request)
+        )
+
+    async def execute_operation(
+        self, request: Any, context: Context, root_value: Optional[RootValue]
+    ) -> ExecutionResult:
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryNotFoundError:
+            # Clients retry with the full query text on this error
+            return ExecutionResult(
+                data=None,
+                errors=[
+                    GraphQLError(
+                        PERSISTED_QUERY_NOT_FOUND,
+                        extensions={"code": "PERSISTED_QUERY_NOT_FOUND"},
+                    )
+                ],
+            )
@@ -0,0 +1,215 @@
+from typing import Any, Iterator, Optional
+
+from graphql import (
+    DocumentNode,
+    ExecutionResult,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLField,
+    GraphQLNamedType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    SelectionSetNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_composite_type,
+    is_list_type,
+    value_from_ast_untyped,
+)
+from strawberry.extensions import AddValidationRules, SchemaExtension
+from strawberry.extensions.query_depth_limiter import create_validator
+
+from api.settings import settings
+from api.utils.pagination import MAX_PAGE_SIZE
+
+# Lists without a size argument are assumed to be that long
+DEFAULT_LIST_SIZE = 20
+# (type, list field) -> argument of an enclosing field limiting its length, and
+# the length assumed when the argument is missing. Arguments of input objects
+# count too, e.g. searchEventStats(input: {topPrices: 5}).
+LIST_SIZE_ARGUMENTS = {
+    ("SearchesType", "searches"): ("first", MAX_PAGE_SIZE),
+    ("SearchEventsStatsType", "searchEvents"): ("first", MAX_PAGE_SIZE),
+    ("EstatesLocationType", "estates"): ("first", MAX_PAGE_SIZE),
+    ("EstatesPriceHistoryType", "histories"): ("estateIds", 1),
+    # Only returned when top prices are requested
+    ("EventStatsType", "minPrices"): ("topPrices", 0),
+    ("EventStatsType", "minPricesPerSquareMeter"): ("topPrices", 0),
+}
+# Lists not limited by any argument
+LIST_SIZES = {
+    # Daily scans over the default year of searchStats
+    ("SearchStatsType", "events"): 365,
+    ("EstatePriceHistoryType", "prices"): 365,
+}
+
+DepthLimitValidator = create_validator(settings.graphql_max_depth, None)
+
+
+class QueryDepthLimit(AddValidationRules):
+    """Rejects documents nested deeper than settings.graphql_max_depth"""
+
+    def __init__(self, *, execution_context: Any = None) -> None:
+        super().__init__([DepthLimitValidator])
+        self.execution_context = execution_context
+
+
+class QueryCostAnalyzer:
+    """Static upper bound of the work an operation asks for.
+
+    Every field returning an object costs 1 and list fields multiply the cost
+    of their selection by the expected length of the list.
+    """
+
+    def __init__(
+        self,
+        schema: GraphQLSchema,
+        document: DocumentNode,
+        variables: Optional[dict[str, Any]],
+    ) -> None:
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+    def operation_cost(self, document: DocumentNode, name: Optional[str]) -> int:
+        operation = get_operation_ast(document, name)
+        if operation is None:
+            return 0
+        root_type = self.schema.get_root_type(operation.operation)
+        if root_type is None:
+            return 0
+        return self.selection_set_cost(operation.selection_set, root_type, {})
+
+    def selection_set_cost(
+        self,
+        selection_set: Optional[SelectionSetNode],
+        parent_type: GraphQLNamedType,
+        sizes: dict[str, Any],
+    ) -> int:
+        if selection_set is None:
+            return 0
+        cost = 0
+        # Only one fragment of a union applies, count the most expensive one
+        branches: dict[str, int] = {}
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost += self.field_cost(selection, parent_type, sizes)
+                continue
+            if isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is None:
+                    continue
+                type_condition, fragment_selections = (
+                    fragment.type_condition,
+                    fragment.selection_set,
+                )
+            elif isinstance(selection, InlineFragmentNode):
+                type_condition, fragment_selections = (
+                    selection.type_condition,
+                    selection.selection_set,
+                )
+            else:
+                continue
+            fragment_type = (
+                self.schema.get_type(type_condition.name.value)
+                if type_condition
+                else parent_type
+            )
+            if fragment_type is None:
+                continue
+            fragment_cost = self.selection_set_cost(
+                fragment_selections, fragment_type, sizes
+            )
+            if fragment_type is parent_type:
+                cost += fragment_cost
+            else:
+                branches[fragment_type.name] = (
+                    branches.get(fragment_type.name, 0) + fragment_cost
+                )
+        return cost + max(branches.values(), default=0)
+
+    def field_cost(
+        self, node: FieldNode, parent_type: GraphQLNamedType, sizes: dict[str, Any]
+    ) -> int:
+        fields: dict[str, GraphQLField] = getattr(parent_type, "fields", {})
+        field = fields.get(node.name.value)
+        if field is None:
+            return 0
+        field_type = get_named_type(field.type)
+        if not is_composite_type(field_type):
+            return 0
+        sizes = {**sizes, **self.get_argument_sizes(node)}
+        cost = 1 + self.selection_set_cost(node.selection_set, field_type, sizes)
+        if is_list_type(get_nullable_type(field.type)):  # type: ignore
+            cost *= self.get_list_size(parent_type.name, node.name.value, sizes)
+        return cost
+
+    def get_argument_sizes(self, node: FieldNode) -> dict[str, Any]:
+        sizes: dict[str, Any] = {}
+        for argument in node.arguments:
+            value = value_from_ast_untyped(argument.value, self.variables)
+            if isinstance(value, dict):
+                sizes.update(value)
+            else:
+                sizes[argument.name.value] = value
+        return sizes
+
+    def get_list_size(
+        self, type_name: str, field_name: str, sizes: dict[str, Any]
+    ) -> int:
+        if (type_name, field_name) not in LIST_SIZE_ARGUMENTS:
+            return LIST_SIZES.get((type_name, field_name), DEFAULT_LIST_SIZE)
+        argument, default = LIST_SIZE_ARGUMENTS[(type_name, field_name)]
+        size = sizes.get(argument)
+        if isinstance(size, list):
+            return len(size)
+        if isinstance(size, int) and size >= 0:
+            return size
+        return default
+
+
+class QueryCost(SchemaExtension):
+    """Rejects operations over settings.graphql_max_cost before they execute.
+
+    The computed cost is reported in the response extensions.
+    """
+
+    cost: Optional[int] = None
+
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        document = execution_context.graphql_document
+        if document is not None:
+            analyzer = QueryCostAnalyzer(
+                execution_context.schema._schema,
+                document,
+                execution_context.variables,
+            )
+            self.cost = analyzer.operation_cost(
+                document, execution_context.operation_name
+            )
+            if self.cost > settings.graphql_max_cost:
+                # Strawberry doesn't execute operations that already have a result
+                execution_context.result = ExecutionResult(
+                    data=None,
+                    errors=[
+                        GraphQLError(
+                            f"Query cost {self.cost} exceeds the maximum "
+                            f"of {settings.graphql_max_cost}",
+                            extensions={"code": "QUERY_TOO_EXPENSIVE"},
+                        )
+                    ],
+                )
+        yield
+
+    def get_results(self) -> dict[str, Any]:
+        if self.cost is None:
+            return {}
+        return {"cost": {"requested": self.cost, "maximum": settings.graphql_max_cost}}
@@ -0,0 +1,67 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    # Only kept when asked for, e.g. to explain a failed query count assertion
+    statements: Optional[list[str]] = None
+    # Statements count towards every enclosing collect_queries block
+    parent: Optional["QueryStats"] = None
+
+    def record(self, statement: str, seconds: float) -> None:
+        stats: Optional[QueryStats] = self
+        while stats is not None:
+            stats.count += 1
+            stats.seconds += seconds
+            if stats.statements is not None:
+                stats.statements.append(statement)
+            stats = stats.parent
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def collect_queries(keep_statements: bool = False) -> Iterator[QueryStats]:
+    """Counts statements executed by this task and the ones it starts"""
+    stats = QueryStats(
+        statements=[] if keep_statements else None, parent=_query_stats.get()
+    )
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def count_queries(engine: Engine) -> None:
+    """Records statements of the engine in the active collect_queries block"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn: Any, *args: Any) -> None:
+        if _query_stats.get() is not None:
+            conn.info.setdefault("query_counter_started", []).append(
+                time.perf_counter()
+            )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        conn: Any, cursor: Any, statement: str, *args: Any
+    ) -> None:
+        if (stats := _query_stats.get()) is not None:
+            started = conn.info["query_counter_started"].pop()
+            stats.record(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context: Any) -> None:
+        if _query_stats.get() is not None:
+            context.connection.info["query_counter_started"].pop()
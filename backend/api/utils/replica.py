@@ -0,0 +1,75 @@
+from typing import Any, AsyncIterator, Optional
+
+from fastapi.requests import HTTPConnection
+from sqlmodel.ext.asyncio.session import AsyncSession
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from api.database import get_async_cache
+from api.settings import settings
+from api.utils.jwt import (
+    PermissionDeniedError,
+    extract_token_from_request,
+    get_jwt_payload,
+)
+
+RECENT_WRITE_KEY = "recent_write:{user_id}"
+
+
+async def mark_recent_write(user_id: int | str) -> None:
+    await get_async_cache().set(
+        RECENT_WRITE_KEY.format(user_id=user_id),
+        1,
+        ex=settings.replica_max_lag_seconds,
+    )
+
+
+async def has_recent_write(user_id: int | str) -> bool:
+    return bool(
+        await get_async_cache().exists(RECENT_WRITE_KEY.format(user_id=user_id))
+    )
+
+
+def get_token_subject(request: HTTPConnection) -> Optional[str]:
+    token = extract_token_from_request(request)
+    if not token:
+        return None
+    try:
+        subject: str = get_jwt_payload(token)["sub"]
+    except PermissionDeniedError:
+        return None
+    return subject
+
+
+async def get_read_session(
+    request: HTTPConnection,
+    session: AsyncSession,
+    replica_session: Optional[AsyncSession],
+) -> AsyncSession:
+    """Session for read only resolvers.
+
+    Falls back to the primary without a replica, and for users whose own writes
+    may not have been replicated yet.
+    """
+    if replica_session is None:
+        return session
+    subject = get_token_subject(request)
+    if subject is not None and await has_recent_write(subject):
+        return session
+    return replica_session
+
+
+class ReadYourWrites(SchemaExtension):
+    """Keeps users on the primary for a while after their mutations"""
+
+    async def on_operation(self) -> AsyncIterator[None]:
+        yield
+        execution_context = self.execution_context
+        if (
+            settings.db_replica_uri is None
+            or execution_context.operation_type != OperationType.MUTATION
+        ):
+            return
+        context: dict[str, Any] = execution_context.context
+        if (subject := get_token_subject(context["request"])) is not None:
+            await mark_recent_write(subject)
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Optional
+
+import redis
+from loguru import logger
+
+from api.database import get_async_cache
+
+SCAN_PROGRESS_CHANNEL = "scan_progress:{search_id}"
+
+
+class ScanProgressStatus(Enum):
+    STARTED = "started"
+    PAGE_PARSED = "page_parsed"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+
+async def publish_scan_progress(
+    search_id: Optional[int],
+    status: ScanProgressStatus,
+    page: Optional[int] = None,
+    total_pages: Optional[int] = None,
+    message: Optional[str] = None,
+) -> None:
+    """Notify scanProgress subscribers, a failed publish never fails the scan"""
+    if search_id is None:
+        return
+    event = {
+        "search_id": search_id,
+        "status": status.value,
+        "date": datetime.utcnow().isoformat(),
+        "page": page,
+        "total_pages": total_pages,
+        "message": message,
+    }
+    try:
+        await get_async_cache().publish(
+            SCAN_PROGRESS_CHANNEL.format(search_id=search_id), json.dumps(event)
+        )
+    except redis.RedisError as error:
+        logger.warning(f"Publishing scan progress of {search_id} failed: {error}")
+
+
+async def listen_scan_progress(search_id: int) -> AsyncIterator[dict[str, Any]]:
+    pubsub = get_async_cache().pubsub(ignore_subscribe_messages=True)
+    channel = SCAN_PROGRESS_CHANNEL.format(search_id=search_id)
+    await pubsub.subscribe(channel)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                yield json.loads(message["data"])
+    finally:
+        await pubsub.unsubscribe(channel)
+        # Returns the connection to the pool
+        await pubsub.aclose()  # type: ignore[no-untyped-call]
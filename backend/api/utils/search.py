@@ -2,36 +2,27 @@ from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Any, Optional, Sequence
 
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, tuple_, update
 from sqlalchemy.orm import selectinload
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from api.models.price import Price
+from api.models.price_change import PriceChange
 from api.models.scan_failure import ScanFailure
 from api.models.search import Search, encode_url
 from api.models.search_event import SearchEvent
-from api.types.event_stats import EventStatsType
+from api.models.search_status import SearchStatus
 from api.utils.search_event import (
+    dedupe_prices,
     get_search_event_avg_stats,
     get_search_event_min_prices,
-    get_search_event_prices,
+    get_search_events_prices,
 )
+from api.utils.sql import BoxContainsPoint, DateBucket
 
 
-async def get_search_by_id(
-    session: AsyncSession, id: int, with_events: bool = False
-) -> Optional["Search"]:
-    if with_events:
-        return (
-            await session.exec(
-                select(Search)
-                .where(Search.id == id)
-                .options(
-                    selectinload(Search.category),  # type: ignore
-                    selectinload(Search.search_events),  # type: ignore
-                )
-            )
-        ).first()
+async def get_search_by_id(session: AsyncSession, id: int) -> Optional["Search"]:
     return (
         await session.exec(
             select(Search)
@@ -42,20 +33,74 @@ async def get_search_by_id(
 
 
 async def get_searches(
-    session: AsyncSession, user_id: Optional[int] = None
+    session: AsyncSession,
+    user_id: Optional[int] = None,
+    first: Optional[int] = None,
+    after: Optional[int] = None,
 ) -> list["Search"]:
-    query = select(Search).options(selectinload(Search.category))  # type: ignore
+    query = (
+        select(Search)
+        .options(selectinload(Search.category))  # type: ignore
+        .order_by(Search.id)  # type: ignore
+    )
     if user_id:
         query = query.where(Search.users.any(id=user_id))  # type: ignore
+    if after is not None:
+        query = query.where(Search.id > after)  # type: ignore
+    if first is not None:
+        # Fetch one more row to tell whether there is a next page
+        query = query.limit(first + 1)
+    return [search for search in (await session.exec(query)).all()]
+
+
+async def get_searches_covering_point(
+    session: AsyncSession, latitude: float, longitude: float
+) -> list["Search"]:
+    query = (
+        select(Search)
+        .where(
+            BoxContainsPoint(
+                Search.sw_lng,
+                Search.sw_lat,
+                Search.ne_lng,
+                Search.ne_lat,
+                longitude,
+                latitude,
+            )
+        )
+        .options(selectinload(Search.category))  # type: ignore
+        .order_by(Search.id)  # type: ignore
+    )
     return [search for search in (await session.exec(query)).all()]
 
 
+async def get_search_events_page(
+    session: AsyncSession,
+    search_id: int,
+    first: Optional[int] = None,
+    after: Optional[tuple[datetime, int]] = None,
+) -> Sequence["SearchEvent"]:
+    query = (
+        select(SearchEvent)
+        .where(SearchEvent.search_id == search_id)
+        .order_by(SearchEvent.date, SearchEvent.id)  # type: ignore
+    )
+    if after is not None:
+        query = query.where(
+            tuple_(SearchEvent.date, SearchEvent.id) > tuple_(*after)  # type: ignore
+        )
+    if first is not None:
+        query = query.limit(first + 1)
+    return (await session.exec(query)).all()
+
+
 async def get_search_events_for_search(
     session: AsyncSession,
     search: Search,
     date_from: datetime,
     date_to: datetime,
-) -> Sequence["EventStatsType"]:
+    dedupe: bool = False,
+) -> list[dict[str, Any]]:
     search_events: Sequence["SearchEvent"] = (
         await session.exec(
             select(SearchEvent).where(
@@ -67,40 +112,44 @@ async def get_search_events_for_search(
             )
         )
     ).all()
+    prices_by_event = await get_search_events_prices(session, search_events)
     events = []
     for event in search_events:
-        prices = await get_search_event_prices(session, event)
+        prices = prices_by_event.get(event.id, [])  # type: ignore
+        if dedupe:
+            prices = dedupe_prices(prices)
         if len(prices) == 0:
             continue
         stats = get_search_event_avg_stats(prices)
         stats.update(get_search_event_min_prices(prices))
         stats["id"] = event.id
-        events.append(EventStatsType(**stats))  # type: ignore
+        events.append(stats)
     return events
 
 
-def get_search_stats(search_events: Sequence[EventStatsType]) -> dict[str, Any]:
+def get_search_stats(search_events: Sequence[dict[str, Any]]) -> dict[str, Any]:
     events_num = len(search_events)
     stats = {
         "avg_price_total": round(
-            sum((e.avg_price for e in search_events)) / events_num, 2
+            sum((e["avg_price"] for e in search_events)) / events_num, 2
         ),
         "avg_price_per_square_meter_total": round(
-            sum((e.avg_price_per_square_meter for e in search_events)) / events_num, 2
+            sum((e["avg_price_per_square_meter"] for e in search_events)) / events_num,
+            2,
         ),
     }
     area_in_square_meters_sum = sum(
         (
-            e.avg_area_in_square_meters
+            e["avg_area_in_square_meters"]
             for e in search_events
-            if e.avg_area_in_square_meters
+            if e["avg_area_in_square_meters"]
         )
     )
     terrain_area_in_square_meters_sum = sum(
         (
-            e.avg_terrain_area_in_square_meters
+            e["avg_terrain_area_in_square_meters"]
             for e in search_events
-            if e.avg_terrain_area_in_square_meters
+            if e["avg_terrain_area_in_square_meters"]
         )
     )
     avg_area_in_square_meters = (
@@ -113,31 +162,33 @@ def get_search_stats(search_events: Sequence[EventStatsType]) -> dict[str, Any]:
         if terrain_area_in_square_meters_sum
         else None
     )
-    stats["avg_area_total"] = avg_area_in_square_meters  # type: ignore
-    stats["avg_terrain_total"] = avg_terrain_area_in_square_meters  # type: ignore
+    stats["avg_area_total"] = avg_area_in_square_meters
+    stats["avg_terrain_total"] = avg_terrain_area_in_square_meters
     return stats
 
 
-async def get_last_failures(session: AsyncSession) -> dict[int, datetime]:
+async def get_search_statuses(
+    session: AsyncSession,
+) -> Sequence[tuple[int, Optional[SearchStatus]]]:
     query = (
-        select(ScanFailure.search_id, func.max(ScanFailure.date).label("last_date"))
-        .select_from(ScanFailure)
-        .group_by(ScanFailure.search_id)  # type: ignore
+        select(Search.id, SearchStatus)
+        .outerjoin(SearchStatus)
+        .order_by(Search.id)  # type: ignore
     )
-    failures = (await session.exec(query)).all()
-    return {fail[0]: fail[1] for fail in failures if isinstance(fail[0], int)}
+    return (await session.exec(query)).all()  # type: ignore
 
 
-async def get_last_successes(session: AsyncSession) -> dict[int, datetime]:
-    query = (
-        select(SearchEvent.search_id, func.max(SearchEvent.date).label("last_date"))
-        .select_from(SearchEvent)
-        .group_by(SearchEvent.search_id)  # type: ignore
+async def record_scan_duration(
+    session: AsyncSession, search_id: int | None, duration: float
+) -> None:
+    if search_id is None:
+        return
+    await session.exec(
+        update(SearchStatus)
+        .where(SearchStatus.search_id == search_id)  # type: ignore
+        .values(last_duration=round(duration, 3))
     )
-    successes = (await session.exec(query)).all()
-    return {
-        success[0]: success[1] for success in successes if isinstance(success[0], int)
-    }
+    await session.commit()
 
 
 async def get_search_failures(
@@ -172,6 +223,77 @@ async def get_search_successes(
     return successes  # type: ignore
 
 
+async def get_search_success_buckets(
+    session: AsyncSession, days: int, unit: str
+) -> dict[int, dict[datetime, int]]:
+    target_date = datetime.today() - timedelta(days=days)
+    bucket = DateBucket(unit, SearchEvent.date)
+    query = (
+        select(SearchEvent.search_id, bucket, func.count())
+        .select_from(SearchEvent)
+        .filter(SearchEvent.date >= target_date)  # type: ignore
+        .group_by(SearchEvent.search_id, bucket)  # type: ignore
+    )
+    successes: dict[int, dict[datetime, int]] = defaultdict(dict)
+    for search_id, start, count in (await session.exec(query)).all():
+        if isinstance(search_id, int):
+            successes[search_id][start] = count
+    return successes
+
+
+async def get_search_failure_buckets(
+    session: AsyncSession, days: int, unit: str
+) -> dict[int, dict[datetime, dict[int, int]]]:
+    target_date = datetime.today() - timedelta(days=days)
+    bucket = DateBucket(unit, ScanFailure.date)
+    query = (
+        select(ScanFailure.search_id, bucket, ScanFailure.status_code, func.count())
+        .select_from(ScanFailure)
+        .filter(ScanFailure.date >= target_date)  # type: ignore
+        .group_by(
+            ScanFailure.search_id, bucket, ScanFailure.status_code  # type: ignore
+        )
+    )
+    failures: dict[int, dict[datetime, dict[int, int]]] = defaultdict(
+        lambda: defaultdict(dict)
+    )
+    for search_id, start, status_code, count in (await session.exec(query)).all():
+        if isinstance(search_id, int):
+            failures[search_id][start][status_code] = count
+    return failures
+
+
+async def get_price_changes(
+    session: AsyncSession, search_id: int, since: datetime
+) -> Sequence[PriceChange]:
+    # Changes of the estates the search observed since then, whichever search
+    # scanned them first
+    observed_estates = (
+        select(Price.estate_id)
+        .join(
+            SearchEvent,
+            and_(
+                Price.search_event_id == SearchEvent.id,  # type: ignore
+                Price.date == SearchEvent.date,  # type: ignore
+            ),
+        )
+        .where(
+            SearchEvent.search_id == search_id,
+            SearchEvent.date >= since,
+            Price.date >= since,
+        )
+    )
+    query = (
+        select(PriceChange)
+        .where(
+            PriceChange.estate_id.in_(observed_estates),  # type: ignore
+            PriceChange.date >= since,
+        )
+        .order_by(PriceChange.date, PriceChange.id)  # type: ignore
+    )
+    return (await session.exec(query)).all()
+
+
 async def get_search_id_by_url(session: AsyncSession, url: str) -> int | None:
     encoded_url = encode_url(url)
     search_query = select(Search.id).where(Search.url == encoded_url.decode("ascii"))
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from typing import Any, Optional, Sequence
 
 from sqlalchemy.orm import selectinload
@@ -6,7 +7,6 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.models.price import Price
 from api.models.search_event import SearchEvent
-from api.types.price import convert_price_from_db
 
 
 async def get_search_event_prices(
@@ -15,13 +15,40 @@ async def get_search_event_prices(
     prices: Sequence["Price"] = (
         await session.exec(
             select(Price)
-            .where(Price.search_event_id == search_event.id)
+            .where(
+                Price.search_event_id == search_event.id,
+                # Lets postgres prune price partitions older than the event
+                Price.date >= search_event.date,
+            )
             .options(selectinload(Price.estate))  # type: ignore
         )
     ).all()
     return prices
 
 
+async def get_search_events_prices(
+    session: AsyncSession, search_events: Sequence["SearchEvent"]
+) -> dict[int, list["Price"]]:
+    if not search_events:
+        return {}
+    prices: Sequence["Price"] = (
+        await session.exec(
+            select(Price)
+            .where(
+                Price.search_event_id.in_(  # type: ignore
+                    search_event.id for search_event in search_events
+                ),
+                Price.date >= min(e.date for e in search_events),
+            )
+            .options(selectinload(Price.estate))  # type: ignore
+        )
+    ).all()
+    prices_by_event = defaultdict(list)
+    for price in prices:
+        prices_by_event[price.search_event_id].append(price)
+    return prices_by_event  # type: ignore
+
+
 async def get_search_event_by_id(
     session: AsyncSession, search_event_id: int
 ) -> Optional["SearchEvent"]:
@@ -30,6 +57,18 @@ async def get_search_event_by_id(
     ).first()
 
 
+def dedupe_prices(prices: Sequence["Price"]) -> list["Price"]:
+    """Keep the cheapest price of every group of near duplicate listings"""
+    cheapest: dict[int, "Price"] = {}
+    for price in prices:
+        estate_id = price.estate.duplicate_of_id or price.estate_id
+        if estate_id is None:
+            continue
+        if estate_id not in cheapest or price.price < cheapest[estate_id].price:
+            cheapest[estate_id] = price
+    return list(cheapest.values())
+
+
 def get_search_event_avg_stats(prices: Sequence["Price"]) -> dict[str, Optional[float]]:
     num_of_prices: int = len(prices)
     stats = {
@@ -71,22 +110,16 @@ def get_search_event_avg_stats(prices: Sequence["Price"]) -> dict[str, Optional[
 def get_search_event_min_prices(
     prices: Sequence["Price"], top_prices: Optional[int] = None
 ) -> dict[str, Any]:
-    stats = dict()
+    stats: dict[str, Any] = dict()
     sorted_by_price = sorted(prices, key=lambda p: p.price)
-    stats["min_price"] = convert_price_from_db(sorted_by_price[0])
+    stats["min_price"] = sorted_by_price[0]
     sorted_by_price_per_square_meter = sorted(
         prices, key=lambda p: p.price_per_square_meter  # type: ignore
     )
-    stats["min_price_per_square_meter"] = convert_price_from_db(
-        sorted_by_price_per_square_meter[0]
-    )
+    stats["min_price_per_square_meter"] = sorted_by_price_per_square_meter[0]
     if top_prices and top_prices > 0:
-        stats["min_prices"] = [
-            convert_price_from_db(p)
-            for p in sorted_by_price[:top_prices]  # type: ignore
-        ]
-        stats["min_prices_per_square_meter"] = [
-            convert_price_from_db(p)
-            for p in sorted_by_price_per_square_meter[:top_prices]  # type: ignore
+        stats["min_prices"] = sorted_by_price[:top_prices]
+        stats["min_prices_per_square_meter"] = sorted_by_price_per_square_meter[
+            :top_prices
         ]
     return stats
@@ -0,0 +1,171 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import REAL, Boolean, DateTime, Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+BUCKET_UNITS = ("hour", "day", "week")
+
+# sqlite has no date_trunc, tests run against it
+SQLITE_BUCKET_FORMATS = {
+    "hour": "strftime('%Y-%m-%d %H:00:00', {column})",
+    "day": "datetime({column}, 'start of day')",
+    "week": "datetime({column}, 'start of day', '-6 days', 'weekday 1')",
+}
+
+
+class DateBucket(FunctionElement[datetime]):
+    """Truncates a timestamp to the start of its hour, day or week (Monday)"""
+
+    type = DateTime()
+    name = "date_bucket"
+    # The unit is rendered into the statement, so it can't be cached on its own
+    inherit_cache = False
+
+    def __init__(self, unit: str, column: Any) -> None:
+        if unit not in BUCKET_UNITS:
+            raise ValueError(f"Unsupported bucket unit: {unit}")
+        self.unit = unit
+        super().__init__(column)
+
+
+@compiles(DateBucket)  # type: ignore
+def compile_date_bucket(element: DateBucket, compiler: Any, **kwargs: Any) -> str:
+    return (
+        f"date_trunc('{element.unit}', {compiler.process(element.clauses, **kwargs)})"
+    )
+
+
+@compiles(DateBucket, "sqlite")  # type: ignore
+def compile_sqlite_date_bucket(
+    element: DateBucket, compiler: Any, **kwargs: Any
+) -> str:
+    column = compiler.process(element.clauses, **kwargs)
+    return SQLITE_BUCKET_FORMATS[element.unit].format(column=column)
+
+
+# Geometry helpers. Postgres renders them with the built-in point and box types,
+# matching the GiST expression indexes from migration 6b8d0f2e4a71, other
+# databases compare plain coordinates.
+class BoxContainsPoint(FunctionElement[bool]):
+    """box(sw, ne) @> point, arguments: sw_lng, sw_lat, ne_lng, ne_lat, lng, lat"""
+
+    type = Boolean()
+    name = "box_contains_point"
+    inherit_cache = True
+
+
+class PointInBox(FunctionElement[bool]):
+    """point <@ box(sw, ne), arguments: lng, lat, sw_lng, sw_lat, ne_lng, ne_lat"""
+
+    type = Boolean()
+    name = "point_in_box"
+    inherit_cache = True
+
+
+class PointDistance(FunctionElement[float]):
+    """Distance usable for ordering, arguments: lng, lat, other_lng, other_lat"""
+
+    type = Float()
+    name = "point_distance"
+    inherit_cache = True
+
+
+def _process_clauses(
+    element: FunctionElement[Any], compiler: Any, **kwargs: Any
+) -> list[str]:
+    return [compiler.process(clause, **kwargs) for clause in element.clauses]
+
+
+@compiles(BoxContainsPoint, "postgresql")  # type: ignore
+def compile_box_contains_point(
+    element: BoxContainsPoint, compiler: Any, **kwargs: Any
+) -> str:
+    sw_lng, sw_lat, ne_lng, ne_lat, lng, lat = _process_clauses(
+        element, compiler, **kwargs
+    )
+    return (
+        f"box(point({sw_lng}, {sw_lat}), point({ne_lng}, {ne_lat})) "
+        f"@> point({lng}, {lat})"
+    )
+
+
+@compiles(BoxContainsPoint)  # type: ignore
+def compile_generic_box_contains_point(
+    element: BoxContainsPoint, compiler: Any, **kwargs: Any
+) -> str:
+    sw_lng, sw_lat, ne_lng, ne_lat, lng, lat = _process_clauses(
+        element, compiler, **kwargs
+    )
+    return (
+        f"({lng} BETWEEN {sw_lng} AND {ne_lng} AND {lat} BETWEEN {sw_lat} AND {ne_lat})"
+    )
+
+
+@compiles(PointInBox, "postgresql")  # type: ignore
+def compile_point_in_box(element: PointInBox, compiler: Any, **kwargs: Any) -> str:
+    lng, lat, sw_lng, sw_lat, ne_lng, ne_lat = _process_clauses(
+        element, compiler, **kwargs
+    )
+    return (
+        f"point({lng}, {lat}) "
+        f"<@ box(point({sw_lng}, {sw_lat}), point({ne_lng}, {ne_lat}))"
+    )
+
+
+@compiles(PointInBox)  # type: ignore
+def compile_generic_point_in_box(
+    element: PointInBox, compiler: Any, **kwargs: Any
+) -> str:
+    lng, lat, sw_lng, sw_lat, ne_lng, ne_lat = _process_clauses(
+        element, compiler, **kwargs
+    )
+    return (
+        f"({lng} BETWEEN {sw_lng} AND {ne_lng} AND {lat} BETWEEN {sw_lat} AND {ne_lat})"
+    )
+
+
+@compiles(PointDistance, "postgresql")  # type: ignore
+def compile_point_distance(element: PointDistance, compiler: Any, **kwargs: Any) -> str:
+    lng, lat, other_lng, other_lat = _process_clauses(element, compiler, **kwargs)
+    # Served by the GiST index as a nearest neighbour scan
+    return f"point({lng}, {lat}) <-> point({other_lng}, {other_lat})"
+
+
+@compiles(PointDistance)  # type: ignore
+def compile_generic_point_distance(
+    element: PointDistance, compiler: Any, **kwargs: Any
+) -> str:
+    lng, lat, other_lng, other_lat = _process_clauses(element, compiler, **kwargs)
+    # Squared, it is only used for ordering
+    return (
+        f"(({lng} - {other_lng}) * ({lng} - {other_lng}) "
+        f"+ ({lat} - {other_lat}) * ({lat} - {other_lat}))"
+    )
+
+
+class TextDistance(FunctionElement[float]):
+    """How far the search text is from the searched column, 0 is the best match,
+    arguments: text, searched column"""
+
+    type = REAL()
+    name = "text_distance"
+    inherit_cache = True
+
+
+@compiles(TextDistance, "postgresql")  # type: ignore
+def compile_text_distance(element: TextDistance, compiler: Any, **kwargs: Any) -> str:
+    text, column = _process_clauses(element, compiler, **kwargs)
+    # One minus word_similarity, the column is on the left for the GiST index
+    # to serve it as a nearest neighbour scan
+    return f"({column} <->> {text})"
+
+
+@compiles(TextDistance)  # type: ignore
+def compile_generic_text_distance(
+    element: TextDistance, compiler: Any, **kwargs: Any
+) -> str:
+    text, column = _process_clauses(element, compiler, **kwargs)
+    # No pg_trgm, shorter texts containing the match are closer
+    return f"(1 - length({text}) * 1.0 / length({column}))"
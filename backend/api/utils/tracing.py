@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Coroutine, Iterator, Optional, ParamSpec, TypeVar
+
+from opentelemetry import propagate, trace
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+)
+from opentelemetry.trace import Link, Span, SpanKind
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from api.settings import settings
+
+_P = ParamSpec("_P")
+_R = TypeVar("_R")
+
+# Statements are cut to that length in span attributes
+MAX_STATEMENT_LENGTH = 1000
+
+tracer = trace.get_tracer("plotstats")
+
+
+def setup_tracing() -> None:
+    """Installs the span exporter chosen by settings.tracing_exporter"""
+    if settings.tracing_exporter is None:
+        return
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name})
+    )
+    provider.add_span_processor(BatchSpanProcessor(get_span_exporter()))
+    trace.set_tracer_provider(provider)
+
+
+def get_span_exporter() -> SpanExporter:
+    if settings.tracing_exporter == "otlp":
+        # Endpoint and headers come from the OTEL_EXPORTER_OTLP_* variables
+        return OTLPSpanExporter()
+    return ConsoleSpanExporter(
+        out=open(settings.tracing_file, "a"), formatter=format_span
+    )
+
+
+def format_span(span: ReadableSpan) -> str:
+    # One span per line, e.g. jq 'select(.context.trace_id == "0x...")'
+    return f"{span.to_json(indent=None)}\n"
+
+
+def get_trace_context() -> dict[str, str]:
+    """Current span context to pass along with Celery task arguments"""
+    carrier: dict[str, str] = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+def traced(
+    name: str,
+) -> Callable[
+    [Callable[_P, Coroutine[Any, Any, _R]]], Callable[_P, Coroutine[Any, Any, _R]]
+]:
+    def _decorator(
+        func: Callable[_P, Coroutine[Any, Any, _R]]
+    ) -> Callable[_P, Coroutine[Any, Any, _R]]:
+        @wraps(func)
+        async def _traced(*args: _P.args, **kwargs: _P.kwargs) -> _R:
+            with tracer.start_as_current_span(name):
+                return await func(*args, **kwargs)
+
+        return _traced
+
+    return _decorator
+
+
+@contextmanager
+def task_span(name: str, trace_context: Optional[dict[str, str]]) -> Iterator[Span]:
+    """Root span of a Celery task, linked to the span that scheduled it.
+
+    Periodic scans run long after the request that scheduled them, so the
+    scheduling span is a link rather than the parent of every run.
+    """
+    links = []
+    if trace_context:
+        scheduled_by = trace.get_current_span(propagate.extract(trace_context))
+        links.append(Link(scheduled_by.get_span_context()))
+    with tracer.start_as_current_span(
+        name, kind=SpanKind.CONSUMER, links=links
+    ) as span:
+        yield span
+
+
+def trace_engine(engine: Engine) -> None:
+    """Adds a span for every statement executed through the engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn: Any, cursor: Any, statement: str, *args: Any
+    ) -> None:
+        span = tracer.start_span(
+            statement.lstrip().split(None, 1)[0] if statement else "SQL",
+            kind=SpanKind.CLIENT,
+        )
+        if span.is_recording():
+            span.set_attribute("db.system", engine.dialect.name)
+            span.set_attribute("db.statement", statement[:MAX_STATEMENT_LENGTH])
+        conn.info.setdefault("query_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn: Any, *args: Any) -> None:
+        conn.info["query_spans"].pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context: Any) -> None:
+        spans = context.connection.info.get("query_spans")
+        if spans:
+            span = spans.pop()
+            span.record_exception(context.original_exception)
+            span.set_status(trace.StatusCode.ERROR)
+            span.end()
@@ -5,8 +5,13 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.models.user import User
+from api.settings import settings
+from api.utils.executor import MeteredExecutor
+from api.utils.jwt import invalidate_cached_user
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt takes a few hundred milliseconds, running it inline stalls the event loop
+password_executor = MeteredExecutor("password", settings.password_hash_workers)
 
 
 async def get_user_by_email(
@@ -27,13 +32,21 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)  # type: ignore
 
 
+async def async_verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def async_get_password_hash(password: str) -> str:
+    return await password_executor.run(get_password_hash, password)
+
+
 async def authenticate_user(
     session: AsyncSession, email: str, password: str
 ) -> User | bool:
     user = await get_user_by_email(session, email)
     if not user or not password:
         return False
-    if not verify_password(password, user.password):
+    if not await async_verify_password(password, user.password):
         return False
     return user
 
@@ -44,6 +57,7 @@ async def add_favorite_search(
     user.favorite_search_id = search_id
     session.add(user)
     await session.commit()
+    invalidate_cached_user(user.id)  # type: ignore
 
 
 async def get_all_users(
@@ -0,0 +1,8 @@
+from api.settings import setup_logging
+from api.utils.celery_utils import create_celery
+from api.utils.tracing import setup_tracing
+
+# Celery entry point, unlike api.asgi it doesn't import the GraphQL schema
+setup_logging()
+setup_tracing()
+celery = create_celery()
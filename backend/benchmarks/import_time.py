@@ -0,0 +1,85 @@
+"""Import time and memory of the API and worker entry points
+
+Run from backend/ with the application's environment variables set (the ones
+from setup.cfg are enough). Every module is imported in a fresh interpreter,
+comma separated modules are imported together:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time api.worker,api.periodic_tasks --slowest 20
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+MODULES = (
+    "api.settings",
+    "api.utils.fetching",
+    "api.periodic_tasks",
+    # A worker also imports its tasks, see CELERY_IMPORTS in api.settings
+    "api.worker,api.periodic_tasks",
+    "api.asgi",
+)
+# Packages the worker shouldn't need, reported when a module imports them
+HEAVY_PACKAGES = ("fastapi", "strawberry", "api.schema", "api.schemas")
+CODE = (
+    "import resource, {modules};"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def import_modules(modules: str) -> tuple[dict[str, tuple[int, int]], int]:
+    """Cumulative and own import time in microseconds of every imported module
+    and the peak memory of the interpreter in KiB"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODE.format(modules=modules)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if match := IMPORT_TIME_LINE.match(line):
+            own, cumulative, _, name = match.groups()
+            timings[name] = (int(cumulative), int(own))
+    return timings, int(result.stdout)
+
+
+def main(modules: list[str], runs: int, slowest: int) -> None:
+    for module in modules:
+        names = module.split(",")
+        totals = []
+        for _ in range(runs):
+            timings, rss = import_modules(module)
+            # A module already imported by a previous one is reported once
+            totals.append(sum(timings.get(name, (0, 0))[0] for name in names))
+        loaded = [
+            package
+            for package in HEAVY_PACKAGES
+            if package in timings and package not in names
+        ]
+        print(
+            f"{module}: {statistics.median(totals) / 1000:.0f} ms"
+            f" (median of {runs}), {len(timings)} modules, max RSS {rss // 1024} MiB"
+        )
+        print(f"  heavy packages: {', '.join(loaded) or 'none'}")
+        top_level = {
+            name: cumulative
+            for name, (cumulative, _) in timings.items()
+            if "." not in name and name not in names
+        }
+        for name, cumulative in sorted(
+            top_level.items(), key=lambda item: item[1], reverse=True
+        )[:slowest]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(MODULES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--slowest", type=int, default=8)
+    arguments = parser.parse_args()
+    main(arguments.modules, arguments.runs, arguments.slowest)
@@ -0,0 +1,125 @@
+"""Latency of regular API requests while a burst of logins hashes passwords
+
+Run from backend/ with the application's environment variables set (the ones
+from setup.cfg are enough, the benchmark uses its own sqlite database):
+
+    python -m benchmarks.login_storm
+    python -m benchmarks.login_storm --inline  # bcrypt on the event loop
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.database import get_async_session
+from api.main import create_app
+from api.models import Category, User
+from api.utils import user as user_utils
+from api.utils.jwt import create_jwt_token
+
+EMAIL = "storm@test.com"
+PASSWORD = "stormpass"
+LOGIN_MUTATION = f"""
+    mutation login {{
+        login(input: {{email: "{EMAIL}", password: "{PASSWORD}"}}) {{
+            __typename
+        }}
+    }}
+"""
+CATEGORIES_QUERY = "query categories { categories { name } }"
+
+
+def percentile(values: list[float], percent: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+async def run_inline(func: Callable[..., Any], *args: Any) -> Any:
+    return func(*args)
+
+
+async def storm(client: httpx.AsyncClient, logins: int, queries: int) -> list[float]:
+    latencies: list[float] = []
+
+    async def query() -> None:
+        started_at = time.perf_counter()
+        response = await client.post("/graphql", json={"query": CATEGORIES_QUERY})
+        latencies.append(time.perf_counter() - started_at)
+        assert "errors" not in response.json()
+
+    async def queries_during_storm() -> None:
+        tasks = []
+        for _ in range(queries):
+            tasks.append(asyncio.create_task(query()))
+            await asyncio.sleep(0.005)
+        await asyncio.gather(*tasks)
+
+    await asyncio.gather(
+        queries_during_storm(),
+        *(
+            client.post("/graphql", json={"query": LOGIN_MUTATION})
+            for _ in range(logins)
+        ),
+    )
+    return latencies
+
+
+async def main(logins: int, queries: int, inline: bool) -> None:
+    directory = tempfile.TemporaryDirectory()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{directory.name}/bench.db")
+    session_maker = sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False  # type: ignore
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with session_maker() as session:
+        user = User(
+            email=EMAIL,
+            password=user_utils.get_password_hash(PASSWORD),
+            is_active=True,
+        )
+        session.add_all([user, Category(name="Plot")])
+        await session.commit()
+        token = create_jwt_token(subject=str(user.id), fresh=True)
+
+    async def override_db() -> AsyncIterator[AsyncSession]:
+        async with session_maker() as session:
+            yield session
+
+    app = create_app()
+    app.dependency_overrides[get_async_session] = override_db
+    if inline:
+        user_utils.password_executor.run = run_inline  # type: ignore
+    async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
+        client.headers.update({"Authorization": f"Bearer {token}"})
+        baseline = await storm(client, 0, queries)
+        during_storm = await storm(client, logins, queries)
+    await engine.dispose()
+    directory.cleanup()
+
+    mode = "inline" if inline else f"{user_utils.password_executor.max_workers} threads"
+    print(f"bcrypt: {mode}, {logins} logins, {queries} queries")
+    for name, latencies in (("idle", baseline), ("login storm", during_storm)):
+        print(
+            f"{name:>12}: p50 {percentile(latencies, 50) * 1000:8.1f} ms"
+            f"  p99 {percentile(latencies, 99) * 1000:8.1f} ms"
+            f"  max {max(latencies) * 1000:8.1f} ms"
+        )
+    if not inline:
+        print(f"password pool: {user_utils.password_executor.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--inline", action="store_true")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.logins, arguments.queries, arguments.inline))
@@ -0,0 +1,62 @@
+"""Latency of opening a session and running one query, pooled and unpooled
+
+Run from backend/ with the application's environment variables set, against the
+configured Postgres database or any other one:
+
+    python -m benchmarks.session_overhead
+    python -m benchmarks.session_overhead --db-uri postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from api.database import async_session, get_pool_options
+from api.settings import settings
+
+
+def percentile(values: list[float], percent: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+async def measure(db_uri: str, sessions: int, **options: Any) -> list[float]:
+    engine = create_async_engine(db_uri, **options)
+    latencies = []
+    for _ in range(sessions):
+        started_at = time.perf_counter()
+        async with async_session(bind=engine) as session:
+            await session.exec(text("SELECT 1"))  # type: ignore
+        latencies.append(time.perf_counter() - started_at)
+    await engine.dispose()
+    return latencies
+
+
+async def main(db_uri: str, sessions: int) -> None:
+    pool_options = get_pool_options()
+    if not db_uri.startswith("postgresql+asyncpg"):
+        pool_options.pop("connect_args")
+    modes = {
+        "unpooled": {"poolclass": NullPool},
+        "pgbouncer" if settings.db_pgbouncer else "pooled": pool_options,
+    }
+    print(f"{sessions} sequential sessions")
+    for name, options in modes.items():
+        latencies = await measure(db_uri, sessions, **options)
+        print(
+            f"{name:>10}: p50 {percentile(latencies, 50) * 1000:8.2f} ms"
+            f"  p99 {percentile(latencies, 99) * 1000:8.2f} ms"
+            f"  total {sum(latencies):6.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-uri", default=settings.db_uri)
+    parser.add_argument("--sessions", type=int, default=500)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.db_uri, arguments.sessions))
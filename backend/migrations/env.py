@@ -1,5 +1,6 @@
 import asyncio
 from logging.config import fileConfig
+from typing import Any
 
 from alembic import context
 from sqlalchemy import pool
@@ -9,6 +10,7 @@ from sqlmodel import SQLModel
 
 from api.models import *
 from api.settings import settings
+from api.utils.partitions import PARTITIONED_TABLES
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -24,6 +26,33 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = SQLModel.metadata
 
+
+# (table, columns) of foreign keys to searchevent that the models declare for
+# the ORM joins, but which the partitioning migration replaced in postgres,
+# see migrations/versions/8c4e2d7a1f03_partition_price_and_searchevent.py and
+# migrations/versions/9d3a6e1f5c27_check_searcheventestate_search_event.py
+SEARCHEVENT_FOREIGN_KEYS = {
+    ("price", ("search_event_id",)),
+    ("price", ("search_event_id", "date")),
+    ("searcheventestate", ("search_event_id",)),
+}
+
+
+def include_object(
+    object: Any, name: str | None, type_: str, reflected: bool, compare_to: Any
+) -> bool:
+    """Skip monthly partitions, they are managed by api.utils.partitions, and
+    the foreign keys to the partitioned searchevent table."""
+    if type_ == "table" and reflected and name:
+        return not any(name.startswith(f"{table}_") for table in PARTITIONED_TABLES)
+    if type_ == "foreign_key_constraint" and object.referred_table.name == (
+        "searchevent"
+    ):
+        columns = tuple(column.name for column in object.columns)
+        return (object.table.name, columns) not in SEARCHEVENT_FOREIGN_KEYS
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -48,6 +77,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -55,7 +85,14 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # Set when migrating another schema than public, with the search_path
+        # of the connection pointing at it, see tests/test_query_plans.py
+        version_table_schema=config.attributes.get("version_table_schema"),
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -80,7 +117,10 @@ async def run_async_migrations() -> None:
 
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
-
+    # Passed in by callers running the migrations on their own connection
+    if (connection := config.attributes.get("connection")) is not None:
+        do_run_migrations(connection)
+        return
     asyncio.run(run_async_migrations())
 
 
@@ -0,0 +1,50 @@
+"""order estate search by index
+
+Revision ID: 7e5b3d9a2c14
+Revises: 4d2a8e6c0f57
+Create Date: 2026-10-19 21:04:37.518206
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7e5b3d9a2c14"
+down_revision = "4d2a8e6c0f57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # GiST serves both the ILIKE filters and the nearest neighbour order of
+    # searchEstates, GIN only the filters
+    op.drop_index(
+        "ix_estate_search_text",
+        table_name="estate",
+        postgresql_using="gin",
+        postgresql_ops={"search_text": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_estate_search_text",
+        "estate",
+        ["search_text"],
+        unique=False,
+        postgresql_using="gist",
+        postgresql_ops={"search_text": "gist_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_estate_search_text",
+        table_name="estate",
+        postgresql_using="gist",
+        postgresql_ops={"search_text": "gist_trgm_ops"},
+    )
+    op.create_index(
+        "ix_estate_search_text",
+        "estate",
+        ["search_text"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"search_text": "gin_trgm_ops"},
+    )
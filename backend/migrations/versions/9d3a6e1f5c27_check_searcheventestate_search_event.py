@@ -0,0 +1,78 @@
+"""check searcheventestate search events
+
+Revision ID: 9d3a6e1f5c27
+Revises: 5f2d9c7b1e48
+Create Date: 2026-10-20 15:42:08.913527
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9d3a6e1f5c27"
+down_revision = "5f2d9c7b1e48"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # searcheventestate has no date column to reference the partitioned
+    # searchevent (id, date) key with, so its former foreign key is enforced by
+    # triggers: links need an existing search event, and search events can't be
+    # deleted while linked (the old constraint was NO ACTION). Detaching an old
+    # partition, see api.utils.partitions.detach_old_partitions, fires no
+    # triggers, so the links of archived search events are kept.
+    op.execute(
+        """
+        CREATE FUNCTION searcheventestate_check_search_event() RETURNS trigger AS $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM searchevent WHERE id = NEW.search_event_id
+            ) THEN
+                RAISE foreign_key_violation USING MESSAGE = format(
+                    'searchevent %s referenced by searcheventestate does not exist',
+                    NEW.search_event_id
+                );
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER searcheventestate_check_search_event
+        BEFORE INSERT OR UPDATE OF search_event_id ON searcheventestate
+        FOR EACH ROW EXECUTE FUNCTION searcheventestate_check_search_event()
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION searchevent_check_searcheventestate() RETURNS trigger AS $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM searcheventestate WHERE search_event_id = OLD.id
+            ) THEN
+                RAISE foreign_key_violation USING MESSAGE = format(
+                    'searchevent %s is still referenced by searcheventestate',
+                    OLD.id
+                );
+            END IF;
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER searchevent_check_searcheventestate
+        BEFORE DELETE OR UPDATE OF id ON searchevent
+        FOR EACH ROW EXECUTE FUNCTION searchevent_check_searcheventestate()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER searchevent_check_searcheventestate ON searchevent")
+    op.execute("DROP FUNCTION searchevent_check_searcheventestate()")
+    op.execute("DROP TRIGGER searcheventestate_check_search_event ON searcheventestate")
+    op.execute("DROP FUNCTION searcheventestate_check_search_event()")
@@ -1,6 +1,9 @@
-from typing import Any, AsyncIterator, Generator
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, ContextManager, Generator, Iterator
 
 import fakeredis
+import fakeredis.aioredis
 import httpx
 import pytest
 import pytest_asyncio
@@ -14,11 +17,12 @@ from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
-from api.database import get_async_session
+from api.database import async_session, get_async_session, get_session_maker
 from api.main import create_app
 from api.models.category import Category
 from api.models.user import User
 from api.utils.jwt import create_jwt_token
+from api.utils.query_counter import QueryStats, collect_queries, count_queries
 from api.utils.user import get_password_hash
 
 examples: dict[str, dict[str, str | int]] = {
@@ -58,11 +62,38 @@ def app() -> Generator[FastAPI, None, None]:
 
 
 @pytest.fixture
-def cache() -> Generator[fakeredis.FakeRedis, None, None]:
-    cache = fakeredis.FakeRedis(decode_responses=True)  # type:ignore
+def redis_server() -> fakeredis.FakeServer:
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def cache(
+    redis_server: fakeredis.FakeServer,
+) -> Generator[fakeredis.FakeRedis, None, None]:
+    cache = fakeredis.FakeRedis(  # type: ignore[no-untyped-call]
+        server=redis_server, decode_responses=True
+    )
     yield cache
 
 
+@pytest.fixture
+def async_cache(
+    redis_server: fakeredis.FakeServer, mocker: MockerFixture
+) -> fakeredis.aioredis.FakeRedis:
+    """Client used by the code under test, sees the data of the cache fixture"""
+    async_cache = fakeredis.aioredis.FakeRedis(
+        server=redis_server, decode_responses=True
+    )
+    for module in (
+        "api.periodic_tasks",
+        "api.utils.fetching",
+        "api.utils.replica",
+        "api.utils.scan_progress",
+    ):
+        mocker.patch(f"{module}.get_async_cache", return_value=async_cache)
+    return async_cache
+
+
 @pytest_asyncio.fixture
 async def _db_session() -> AsyncIterator[AsyncSession]:
     """Create temporary database for tests"""
@@ -86,6 +117,25 @@ async def _db_session() -> AsyncIterator[AsyncSession]:
     await engine.dispose()
 
 
+@pytest.fixture
+def assert_max_queries(
+    _db_session: AsyncSession,
+) -> Callable[[int], ContextManager[QueryStats]]:
+    """Fails the test when the block runs more SQL statements than allowed"""
+    count_queries(_db_session.bind.sync_engine)
+
+    @contextmanager
+    def _assert_max_queries(maximum: int) -> Iterator[QueryStats]:
+        with collect_queries(keep_statements=True) as stats:
+            yield stats
+        statements = "\n".join(stats.statements or [])
+        assert (
+            stats.count <= maximum
+        ), f"{stats.count} statements ran, expected at most {maximum}:\n{statements}"
+
+    return _assert_max_queries
+
+
 @pytest.fixture
 def caplog(caplog: LogCaptureFixture) -> Generator[LogCaptureFixture, None, None]:
     handler_id = logger.add(
@@ -110,7 +160,7 @@ async def client(
     _db_session: AsyncSession,
     caplog: LogCaptureFixture,
     mocker: MockerFixture,
-    cache: fakeredis.FakeRedis,
+    async_cache: fakeredis.aioredis.FakeRedis,
     celery_config: dict[str, str],
 ) -> AsyncIterator[httpx.AsyncClient]:
     async def override_db() -> AsyncIterator[AsyncSession]:
@@ -118,8 +168,10 @@ async def client(
             yield s
 
     app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[get_session_maker] = lambda: partial(
+        async_session, bind=_db_session.bind
+    )
 
-    mocker.patch("api.utils.fetching.cache", cache)
     async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
         yield client
 
@@ -131,7 +183,7 @@ async def authenticated_client(
     add_user: User,
     caplog: LogCaptureFixture,
     mocker: MockerFixture,
-    cache: fakeredis.FakeRedis,
+    async_cache: fakeredis.aioredis.FakeRedis,
     celery_config: dict[str, str],
 ) -> AsyncIterator[httpx.AsyncClient]:
     async def override_db() -> AsyncIterator[AsyncSession]:
@@ -139,8 +191,10 @@ async def authenticated_client(
             yield s
 
     app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[get_session_maker] = lambda: partial(
+        async_session, bind=_db_session.bind
+    )
 
-    mocker.patch("api.utils.fetching.cache", cache)
     token = create_jwt_token(subject=str(add_user.id), fresh=True, token_type="access")
     async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
         client.headers.update({"Authorization": f"Bearer {token}"})
@@ -154,7 +208,7 @@ async def admin_client(
     add_admin: User,
     caplog: LogCaptureFixture,
     mocker: MockerFixture,
-    cache: fakeredis.FakeRedis,
+    async_cache: fakeredis.aioredis.FakeRedis,
     celery_config: dict[str, str],
 ) -> AsyncIterator[httpx.AsyncClient]:
     async def override_db() -> AsyncIterator[AsyncSession]:
@@ -162,8 +216,10 @@ async def admin_client(
             yield s
 
     app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[get_session_maker] = lambda: partial(
+        async_session, bind=_db_session.bind
+    )
 
-    mocker.patch("api.utils.fetching.cache", cache)
     token = create_jwt_token(subject=str(add_admin.id), fresh=True, token_type="access")
     async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
         client.headers.update({"Authorization": f"Bearer {token}"})
@@ -0,0 +1,84 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+import httpx
+import pyarrow.parquet as pq
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.models import Category, Estate, Price, Search, SearchEvent
+
+from .conftest import examples
+
+
+async def add_search_history(session: AsyncSession, category: Category) -> Search:
+    search = Search(category=category, **examples["search"])
+    estates = [Estate(id=i, **examples["estate"]) for i in (1, 2)]
+    base_date = datetime.utcnow() - timedelta(days=10)
+    events = [
+        SearchEvent(
+            search=search,
+            date=base_date + timedelta(days=i),
+            prices=[
+                Price(**{**examples["price"], "price": 1000 * i}, estate=estate)
+                for estate in estates
+            ],
+        )
+        for i in range(3)
+    ]
+    session.add_all([search, *estates, *events])
+    await session.commit()
+    return search
+
+
+@pytest.mark.asyncio
+async def test_export_search_csv(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    search = await add_search_history(_db_session, add_category)
+
+    response = await authenticated_client.get(f"/export/searches/{search.id}")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 6
+    assert [row["price"] for row in rows] == ["0", "0", "1000", "1000", "2000", "2000"]
+    assert rows[0]["estate_id"] == "1"
+    assert rows[0]["url"] == "https://www.test.io/pl/oferta/www.test.com"
+
+
+@pytest.mark.asyncio
+async def test_export_search_parquet(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    search = await add_search_history(_db_session, add_category)
+
+    date_from = (datetime.utcnow() - timedelta(days=9, hours=12)).isoformat()
+    response = await authenticated_client.get(
+        f"/export/searches/{search.id}",
+        params={"format": "parquet", "date_from": date_from},
+    )
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 4
+    assert table.column("price").to_pylist() == [1000, 1000, 2000, 2000]
+
+
+@pytest.mark.asyncio
+async def test_export_search_errors(
+    client: httpx.AsyncClient,
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    search = await add_search_history(_db_session, add_category)
+
+    response = await client.get(f"/export/searches/{search.id}")
+    assert response.status_code == 401
+    response = await authenticated_client.get("/export/searches/999")
+    assert response.status_code == 404
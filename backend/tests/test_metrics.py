@@ -0,0 +1,137 @@
+import asyncio
+import time
+from pathlib import Path
+
+import fakeredis
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from api.models import Category
+from api.utils.celery_utils import PRIORITY_STEPS, record_task_end, record_task_start
+from api.utils.executor import MeteredExecutor
+from api.utils.metrics import (
+    QueueDepthCollector,
+    instrument_engine,
+    instrument_pool,
+    observe_fetch,
+)
+
+CATEGORIES_QUERY = "query categories { categories { name } }"
+
+
+def get_count(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(f"{name}_count", labels) or 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(
+    authenticated_client: httpx.AsyncClient, add_category: Category
+) -> None:
+    labels = {"type": "Query", "field": "categories"}
+    before = get_count("plotstats_graphql_resolver_seconds", **labels)
+    response = await authenticated_client.post(
+        "/graphql", json={"query": CATEGORIES_QUERY}
+    )
+    assert "errors" not in response.json()
+    # Default resolvers of plain attributes aren't timed
+    assert get_count("plotstats_graphql_resolver_seconds", **labels) == before + 1
+    assert not get_count(
+        "plotstats_graphql_resolver_seconds", type="CategoryType", field="name"
+    )
+
+    observe_fetch(403, 1.5)
+    response = await authenticated_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'plotstats_graphql_resolver_seconds_count{field="categories"' in (
+        response.text
+    )
+    assert 'plotstats_fetch_seconds_count{status_code="403"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_db_query_metrics() -> None:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine.sync_engine, "test")
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        await connection.execute(text("  select 2"))
+        await connection.execute(text("PRAGMA user_version"))
+        with pytest.raises(Exception):
+            await connection.execute(text("SELECT * FROM missing"))
+        await connection.execute(text("SELECT 3"))
+    await engine.dispose()
+    assert (
+        get_count("plotstats_db_query_seconds", engine="test", operation="select") == 3
+    )
+    assert get_count("plotstats_db_query_seconds", engine="test", operation="other")
+
+
+@pytest.mark.asyncio
+async def test_db_pool_metrics(tmp_path: Path) -> None:
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db", poolclass=AsyncAdaptedQueuePool
+    )
+    instrument_pool(engine.sync_engine, "pool")
+    labels = {"engine": "pool"}
+    async with engine.connect() as first, engine.connect() as second:
+        await first.execute(text("SELECT 1"))
+        await second.execute(text("SELECT 1"))
+        assert REGISTRY.get_sample_value("plotstats_db_pool_checked_out", labels) == 2
+    assert REGISTRY.get_sample_value("plotstats_db_pool_checked_out", labels) == 0
+    # Connections stay open for the next checkout
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    assert REGISTRY.get_sample_value("plotstats_db_pool_connects_total", labels) == 2
+    assert REGISTRY.get_sample_value("plotstats_db_pool_connections", labels) == 2
+    await engine.dispose()
+    assert REGISTRY.get_sample_value("plotstats_db_pool_connections", labels) == 0
+
+
+def test_celery_task_metrics(mocker: MockerFixture) -> None:
+    task = mocker.Mock()
+    task.name = "api.periodic_tasks.test_task"
+    record_task_start(task_id="1", task=task)
+    record_task_end(task_id="1", task=task, state="SUCCESS")
+    # Tasks that never started aren't recorded
+    record_task_end(task_id="2", task=task, state="FAILURE")
+    assert get_count("plotstats_celery_task_seconds", task=task.name, state="SUCCESS")
+    assert not get_count(
+        "plotstats_celery_task_seconds", task=task.name, state="FAILURE"
+    )
+
+
+def test_queue_depth_collector() -> None:
+    collector = QueueDepthCollector(
+        "redis://", lambda: ["scheduled", "empty"], PRIORITY_STEPS
+    )
+    collector._client = fakeredis.FakeRedis()  # type: ignore[no-untyped-call]
+    collector.client.lpush("scheduled", "first", "second")
+    collector.client.lpush("scheduled:6", "third")
+    (gauge,) = collector.collect()
+    samples = {sample.labels["queue"]: sample.value for sample in gauge.samples}
+    assert samples == {"scheduled": 3, "empty": 0}
+
+
+@pytest.mark.asyncio
+async def test_executor_metrics() -> None:
+    executor = MeteredExecutor("metrics_test", max_workers=1)
+    await asyncio.gather(executor.run(time.sleep, 0.05), executor.run(time.sleep, 0.05))
+    executor.shutdown()
+    labels = {"executor": "metrics_test"}
+    assert get_count("plotstats_executor_wait_seconds", **labels) == 2
+    assert get_count("plotstats_executor_run_seconds", **labels) == 2
+    for gauge in ("plotstats_executor_queued", "plotstats_executor_running"):
+        assert REGISTRY.get_sample_value(gauge, labels) == 0
+    # The second call waited for the first one
+    assert (
+        REGISTRY.get_sample_value(
+            "plotstats_executor_wait_seconds_bucket", {**labels, "le": "0.025"}
+        )
+        == 1
+    )
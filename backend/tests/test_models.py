@@ -1,3 +1,5 @@
+from datetime import datetime
+
 import pytest
 from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
@@ -81,3 +83,27 @@ async def test_search_event(_db_session: AsyncSession) -> None:
     assert from_db.search == search
     assert from_db.prices[0] == price
     assert from_db.estates[0] == estate
+
+
+@pytest.mark.asyncio
+async def test_price_inherits_search_event_date(_db_session: AsyncSession) -> None:
+    estate = Estate(id=1, **examples["estate"])
+    search = Search(**examples["search"])
+    search_event = SearchEvent(search=search, date=datetime(2024, 1, 31, 23, 59))
+    price = Price(**examples["price"], estate=estate, search_event=search_event)
+    _db_session.add_all([estate, search_event, price])
+    await _db_session.commit()
+    assert price.date == search_event.date
+
+
+@pytest.mark.asyncio
+async def test_price_looks_up_search_event_date(_db_session: AsyncSession) -> None:
+    estate = Estate(id=1, **examples["estate"])
+    search = Search(**examples["search"])
+    search_event = SearchEvent(search=search, date=datetime(2024, 1, 31, 23, 59))
+    _db_session.add_all([estate, search_event])
+    await _db_session.commit()
+    price = Price(**examples["price"], estate_id=1, search_event_id=search_event.id)
+    _db_session.add(price)
+    await _db_session.commit()
+    assert price.date == datetime(2024, 1, 31, 23, 59)
@@ -1,4 +1,5 @@
 # type: ignore
+import copy
 import json
 
 import pytest
@@ -7,9 +8,17 @@ from pytest_mock import MockerFixture
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from api.models import Category, Estate, Price, Search, SearchEvent
+from api.models import (
+    Category,
+    Estate,
+    EstateFingerprint,
+    Price,
+    PriceChange,
+    Search,
+    SearchEvent,
+)
 from api.parsing import parse_scan_data
-from api.types.scan import PydanticScanSchedule
+from api.schedulers import PydanticScanSchedule
 
 SEARCH_EXPECTED = {
     "plot": {
@@ -21,6 +30,10 @@ SEARCH_EXPECTED = {
         "location": "Gdańsk, pomorskie",
         "to_price": 150000,
         "to_surface": 9999,
+        "sw_lat": 54.27400257787667,
+        "sw_lng": 18.428000875283033,
+        "ne_lat": 54.44800258614123,
+        "ne_lng": 18.9510009001242,
     },
     "apartment": {
         "coordinates": "neLat: 50.873298714832345, neLng: 16.52979958242213, swLat: "
@@ -31,6 +44,10 @@ SEARCH_EXPECTED = {
         "location": "Świdnica, świdnicki, dolnośląskie",
         "to_price": 750000,
         "to_surface": 60,
+        "sw_lat": 50.80789871648449,
+        "sw_lng": 16.455299584304157,
+        "ne_lat": 50.873298714832345,
+        "ne_lng": 16.52979958242213,
     },
     "house": {
         "coordinates": "neLat: 50.42609872612957, neLng: 16.531299582384236, swLat: "
@@ -41,6 +58,10 @@ SEARCH_EXPECTED = {
         "location": "Polanica-Zdrój, kłodzki, dolnośląskie",
         "to_price": 800000,
         "to_surface": 120,
+        "sw_lat": 50.371698727503826,
+        "sw_lng": 16.467599583993433,
+        "ne_lat": 50.42609872612957,
+        "ne_lng": 16.531299582384236,
     },
 }
 
@@ -274,3 +295,74 @@ async def test_second_scan_parsing(_db_session: AsyncSession) -> None:
     prices_parsed = (await _db_session.exec(select(Price))).all()
     assert len(estates_parsed) == 36
     assert len(prices_parsed) == 72
+
+
+@pytest.mark.asyncio
+async def test_price_changes_parsing(_db_session: AsyncSession) -> None:
+    category = Category(name="Plot")
+    _db_session.add(category)
+    await _db_session.commit()
+
+    with open("tests/example_files/body_plot.json", "r") as f:
+        body = json.load(f)
+
+    await parse_scan_data("https://www.test.io/test", body, _db_session)
+    changes = (await _db_session.exec(select(PriceChange))).all()
+    assert len(changes) == 36
+    assert all(change.old_price is None for change in changes)
+
+    ads = body["pageProps"]["data"]["searchAds"]["items"]
+    old_price = ads[0]["totalPrice"]["value"]
+    ads[0]["totalPrice"]["value"] = old_price - 5000
+    await parse_scan_data("https://www.test.io/test", body, _db_session)
+    changes = (
+        await _db_session.exec(
+            select(PriceChange).where(PriceChange.old_price.is_not(None))
+        )
+    ).all()
+    assert len(changes) == 1
+    assert changes[0].estate_id == ads[0]["id"]
+    assert changes[0].old_price == old_price
+    assert changes[0].new_price == old_price - 5000
+    estate = await _db_session.get(Estate, ads[0]["id"])
+    assert estate.last_price == old_price - 5000
+
+    # Unchanged prices are not recorded again
+    await parse_scan_data("https://www.test.io/test", body, _db_session)
+    assert len((await _db_session.exec(select(PriceChange))).all()) == 37
+
+
+@pytest.mark.asyncio
+async def test_duplicate_estates_parsing(_db_session: AsyncSession) -> None:
+    category = Category(name="Plot")
+    _db_session.add(category)
+    await _db_session.commit()
+
+    with open("tests/example_files/body_plot.json", "r") as f:
+        body = json.load(f)
+
+    await parse_scan_data("https://www.test.io/test", body, _db_session)
+    ads = body["pageProps"]["data"]["searchAds"]["items"]
+    # The same plot listed again by another agency
+    relisted = copy.deepcopy(ads[0])
+    relisted["id"] = 99999999
+    relisted["title"] = ads[0]["title"] + "!"
+    # Same title, but a different plot
+    other_area = copy.deepcopy(ads[0])
+    other_area["id"] = 99999998
+    other_area["areaInSquareMeters"] = ads[0]["areaInSquareMeters"] * 2
+    ads.extend([relisted, other_area])
+    await parse_scan_data("https://www.test.io/test", body, _db_session)
+
+    relisted_db = await _db_session.get(Estate, relisted["id"])
+    assert relisted_db.duplicate_of_id == ads[0]["id"]
+    other_area_db = await _db_session.get(Estate, other_area["id"])
+    assert other_area_db.duplicate_of_id is None
+    duplicates = (
+        await _db_session.exec(
+            select(Estate).where(Estate.duplicate_of_id.is_not(None))
+        )
+    ).all()
+    assert [estate.id for estate in duplicates] == [relisted["id"]]
+    fingerprints = (await _db_session.exec(select(EstateFingerprint))).all()
+    assert len(fingerprints) == 38
@@ -0,0 +1,299 @@
+"""Query plan regression suite.
+
+Runs the hot queries from api/utils/search.py and api/utils/search_event.py
+against a seeded postgres schema and checks their EXPLAIN (ANALYZE, BUFFERS)
+output. The schema is built by the Alembic migrations, so the plans use the
+partitioned tables and the indexes which only exist in migrations. Everything
+happens in a separate schema, in a single transaction which is rolled back,
+so it is safe to run against the development database. Skipped when postgres
+isn't reachable (e.g. outside of docker compose).
+"""
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+import pytest
+import pytest_asyncio
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.models import Search, SearchEvent
+from api.settings import settings
+from api.utils.estate import (
+    get_estates_in_box,
+    get_estates_price_history,
+    get_nearest_estates,
+    search_estates,
+)
+from api.utils.partitions import (
+    PARTITIONED_TABLES,
+    add_months,
+    create_partition_statement,
+    month_start,
+)
+from api.utils.search import (
+    get_search_events_for_search,
+    get_search_events_page,
+    get_search_failure_buckets,
+    get_search_failures,
+    get_search_success_buckets,
+    get_searches,
+    get_searches_covering_point,
+)
+from api.utils.search_event import get_search_event_prices, get_search_events_prices
+
+# mypy: ignore-errors
+
+PLAN_SCHEMA = "query_plan_tests"
+MIGRATIONS = Path(__file__).parents[1] / "migrations"
+SEARCHES = 200
+EVENTS_PER_SEARCH = 100
+PRICES_PER_EVENT = 10
+ESTATES = 20000
+
+SEED_STATEMENTS = [
+    "INSERT INTO category (id, name) VALUES (1, 'Plot')",
+    f"""
+    INSERT INTO search (id, category_id, location, distance_radius, url)
+    SELECT s, 1, 'City ' || s, 0, 'url-' || s FROM generate_series(1, {SEARCHES}) s
+    """,
+    f"""
+    INSERT INTO estate (id, title, city, url, latitude, longitude)
+    SELECT e, 'Estate ' || e, 'City', 'estate-' || e, 49 + (e % 500) / 100.0,
+        14 + (e / 500) / 10.0
+    FROM generate_series(1, {ESTATES}) e
+    """,
+    """
+    UPDATE search SET sw_lat = 49 + id / 100.0, sw_lng = 14 + id / 50.0,
+        ne_lat = 49.5 + id / 100.0, ne_lng = 14.5 + id / 50.0
+    """,
+    f"""
+    INSERT INTO searchevent (id, date, search_id)
+    SELECT e, localtimestamp - (e / {SEARCHES}) * interval '1 day', e % {SEARCHES} + 1
+    FROM generate_series(1, {SEARCHES * EVENTS_PER_SEARCH}) e
+    """,
+    f"""
+    INSERT INTO price (
+        price, price_per_square_meter, area_in_square_meters, estate_id,
+        search_event_id, date
+    )
+    SELECT 100000 + p * 1000, 100 + p, 1000, (se.id * {PRICES_PER_EVENT} + p)
+        % {ESTATES} + 1, se.id, se.date
+    FROM searchevent se, generate_series(1, {PRICES_PER_EVENT}) p
+    """,
+    f"""
+    INSERT INTO scanfailure (date, search_id, status_code)
+    SELECT localtimestamp - (f / {SEARCHES}) * interval '1 day', f % {SEARCHES} + 1,
+        403
+    FROM generate_series(1, {SEARCHES * EVENTS_PER_SEARCH}) f
+    """,
+]
+# Tiny lookup tables are always cheaper to scan than to index
+SEQ_SCAN_ALLOWED = {"category"}
+
+
+def seed_partition_statements() -> list[str]:
+    """Partitions of the seeded months, the migrations only create the ones from
+    the current month on"""
+    current_month = month_start(datetime.utcnow())
+    return [
+        create_partition_statement(table, add_months(current_month, -offset))
+        for offset in range(1, EVENTS_PER_SEARCH // 28 + 2)
+        for table in PARTITIONED_TABLES
+    ]
+
+
+def run_migrations(connection: Connection) -> None:
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS))
+    # Read by migrations/env.py
+    config.attributes["connection"] = connection
+    config.attributes["version_table_schema"] = PLAN_SCHEMA
+    command.upgrade(config, "head")
+
+
+@pytest_asyncio.fixture
+async def plan_connection() -> AsyncIterator[AsyncConnection]:
+    engine = create_async_engine(settings.db_uri, poolclass=NullPool)
+    try:
+        connection = await engine.connect()
+    except (OSError, DBAPIError):
+        await engine.dispose()
+        pytest.skip("Postgres is not available")
+    transaction = await connection.begin()
+    await connection.execute(text(f"CREATE SCHEMA {PLAN_SCHEMA}"))
+    # Unqualified names resolve to the new schema first. public stays on the
+    # path for the pg_trgm operator classes of a migrated database.
+    await connection.execute(text(f"SET LOCAL search_path TO {PLAN_SCHEMA}, public"))
+    await connection.run_sync(run_migrations)
+    for statement in seed_partition_statements() + SEED_STATEMENTS:
+        await connection.execute(text(statement))
+    for table in SQLModel.metadata.tables:
+        await connection.execute(text(f'ANALYZE "{table}"'))
+    yield connection
+    await transaction.rollback()
+    await connection.close()
+    await engine.dispose()
+
+
+def iter_plan_nodes(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+async def explain_queries(
+    connection: AsyncConnection, run: Callable[[AsyncSession], Awaitable[Any]]
+) -> list[tuple[str, dict[str, Any]]]:
+    """Run the hot query and return EXPLAIN output for every statement it sent"""
+    session = AsyncSession(bind=connection, expire_on_commit=False)
+    statements: list[str] = []
+
+    @event.listens_for(session.sync_session, "do_orm_execute")
+    def capture(orm_execute_state: Any) -> None:
+        if orm_execute_state.is_relationship_load:
+            # Relationship loads go through primary keys
+            return
+        compiled = orm_execute_state.statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        statements.append(str(compiled))
+
+    await run(session)
+    plans = []
+    for statement in dict.fromkeys(statements):
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}"
+        )
+        plan = result.scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        plans.append((statement, plan[0]["Plan"]))
+    await session.close()
+    return plans
+
+
+async def _first_event(session: AsyncSession) -> SearchEvent:
+    return (await session.exec(select(SearchEvent).where(SearchEvent.id == 1234))).one()
+
+
+async def run_search_event_prices(session: AsyncSession) -> Any:
+    return await get_search_event_prices(session, await _first_event(session))
+
+
+async def run_search_events_prices(session: AsyncSession) -> Any:
+    events = await get_search_events_page(session, search_id=17, first=50)
+    return await get_search_events_prices(session, events)
+
+
+async def run_search_events_page(session: AsyncSession) -> Any:
+    first_page = await get_search_events_page(session, search_id=17, first=50)
+    last = first_page[-1]
+    return await get_search_events_page(
+        session, search_id=17, first=50, after=(last.date, last.id)
+    )
+
+
+async def run_search_events_for_search(session: AsyncSession) -> Any:
+    search = (await session.exec(select(Search).where(Search.id == 17))).one()
+    return await get_search_events_for_search(
+        session,
+        search,
+        date_from=datetime.utcnow() - timedelta(days=30),
+        date_to=datetime.utcnow(),
+    )
+
+
+async def run_searches_page(session: AsyncSession) -> Any:
+    return await get_searches(session, first=50, after=100)
+
+
+async def run_search_failures(session: AsyncSession) -> Any:
+    return await get_search_failures(session, days=7)
+
+
+async def run_search_fail_rate_buckets(session: AsyncSession) -> Any:
+    await get_search_success_buckets(session, days=7, unit="day")
+    return await get_search_failure_buckets(session, days=7, unit="day")
+
+
+async def run_estates_price_history(session: AsyncSession) -> Any:
+    return await get_estates_price_history(session, list(range(100, 150)))
+
+
+async def run_searches_covering_point(session: AsyncSession) -> Any:
+    return await get_searches_covering_point(session, latitude=50.2, longitude=16.1)
+
+
+async def run_estates_in_box(session: AsyncSession) -> Any:
+    return await get_estates_in_box(
+        session, sw_lat=50, sw_lng=16, ne_lat=50.2, ne_lng=16.5, first=100
+    )
+
+
+async def run_nearest_estates(session: AsyncSession) -> Any:
+    return await get_nearest_estates(session, latitude=50.1, longitude=16.2, first=20)
+
+
+async def run_search_estates(session: AsyncSession) -> Any:
+    first_page = await search_estates(session, "Estate 1234", first=20)
+    estate, distance = first_page[-1]
+    return await search_estates(
+        session, "Estate 1234", first=20, after=(distance, estate.id)
+    )
+
+
+PLAN_CASES = [
+    # (hot query, max planner cost of any of its statements)
+    (run_search_event_prices, 500),
+    (run_search_events_prices, 5000),
+    (run_search_events_page, 500),
+    (run_search_events_for_search, 2000),
+    (run_searches_page, 500),
+    # Fail rate looks at every search, the budget keeps it from growing
+    (run_search_failures, 2000),
+    (run_estates_price_history, 1000),
+    (run_searches_covering_point, 500),
+    (run_estates_in_box, 1000),
+    (run_nearest_estates, 500),
+    (run_search_estates, 1000),
+    (run_search_fail_rate_buckets, 2000),
+]
+
+
+def is_empty_scan(node: dict[str, Any]) -> bool:
+    """Scan of an empty relation, like the partitions of future months"""
+    return not node["Actual Rows"] and not node.get("Rows Removed by Filter")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "run,max_cost", PLAN_CASES, ids=[case[0].__name__ for case in PLAN_CASES]
+)
+async def test_hot_query_plans(
+    plan_connection: AsyncConnection,
+    run: Callable[[AsyncSession], Awaitable[Any]],
+    max_cost: float,
+) -> None:
+    plans = await explain_queries(plan_connection, run)
+    assert plans, "Hot query didn't send any statements"
+    for statement, plan in plans:
+        seq_scans = {
+            node["Relation Name"]
+            for node in iter_plan_nodes(plan)
+            if node["Node Type"] == "Seq Scan" and not is_empty_scan(node)
+        } - SEQ_SCAN_ALLOWED
+        assert not seq_scans, f"Sequential scan on {seq_scans} for:\n{statement}"
+        assert plan["Total Cost"] <= max_cost, (
+            f"Plan cost {plan['Total Cost']} is over {max_cost} "
+            f"(shared hit blocks: {plan.get('Shared Hit Blocks')}, "
+            f"read blocks: {plan.get('Shared Read Blocks')}) for:\n{statement}"
+        )
@@ -1,7 +1,12 @@
+import asyncio
+import copy
+import hashlib
 import json
 from datetime import datetime, timedelta
+from typing import Callable, ContextManager
 
 import fakeredis
+import fakeredis.aioredis
 import httpx
 import pytest
 from freezegun import freeze_time
@@ -9,16 +14,26 @@ from pytest_mock import MockerFixture
 from sqlalchemy.orm import selectinload
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from strawberry.schema import execute as strawberry_execute
 
 from api.models import Category
 from api.models.estate import Estate
 from api.models.price import Price
+from api.models.price_change import PriceChange
 from api.models.scan_failure import ScanFailure
 from api.models.search import Search, decode_url, encode_url
 from api.models.search_event import SearchEvent
 from api.models.user import User
+from api.parsing import parse_scan_data
+from api.schema import schema
+from api.settings import settings
 from api.types.category import CategoryExistsError
+from api.utils import jwt as jwt_utils
+from api.utils.documents import documents
 from api.utils.jwt import get_jwt_payload
+from api.utils.persisted_queries import persisted_queries
+from api.utils.query_counter import QueryStats
+from api.utils.scan_progress import ScanProgressStatus, publish_scan_progress
 from api.utils.user import get_user_by_email, verify_password
 
 from .conftest import MockCffiJSONResponse, MockCffiTextResponse, examples
@@ -367,6 +382,21 @@ LAST_STATUS_QUERY: str = """
     }
 """
 
+LAST_STATUS_DETAILS_QUERY: str = """
+    query searchesLastStatus {
+        searchesLastStatus {
+            statuses {
+                id
+                status
+                lastSuccess
+                lastFailure
+                lastStatusCode
+                consecutiveFailures
+            }
+        }
+    }
+"""
+
 FAIL_RATE_QUERY: str = """
     query searchFailRate {{
     searchFailRate(input: {{days: {days}}}) {{
@@ -392,6 +422,205 @@ FAIL_RATE_QUERY: str = """
     }}
 """
 
+FAIL_RATE_HISTOGRAM_QUERY: str = """
+    query searchFailRate {{
+    searchFailRate(input: {{days: {days}, bucket: {bucket}}}) {{
+        ... on SearchFailRateHistogramType {{
+        __typename
+        bucket
+        searches {{
+            searchId
+            buckets {{
+            start
+            successes
+            failures
+            statuses {{
+                status
+                count
+            }}
+            }}
+        }}
+        }}
+    }}
+    }}
+"""
+
+ESTATE_PRICE_HISTORY_QUERY: str = """
+    query estatePriceHistory {{
+    estatePriceHistory(input: {{estateId: {estate_id}, dateFrom: "{date_from}"}}) {{
+        __typename
+        ... on EstatePriceHistoryType {{
+        estateId
+        prices {{
+            date
+            price
+            pricePerSquareMeter
+        }}
+        }}
+    }}
+    }}
+"""
+
+ESTATES_PRICE_HISTORY_QUERY: str = """
+    query estatesPriceHistory {{
+    estatesPriceHistory(input: {{estateIds: {estate_ids}}}) {{
+        __typename
+        ... on EstatesPriceHistoryType {{
+        histories {{
+            estateId
+            prices {{
+            price
+            }}
+        }}
+        }}
+    }}
+    }}
+"""
+
+PRICE_CHANGES_QUERY: str = """
+    query priceChanges {{
+    priceChanges(input: {{searchId: {search_id}, since: "{since}"}}) {{
+        __typename
+        ... on PriceChangesType {{
+        changes {{
+            estateId
+            oldPrice
+            newPrice
+            isNewListing
+        }}
+        }}
+    }}
+    }}
+"""
+
+SEARCHES_COVERING_POINT_QUERY: str = """
+    query searchesCoveringPoint {{
+    searchesCoveringPoint(input: {{latitude: {latitude}, longitude: {longitude}}}) {{
+        __typename
+        ... on SearchesType {{
+        searches {{
+            id
+        }}
+        }}
+    }}
+    }}
+"""
+
+ESTATES_IN_BOX_QUERY: str = """
+    query estatesInBox {{
+    estatesInBox(
+        input: {{swLat: 50.0, swLng: 16.0, neLat: 51.0, neLng: 17.0}},
+        first: {first},
+        after: "{after}"
+    ) {{
+        __typename
+        ... on EstatesLocationType {{
+        estates {{
+            id
+            latitude
+            longitude
+        }}
+        pageInfo {{
+            hasNextPage
+            endCursor
+        }}
+        }}
+    }}
+    }}
+"""
+
+NEAREST_ESTATES_QUERY: str = """
+    query nearestEstates {{
+    nearestEstates(input: {{latitude: {latitude}, longitude: {longitude}, first: 2}}) {{
+        __typename
+        ... on EstatesLocationType {{
+        estates {{
+            id
+        }}
+        }}
+    }}
+    }}
+"""
+
+SEARCH_ESTATES_QUERY: str = """
+    query searchEstates {{
+    searchEstates(
+        text: "{text}", filters: {filters}, first: {first}, after: "{after}"
+    ) {{
+        __typename
+        ... on EstatesLocationType {{
+        estates {{
+            id
+        }}
+        pageInfo {{
+            hasNextPage
+            endCursor
+        }}
+        }}
+    }}
+    }}
+"""
+
+
+PAGINATED_SEARCHES_QUERY: str = """
+    query allSearches {{
+    allSearches(first: {first}, after: "{after}") {{
+        __typename
+        ... on SearchesType {{
+        searches {{
+            id
+        }}
+        pageInfo {{
+            hasNextPage
+            endCursor
+        }}
+        }}
+        ... on InvalidCursorError {{
+        message
+        }}
+        ... on PageSizeOutOfRangeError {{
+        message
+        }}
+    }}
+    }}
+"""
+
+PAGINATED_SEARCH_EVENTS_STATS: str = """
+query searchEventsStats {{
+  searchEventsStats(input: {{id: {id}, first: {first}, after: "{after}"}}) {{
+    __typename
+    ... on SearchEventsStatsType {{
+      searchEvents {{
+        id
+        numberOfOffers
+      }}
+      pageInfo {{
+        hasNextPage
+        endCursor
+      }}
+    }}
+    ... on InvalidCursorError {{
+      message
+    }}
+  }}
+}}
+"""
+
+SEARCH_STATS_QUERY: str = """
+query searchStats {{
+  searchStats(input: {{id: {id}}}) {{
+    __typename
+    ... on SearchStatsType {{
+      avgPriceTotal
+      events {{
+        id
+        avgPrice
+      }}
+    }}
+  }}
+}}
+"""
+
 
 @pytest.mark.asyncio
 async def test_categories_query(
@@ -2328,3 +2557,952 @@ async def test_get_fail_rate(
         error["data"]["searchFailRate"]["message"]
         == "Provided number of days id out of range"
     )
+
+
+@pytest.mark.asyncio
+async def test_searches_query_paginated(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    searches = [
+        Search(
+            **{
+                **examples["search"],
+                "category": add_category,
+                "url": encode_url(f"{examples['search']['url']}{i}"),
+            }
+        )
+        for i in range(5)
+    ]
+    _db_session.add_all(searches)
+    await _db_session.commit()
+    ids = []
+    after = ""
+    has_next_page = True
+    while has_next_page:
+        response = await authenticated_client.get(
+            "/graphql",
+            params={"query": PAGINATED_SEARCHES_QUERY.format(first=2, after=after)},
+        )
+        result = response.json()["data"]["allSearches"]
+        assert len(result["searches"]) <= 2
+        ids.extend(search["id"] for search in result["searches"])
+        has_next_page = result["pageInfo"]["hasNextPage"]
+        after = result["pageInfo"]["endCursor"]
+    assert ids == sorted(search.id for search in searches)
+
+    response = await authenticated_client.get(
+        "/graphql",
+        params={"query": PAGINATED_SEARCHES_QUERY.format(first=2, after="invalid")},
+    )
+    assert response.json()["data"]["allSearches"]["__typename"] == (
+        "InvalidCursorError"
+    )
+    response = await authenticated_client.get(
+        "/graphql",
+        params={"query": PAGINATED_SEARCHES_QUERY.format(first=1000, after="")},
+    )
+    assert response.json()["data"]["allSearches"]["__typename"] == (
+        "PageSizeOutOfRangeError"
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_events_stats_paginated(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    search = Search(category=add_category, **examples["search"])
+    estate = Estate(id=1, **examples["estate"])
+    base_date = datetime.utcnow() - timedelta(days=10)
+    events = [
+        SearchEvent(
+            search=search,
+            date=base_date + timedelta(days=i),
+            prices=[Price(**examples["price"], estate=estate)],
+        )
+        for i in range(3)
+    ]
+    _db_session.add_all([search, estate, *events])
+    await _db_session.commit()
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": PAGINATED_SEARCH_EVENTS_STATS.format(
+                id=search.id, first=2, after=""
+            )
+        },
+    )
+    result = response.json()["data"]["searchEventsStats"]
+    assert [event["id"] for event in result["searchEvents"]] == [
+        events[0].id,
+        events[1].id,
+    ]
+    assert result["pageInfo"]["hasNextPage"] is True
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": PAGINATED_SEARCH_EVENTS_STATS.format(
+                id=search.id, first=2, after=result["pageInfo"]["endCursor"]
+            )
+        },
+    )
+    result = response.json()["data"]["searchEventsStats"]
+    assert [event["id"] for event in result["searchEvents"]] == [events[2].id]
+    assert result["searchEvents"][0]["numberOfOffers"] == 1
+    assert result["pageInfo"]["hasNextPage"] is False
+
+
+@pytest.mark.asyncio
+async def test_searches_last_status_details(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    search_1 = Search(category=add_category, **examples["search"])
+    search_2 = Search(
+        **{
+            **examples["search"],
+            **{"category": add_category, "url": examples["search"]["url"] + "a"},
+        }
+    )
+    success_date = datetime.utcnow() - timedelta(days=2)
+    _db_session.add_all([search_1, search_2])
+    _db_session.add(SearchEvent(search=search_1, date=success_date))
+    await _db_session.commit()
+    for status_code in (404, 403):
+        _db_session.add(ScanFailure(search=search_1, status_code=status_code))
+        await _db_session.commit()
+
+    response = await authenticated_client.get(
+        "/graphql", params={"query": LAST_STATUS_DETAILS_QUERY}
+    )
+    statuses = {
+        status["id"]: status
+        for status in response.json()["data"]["searchesLastStatus"]["statuses"]
+    }
+    assert statuses[search_1.id]["status"] == "failed"
+    assert statuses[search_1.id]["lastSuccess"] == success_date.isoformat()
+    assert statuses[search_1.id]["lastStatusCode"] == 403
+    assert statuses[search_1.id]["consecutiveFailures"] == 2
+    assert statuses[search_2.id]["status"] == "unknown"
+
+    _db_session.add(SearchEvent(search=search_1))
+    await _db_session.commit()
+    response = await authenticated_client.get(
+        "/graphql", params={"query": LAST_STATUS_DETAILS_QUERY}
+    )
+    statuses = {
+        status["id"]: status
+        for status in response.json()["data"]["searchesLastStatus"]["statuses"]
+    }
+    assert statuses[search_1.id]["status"] == "success"
+    assert statuses[search_1.id]["consecutiveFailures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_get_fail_rate_histogram(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    day = datetime.today().replace(hour=12, minute=0, second=0, microsecond=0)
+    past_day = day - timedelta(days=3)
+    search = Search(category=add_category, **examples["search"])
+    _db_session.add_all(
+        [
+            search,
+            SearchEvent(search=search, date=day),
+            SearchEvent(search=search, date=day + timedelta(hours=1)),
+            ScanFailure(search=search, status_code=403, date=day),
+            ScanFailure(search=search, status_code=403, date=past_day),
+            ScanFailure(search=search, status_code=404, date=past_day),
+            ScanFailure(search=search, status_code=404, date=day - timedelta(days=40)),
+        ]
+    )
+    await _db_session.commit()
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": FAIL_RATE_HISTOGRAM_QUERY.format(days=30, bucket="DAY")},
+    )
+    data = response.json()["data"]["searchFailRate"]
+    assert data["__typename"] == "SearchFailRateHistogramType"
+    assert data["bucket"] == "DAY"
+    assert len(data["searches"]) == 1
+    assert data["searches"][0]["searchId"] == search.id
+    assert data["searches"][0]["buckets"] == [
+        {
+            "start": past_day.replace(hour=0).isoformat(),
+            "successes": 0,
+            "failures": 2,
+            "statuses": [{"status": 403, "count": 1}, {"status": 404, "count": 1}],
+        },
+        {
+            "start": day.replace(hour=0).isoformat(),
+            "successes": 2,
+            "failures": 1,
+            "statuses": [{"status": 403, "count": 1}],
+        },
+    ]
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": FAIL_RATE_HISTOGRAM_QUERY.format(days=30, bucket="HOUR")},
+    )
+    buckets = response.json()["data"]["searchFailRate"]["searches"][0]["buckets"]
+    assert [bucket["start"] for bucket in buckets] == [
+        past_day.isoformat(),
+        day.isoformat(),
+        (day + timedelta(hours=1)).isoformat(),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_estate_price_history(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    search = Search(category=add_category, **examples["search"])
+    estate_1 = Estate(id=1, **examples["estate"])
+    estate_2 = Estate(id=2, **examples["estate"])
+    base_date = datetime.utcnow() - timedelta(days=10)
+    events = [
+        SearchEvent(
+            search=search,
+            date=base_date + timedelta(days=i),
+            prices=[
+                Price(price=100000 - i * 1000, estate=estate_1),
+                Price(price=200000, estate=estate_2),
+            ],
+        )
+        for i in range(3)
+    ]
+    _db_session.add_all([search, estate_1, estate_2, *events])
+    await _db_session.commit()
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": ESTATE_PRICE_HISTORY_QUERY.format(
+                estate_id=1, date_from=(base_date + timedelta(days=1)).isoformat()
+            )
+        },
+    )
+    data = response.json()["data"]["estatePriceHistory"]
+    assert data["estateId"] == 1
+    assert data["prices"] == [
+        {
+            "date": (base_date + timedelta(days=i)).isoformat(),
+            "price": 100000 - i * 1000,
+            "pricePerSquareMeter": None,
+        }
+        for i in (1, 2)
+    ]
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": ESTATE_PRICE_HISTORY_QUERY.format(
+                estate_id=3, date_from=base_date.isoformat()
+            )
+        },
+    )
+    assert response.json()["data"]["estatePriceHistory"]["__typename"] == (
+        "EstateDoesntExistError"
+    )
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": ESTATES_PRICE_HISTORY_QUERY.format(estate_ids=[2, 1, 3])},
+    )
+    histories = response.json()["data"]["estatesPriceHistory"]["histories"]
+    assert [history["estateId"] for history in histories] == [2, 1]
+    assert [price["price"] for price in histories[0]["prices"]] == [200000] * 3
+    assert [price["price"] for price in histories[1]["prices"]] == [
+        100000,
+        99000,
+        98000,
+    ]
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": ESTATES_PRICE_HISTORY_QUERY.format(estate_ids=list(range(101)))},
+    )
+    assert response.json()["data"]["estatesPriceHistory"]["__typename"] == (
+        "TooManyEstatesError"
+    )
+
+
+@pytest.mark.asyncio
+async def test_price_changes_query(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    since = datetime.utcnow() - timedelta(days=7)
+    estates = [Estate(id=id, **examples["estate"]) for id in (1, 2)]
+    searches = [
+        Search(
+            category=add_category,
+            **{**examples["search"], "url": encode_url(f"https://www.test.io/{id}")},
+        )
+        for id in (1, 2)
+    ]
+    # Both searches observe estate 1, only the second one estate 2
+    events = [
+        SearchEvent(
+            search=searches[0],
+            prices=[Price(**examples["price"], estate=estates[0])],
+        ),
+        SearchEvent(
+            search=searches[1],
+            prices=[Price(**examples["price"], estate=estate) for estate in estates],
+        ),
+    ]
+    _db_session.add_all([*estates, *searches, *events])
+    await _db_session.commit()
+    search = searches[0]
+    _db_session.add_all(
+        [
+            PriceChange(
+                estate_id=1,
+                new_price=100000,
+                date=since - timedelta(days=1),
+            ),
+            # Recorded by whichever search scanned the estate first
+            PriceChange(estate_id=1, old_price=100000, new_price=90000),
+            PriceChange(estate_id=2, old_price=50000, new_price=40000),
+        ]
+    )
+    await _db_session.commit()
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": PRICE_CHANGES_QUERY.format(
+                search_id=search.id, since=since.isoformat()
+            )
+        },
+    )
+    assert response.json()["data"]["priceChanges"]["changes"] == [
+        {"estateId": 1, "oldPrice": 100000, "newPrice": 90000, "isNewListing": False}
+    ]
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": PRICE_CHANGES_QUERY.format(
+                search_id=searches[1].id, since=since.isoformat()
+            )
+        },
+    )
+    assert response.json()["data"]["priceChanges"]["changes"] == [
+        {"estateId": 1, "oldPrice": 100000, "newPrice": 90000, "isNewListing": False},
+        {"estateId": 2, "oldPrice": 50000, "newPrice": 40000, "isNewListing": False},
+    ]
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": PRICE_CHANGES_QUERY.format(search_id=999, since=since.isoformat())
+        },
+    )
+    assert response.json()["data"]["priceChanges"]["__typename"] == (
+        "SearchDoesntExistError"
+    )
+
+
+@pytest.mark.asyncio
+async def test_mutation_marks_recent_write(
+    authenticated_client: httpx.AsyncClient,
+    add_user: User,
+    mocker: MockerFixture,
+    cache: fakeredis.FakeRedis,
+) -> None:
+    await authenticated_client.post("/graphql", json={"query": ALL_SEARCHES_QUERY})
+    assert not cache.exists(f"recent_write:{add_user.id}")
+
+    mocker.patch.object(settings, "db_replica_host", "replica")
+    await authenticated_client.post(
+        "/graphql", json={"query": ASSIGN_SEARCH_MUTATION.format(id=999)}
+    )
+    assert cache.exists(f"recent_write:{add_user.id}")
+
+
+@pytest.mark.asyncio
+async def test_spatial_queries(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+) -> None:
+    search_1 = Search(
+        category=add_category,
+        **{**examples["search"], "url": encode_url(examples["search"]["url"])},
+        sw_lat=50.0,
+        sw_lng=16.0,
+        ne_lat=51.0,
+        ne_lng=17.0,
+    )
+    search_2 = Search(
+        category=add_category,
+        **{**examples["search"], "url": encode_url(examples["search"]["url"] + "a")},
+        sw_lat=52.0,
+        sw_lng=20.0,
+        ne_lat=53.0,
+        ne_lng=21.0,
+    )
+    estates = [
+        Estate(id=1, **examples["estate"], latitude=50.5, longitude=16.5),
+        Estate(id=2, **examples["estate"], latitude=50.6, longitude=16.6),
+        Estate(id=3, **examples["estate"], latitude=52.5, longitude=20.5),
+        Estate(id=4, **examples["estate"]),
+    ]
+    _db_session.add_all([search_1, search_2, *estates])
+    await _db_session.commit()
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": SEARCHES_COVERING_POINT_QUERY.format(latitude=50.5, longitude=16.5)
+        },
+    )
+    searches = response.json()["data"]["searchesCoveringPoint"]["searches"]
+    assert [search["id"] for search in searches] == [search_1.id]
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": SEARCHES_COVERING_POINT_QUERY.format(latitude=0, longitude=0)},
+    )
+    assert response.json()["data"]["searchesCoveringPoint"]["__typename"] == (
+        "NoSearchesAvailableError"
+    )
+
+    response = await authenticated_client.post(
+        "/graphql", json={"query": ESTATES_IN_BOX_QUERY.format(first=1, after="")}
+    )
+    result = response.json()["data"]["estatesInBox"]
+    assert result["estates"] == [{"id": 1, "latitude": 50.5, "longitude": 16.5}]
+    assert result["pageInfo"]["hasNextPage"] is True
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": ESTATES_IN_BOX_QUERY.format(
+                first=1, after=result["pageInfo"]["endCursor"]
+            )
+        },
+    )
+    result = response.json()["data"]["estatesInBox"]
+    assert [estate["id"] for estate in result["estates"]] == [2]
+    assert result["pageInfo"]["hasNextPage"] is False
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": NEAREST_ESTATES_QUERY.format(latitude=52.4, longitude=20.4)},
+    )
+    estates_found = response.json()["data"]["nearestEstates"]["estates"]
+    assert [estate["id"] for estate in estates_found] == [3, 2]
+
+
+@pytest.mark.asyncio
+async def test_search_estates(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+) -> None:
+    estates = [
+        Estate(id=1, title="Działka budowlana", city="Gdańsk", url="a", last_price=10),
+        Estate(id=2, title="Dom z ogrodem", city="Gdańsk", url="b", last_price=20),
+        Estate(
+            id=3,
+            title="Piękna działka budowlana nad jeziorem",
+            city="Sopot",
+            url="c",
+            last_price=30,
+        ),
+        Estate(id=4, title="Mieszkanie", street="Budowlana 5", city="Gdańsk", url="d"),
+    ]
+    _db_session.add_all(estates)
+    await _db_session.commit()
+
+    def query(text: str, filters: str = "{}", first: int = 10, after: str = "") -> str:
+        return SEARCH_ESTATES_QUERY.format(
+            text=text, filters=filters, first=first, after=after
+        )
+
+    response = await authenticated_client.post(
+        "/graphql", json={"query": query("budowlana", first=2)}
+    )
+    result = response.json()["data"]["searchEstates"]
+    # Shorter matching texts rank first
+    assert [estate["id"] for estate in result["estates"]] == [1, 4]
+    assert result["pageInfo"]["hasNextPage"] is True
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": query("budowlana", first=2, after=result["pageInfo"]["endCursor"])
+        },
+    )
+    result = response.json()["data"]["searchEstates"]
+    assert [estate["id"] for estate in result["estates"]] == [3]
+    assert result["pageInfo"]["hasNextPage"] is False
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": query("działka budowlana", filters="{minPrice: 20}")},
+    )
+    result = response.json()["data"]["searchEstates"]
+    assert [estate["id"] for estate in result["estates"]] == [3]
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={"query": query("budowlana", filters='{city: "Gdańsk"}')},
+    )
+    result = response.json()["data"]["searchEstates"]
+    assert {estate["id"] for estate in result["estates"]} == {1, 4}
+
+    response = await authenticated_client.post("/graphql", json={"query": query("do")})
+    assert response.json()["data"]["searchEstates"]["__typename"] == (
+        "SearchTextTooShortError"
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_estates_equal_distance_pages(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+) -> None:
+    # Tied on distance, paged by id
+    _db_session.add_all(
+        Estate(id=id, title="Działka budowlana", city="Gdańsk", url=str(id))
+        for id in (3, 1, 2)
+    )
+    await _db_session.commit()
+    found, after = [], ""
+    for _ in range(3):
+        response = await authenticated_client.post(
+            "/graphql",
+            json={
+                "query": SEARCH_ESTATES_QUERY.format(
+                    text="budowlana", filters="{}", first=1, after=after
+                )
+            },
+        )
+        result = response.json()["data"]["searchEstates"]
+        found += [estate["id"] for estate in result["estates"]]
+        after = result["pageInfo"]["endCursor"]
+    assert found == [1, 2, 3]
+    assert result["pageInfo"]["hasNextPage"] is False
+
+
+@pytest.mark.asyncio
+async def test_search_event_stats_dedupe(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+) -> None:
+    category = Category(name="Plot")
+    _db_session.add(category)
+    await _db_session.commit()
+    with open("tests/example_files/body_plot.json", "r") as f:
+        body = json.load(f)
+    ads = body["pageProps"]["data"]["searchAds"]["items"]
+    relisted = copy.deepcopy(ads[0])
+    relisted["id"] = 99999999
+    relisted["totalPrice"]["value"] = ads[0]["totalPrice"]["value"] + 1000
+    ads.append(relisted)
+    await parse_scan_data("https://www.test.io/test", body, _db_session)
+    search_event = (await _db_session.exec(select(SearchEvent))).first()
+
+    async def number_of_offers(dedupe: str) -> int:
+        query = f"""
+            query eventStats {{
+                searchEventStats(input: {{
+                        id: {search_event.id}
+                        dedupe: {dedupe}
+                    }}) {{
+                    ... on EventStatsType {{
+                        numberOfOffers
+                    }}
+                }}
+            }}
+        """
+        response = await authenticated_client.post("/graphql", json={"query": query})
+        return response.json()["data"]["searchEventStats"]["numberOfOffers"]
+
+    assert await number_of_offers("false") == 37
+    assert await number_of_offers("true") == 36
+
+
+PROTECTED_FIELDS_QUERY = """
+    query protectedFields {
+        allSearches {
+            __typename
+        }
+        usersSearches {
+            __typename
+        }
+        searchesLastStatus {
+            statuses {
+                id
+            }
+        }
+    }
+"""
+
+
+@pytest.mark.asyncio
+async def test_user_resolved_once_per_request(
+    authenticated_client: httpx.AsyncClient,
+    mocker: MockerFixture,
+) -> None:
+    user_lookup = mocker.spy(jwt_utils, "get_user_from_payload")
+    decode = mocker.spy(jwt_utils, "decode_jwt_token")
+    response = await authenticated_client.post(
+        "/graphql", json={"query": PROTECTED_FIELDS_QUERY}
+    )
+    assert "errors" not in response.json()
+    assert user_lookup.call_count == 1
+    assert decode.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_user_process_cache(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_user: User,
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch.dict(jwt_utils._user_cache, clear=True)
+    user_lookup = mocker.spy(jwt_utils, "get_user_from_payload")
+    await authenticated_client.post("/graphql", json={"query": ALL_SEARCHES_QUERY})
+    await authenticated_client.post("/graphql", json={"query": ALL_SEARCHES_QUERY})
+    assert user_lookup.call_count == 2
+
+    mocker.patch.object(settings, "user_cache_ttl_seconds", 60)
+    for _ in range(2):
+        response = await authenticated_client.post(
+            "/graphql", json={"query": USER_SEARCHES_QUERY}
+        )
+        assert "errors" not in response.json()
+    assert user_lookup.call_count == 3
+
+    add_user.is_active = False
+    _db_session.add(add_user)
+    await _db_session.commit()
+    jwt_utils.invalidate_cached_user(add_user.id)
+    response = await authenticated_client.post(
+        "/graphql", json={"query": ALL_SEARCHES_QUERY}
+    )
+    assert response.json()["errors"][0]["message"] == "User is not authenticated"
+    assert user_lookup.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_persisted_queries(
+    authenticated_client: httpx.AsyncClient, add_category: Category
+) -> None:
+    persisted_queries.clear()
+    query_hash = hashlib.sha256(CATEGORIES_QUERY.encode("utf-8")).hexdigest()
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+
+    response = await authenticated_client.post(
+        "/graphql", json={"extensions": extensions}
+    )
+    error = response.json()["errors"][0]
+    assert error["message"] == "PersistedQueryNotFound"
+    assert error["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    response = await authenticated_client.post(
+        "/graphql", json={"query": CATEGORIES_QUERY, "extensions": extensions}
+    )
+    assert response.json()["data"] == {"categories": [{"name": "Plot"}]}
+
+    response = await authenticated_client.post(
+        "/graphql", json={"extensions": extensions}
+    )
+    assert response.json()["data"] == {"categories": [{"name": "Plot"}]}
+    response = await authenticated_client.get(
+        "/graphql", params={"extensions": json.dumps(extensions)}
+    )
+    assert response.json()["data"] == {"categories": [{"name": "Plot"}]}
+
+    response = await authenticated_client.post(
+        "/graphql", json={"query": ALL_SEARCHES_QUERY, "extensions": extensions}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_document_cache(
+    authenticated_client: httpx.AsyncClient,
+    add_category: Category,
+    mocker: MockerFixture,
+) -> None:
+    documents.clear()
+    parse = mocker.spy(strawberry_execute, "parse_document")
+    validate = mocker.spy(strawberry_execute, "validate_document")
+    for _ in range(3):
+        response = await authenticated_client.post(
+            "/graphql", json={"query": CATEGORIES_QUERY}
+        )
+        assert response.json()["data"] == {"categories": [{"name": "Plot"}]}
+    assert parse.call_count == validate.call_count == 1
+
+    # Invalid documents are validated every time
+    for _ in range(2):
+        response = await authenticated_client.post(
+            "/graphql", json={"query": "query { categories { missing } }"}
+        )
+        assert "errors" in response.json()
+    assert validate.call_count == 3
+    assert len(documents) == 1
+
+
+SEARCH_EVENTS_COST_QUERY = """
+    query eventsStats($first: Int, $topPrices: Int) {
+        searchEventsStats(input: {first: $first}) {
+            ... on SearchEventsStatsType {
+                searchEvents {
+                    id
+                    minPrice {
+                        price
+                    }
+                }
+            }
+        }
+        searchEventStats(input: {id: 1, topPrices: $topPrices}) {
+            ... on EventStatsType {
+                minPrices {
+                    estate {
+                        title
+                    }
+                }
+            }
+        }
+    }
+"""
+
+
+@pytest.mark.asyncio
+async def test_query_cost(authenticated_client: httpx.AsyncClient) -> None:
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": SEARCH_EVENTS_COST_QUERY,
+            "variables": {"first": 10, "topPrices": 5},
+        },
+    )
+    result = response.json()
+    assert "errors" not in result
+    # 1 + 10 * (1 + 1) for the events, 1 + 5 * (1 + 1) for the top prices
+    assert result["extensions"]["cost"] == {
+        "requested": 32,
+        "maximum": settings.graphql_max_cost,
+    }
+
+    response = await authenticated_client.post(
+        "/graphql",
+        json={
+            "query": SEARCH_EVENTS_COST_QUERY,
+            "variables": {"first": 10, "topPrices": 100000},
+        },
+    )
+    result = response.json()
+    assert result["data"] is None
+    assert result["errors"][0]["extensions"]["code"] == "QUERY_TOO_EXPENSIVE"
+    assert result["extensions"]["cost"]["requested"] == 200022
+
+
+@pytest.mark.asyncio
+async def test_query_depth_limit(authenticated_client: httpx.AsyncClient) -> None:
+    query = "query deep { ...F } fragment F on Query { searchStats(input: {}) { "
+    query += "... on SearchStatsType { events { minPrice { estate { title } } } } } }"
+    response = await authenticated_client.post("/graphql", json={"query": query})
+    assert "errors" not in response.json()
+
+    # Deeper than anything the schema allows
+    deep_query = "query deep { searchStats(input: {}) { ... on SearchStatsType { "
+    deep_query += "events { " * 10 + "id" + " }" * 10 + " } } }"
+    response = await authenticated_client.post("/graphql", json={"query": deep_query})
+    messages = [error["message"] for error in response.json()["errors"]]
+    assert any("exceeds maximum operation depth" in message for message in messages)
+
+
+SCAN_PROGRESS_SUBSCRIPTION = """
+    subscription scanProgress($searchId: Int!) {
+        scanProgress(searchId: $searchId) {
+            searchId
+            status
+            page
+            totalPages
+        }
+    }
+"""
+
+
+@pytest.mark.asyncio
+async def test_scan_progress_subscription(
+    _db_session: AsyncSession,
+    add_user: User,
+    mocker: MockerFixture,
+    async_cache: fakeredis.aioredis.FakeRedis,
+) -> None:
+    token = jwt_utils.create_jwt_token(subject=str(add_user.id), fresh=False)
+    request = mocker.Mock(headers={"Authorization": f"Bearer {token}"})
+    subscription = await schema.subscribe(
+        SCAN_PROGRESS_SUBSCRIPTION,
+        variable_values={"searchId": 1},
+        context_value={"request": request, "session": _db_session},
+    )
+    next_event = asyncio.create_task(subscription.__anext__())  # type: ignore
+    channel = "scan_progress:1"
+    while not (await async_cache.pubsub_numsub(channel))[0][1]:
+        await asyncio.sleep(0.01)
+    # The user was looked up in a session that isn't kept open with the socket
+    assert not _db_session.in_transaction()
+    # Events of other searches aren't delivered
+    await publish_scan_progress(2, ScanProgressStatus.FINISHED)
+    await publish_scan_progress(1, ScanProgressStatus.PAGE_PARSED, 2, 3)
+    result = await asyncio.wait_for(next_event, timeout=5)
+    assert result.errors is None
+    assert result.data == {
+        "scanProgress": {
+            "searchId": 1,
+            "status": "PAGE_PARSED",
+            "page": 2,
+            "totalPages": 3,
+        }
+    }
+    await subscription.aclose()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_scan_progress_subscription_connection_params(
+    _db_session: AsyncSession,
+    add_user: User,
+    mocker: MockerFixture,
+    async_cache: fakeredis.aioredis.FakeRedis,
+) -> None:
+    token = jwt_utils.create_jwt_token(subject=str(add_user.id), fresh=False)
+    # Browsers can't set websocket headers, the token comes with connection_init
+    subscription = await schema.subscribe(
+        SCAN_PROGRESS_SUBSCRIPTION,
+        variable_values={"searchId": 1},
+        context_value={
+            "request": mocker.Mock(headers={}),
+            "session": _db_session,
+            "connection_params": {"Authorization": f"Bearer {token}"},
+        },
+    )
+    next_event = asyncio.create_task(subscription.__anext__())  # type: ignore
+    while not (await async_cache.pubsub_numsub("scan_progress:1"))[0][1]:
+        await asyncio.sleep(0.01)
+    await publish_scan_progress(1, ScanProgressStatus.FINISHED)
+    result = await asyncio.wait_for(next_event, timeout=5)
+    assert result.errors is None
+    assert result.data["scanProgress"]["status"] == "FINISHED"  # type: ignore
+    await subscription.aclose()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_scan_progress_subscription_not_authenticated(
+    _db_session: AsyncSession, mocker: MockerFixture
+) -> None:
+    request = mocker.Mock(headers={})
+    result = await schema.subscribe(
+        SCAN_PROGRESS_SUBSCRIPTION,
+        variable_values={"searchId": 1},
+        context_value={"request": request, "session": _db_session},
+    )
+    assert result.errors[0].message == "User is not authenticated"  # type: ignore
+
+
+async def add_search_events(
+    session: AsyncSession, category: Category, user: User
+) -> list[Search]:
+    estates = [Estate(id=i, **examples["estate"]) for i in range(1, 6)]
+    searches = []
+    for search_number in range(3):
+        search = Search(
+            category=category,
+            **{
+                **examples["search"],
+                "url": encode_url(f"https://www.test.io/{search_number}"),
+            },
+            users=[user],
+        )
+        events = [
+            SearchEvent(
+                search=search,
+                date=datetime.utcnow() - timedelta(days=day),
+                prices=[
+                    Price(**examples["price"], estate=estate) for estate in estates
+                ],
+            )
+            for day in range(5)
+        ]
+        session.add_all([search, *events])
+        searches.append(search)
+    session.add_all(estates)
+    await session.commit()
+    return searches
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "name, maximum",
+    [
+        # Every operation loads the authenticated user first
+        ("categories", 2),
+        ("allSearches", 4),
+        ("usersSearches", 4),
+        ("searchEventsStats", 4),
+        ("paginatedSearchEventsStats", 4),
+        ("searchStats", 7),
+        ("favoriteSearchEventsStats", 4),
+        ("estatesPriceHistory", 3),
+        ("priceChanges", 5),
+        ("searchesLastStatus", 2),
+    ],
+)
+async def test_resolver_query_counts(
+    authenticated_client: httpx.AsyncClient,
+    _db_session: AsyncSession,
+    add_category: Category,
+    add_user: User,
+    assert_max_queries: Callable[[int], ContextManager[QueryStats]],
+    name: str,
+    maximum: int,
+) -> None:
+    searches = await add_search_events(_db_session, add_category, add_user)
+    add_user.favorite_search_id = searches[0].id
+    _db_session.add(add_user)
+    await _db_session.commit()
+    queries = {
+        "categories": CATEGORIES_QUERY,
+        "allSearches": ALL_SEARCHES_QUERY,
+        "usersSearches": USER_SEARCHES_QUERY,
+        "searchEventsStats": SEARCH_EVENTS_STATS.format(id=searches[0].id),
+        "paginatedSearchEventsStats": PAGINATED_SEARCH_EVENTS_STATS.format(
+            id=searches[0].id, first=3, after=""
+        ),
+        "favoriteSearchEventsStats": FAV_SEARCH_EVENTS_STATS,
+        "searchStats": SEARCH_STATS_QUERY.format(id=searches[0].id),
+        "estatesPriceHistory": ESTATES_PRICE_HISTORY_QUERY.format(
+            estate_ids=[1, 2, 3, 4, 5]
+        ),
+        "priceChanges": PRICE_CHANGES_QUERY.format(
+            search_id=searches[0].id, since="2020-01-01T00:00:00"
+        ),
+        "searchesLastStatus": LAST_STATUS_DETAILS_QUERY,
+    }
+    with assert_max_queries(maximum) as stats:
+        response = await authenticated_client.post(
+            "/graphql", json={"query": queries[name]}
+        )
+    result = response.json()
+    assert "errors" not in result
+    assert result["extensions"]["sql"]["queries"] == stats.count
@@ -0,0 +1,96 @@
+import json
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from pytest_mock import MockerFixture
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.models import Category
+from api.parsing import parse_scan_data
+from api.schedulers import setup_scan_periodic_task
+from api.utils.fetching import make_request
+from api.utils.tracing import task_span, trace_engine, tracer
+
+from .conftest import MockCffiJSONResponse
+
+exporter = InMemorySpanExporter()
+
+
+@pytest.fixture
+def spans() -> InMemorySpanExporter:
+    # The global provider can only be set once per process
+    if not isinstance(trace.get_tracer_provider(), TracerProvider):
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+    exporter.clear()
+    return exporter
+
+
+@pytest.mark.asyncio
+async def test_make_request_spans(
+    spans: InMemorySpanExporter,
+    async_cache: fakeredis.aioredis.FakeRedis,
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch("asyncio.sleep", return_value=None)
+    session = mocker.Mock()
+    session.get.return_value = MockCffiJSONResponse({"pageProps": {}}, 200)
+    status_code, _, _ = await make_request("https://www.test.io/", 10, session)
+    assert status_code == 200
+
+    finished = {span.name: span for span in spans.get_finished_spans()}
+    assert set(finished) == {"make_request", "sleep", "fetch"}
+    request_span = finished["make_request"].context
+    assert finished["sleep"].parent == request_span
+    assert finished["fetch"].parent == request_span
+    assert finished["fetch"].attributes == {"http.status_code": 200}
+
+
+@pytest.mark.asyncio
+async def test_parse_spans(
+    spans: InMemorySpanExporter, _db_session: AsyncSession
+) -> None:
+    trace_engine(_db_session.bind.sync_engine)
+    _db_session.add(Category(name="Plot"))
+    await _db_session.commit()
+    with open("tests/example_files/body_plot.json", "r") as f:
+        body = json.load(f)
+    spans.clear()
+    await parse_scan_data("https://www.test.io/test", body, _db_session)
+
+    finished = spans.get_finished_spans()
+    by_name = {span.name: span for span in finished}
+    parse_span = by_name["parse_scan_data"].context
+    assert by_name["parse_search_info"].parent == parse_span
+    assert by_name["commit"].parent == parse_span
+    statements = [
+        span
+        for span in finished
+        if span.attributes is not None and "db.statement" in span.attributes
+    ]
+    assert {span.name for span in statements} >= {"SELECT", "INSERT"}
+    assert all(span.context.trace_id == parse_span.trace_id for span in statements)
+
+
+def test_periodic_task_trace_context(
+    spans: InMemorySpanExporter, mocker: MockerFixture
+) -> None:
+    entry = mocker.patch("api.schedulers.RedBeatSchedulerEntry")
+    with tracer.start_as_current_span("adhoc_scan") as scheduling_span:
+        setup_scan_periodic_task("https://www.test.io/", {"minute": 1}, 1)
+    trace_context = entry.call_args.kwargs["kwargs"]["trace_context"]
+    assert "traceparent" in trace_context
+
+    with task_span("run_periodic_scan", trace_context) as span:
+        pass
+    assert isinstance(span, ReadableSpan)
+    # Every run starts its own trace, linked to the one that scheduled it
+    assert span.parent is None
+    (link,) = span.links
+    assert link.context.span_id == scheduling_span.get_span_context().span_id
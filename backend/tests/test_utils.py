@@ -1,17 +1,34 @@
+import asyncio
 import json
+import subprocess
+import sys
+import time
 from datetime import datetime, timedelta
+from typing import Callable, ContextManager
 
 import fakeredis
+import fakeredis.aioredis
 import httpx
 import pytest
+import redis.asyncio
+from celery import Celery
 from pytest_mock import MockerFixture
+from sqlalchemy import literal
 from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import NullPool
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 import api.utils.fetching
 import api.utils.jwt as jwt_utils
 import api.utils.user as user_utils
+from api.database import (
+    close_async_cache,
+    close_connections,
+    get_async_cache,
+    get_engine,
+    get_pool_options,
+)
 from api.models.category import Category
 from api.models.estate import Estate
 from api.models.price import Price
@@ -19,10 +36,32 @@ from api.models.scan_failure import ScanFailure
 from api.models.search import Search, encode_url
 from api.models.search_event import SearchEvent
 from api.models.user import User
+from api.periodic_tasks import run_periodic_scan
 from api.settings import settings
+from api.utils.celery_utils import (
+    async_task,
+    create_celery,
+    setup_worker_process,
+    shutdown_worker_process,
+)
+from api.utils.executor import MeteredExecutor
+from api.utils.fetching import get_http_session
+from api.utils.pagination import (
+    CursorDecodeError,
+    decode_date_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    split_page,
+)
+from api.utils.partitions import (
+    add_months,
+    create_partition_statement,
+    parse_partition_month,
+)
+from api.utils.query_counter import QueryStats, collect_queries
+from api.utils.replica import get_read_session, mark_recent_write
+from api.utils.scan_progress import ScanProgressStatus
 from api.utils.search import (
-    get_last_failures,
-    get_last_successes,
     get_search_events_for_search,
     get_search_failures,
     get_search_id_by_url,
@@ -35,6 +74,7 @@ from api.utils.search_event import (
     get_search_event_min_prices,
     get_search_event_prices,
 )
+from api.utils.sql import DateBucket
 from api.utils.url_parsing import parse_url
 
 from .conftest import MockCffiJSONResponse, examples
@@ -60,16 +100,161 @@ def test_parsing_url() -> None:
     )
 
 
-def test_extracting_token(mocker: MockerFixture) -> None:
+@pytest.mark.asyncio
+async def test_extracting_token(
+    cache: fakeredis.FakeRedis, async_cache: fakeredis.aioredis.FakeRedis
+) -> None:
     with open("tests/example_files/404_resp.html", "r") as f:
         body = f.read()
-    cache = fakeredis.FakeRedis(decode_responses=True)  # type:ignore
-    mocker.patch("api.utils.fetching.cache", cache)
 
-    api.utils.fetching.extract_token(body)
+    await api.utils.fetching.extract_token(body)
     assert cache.get("token") == "U-X80D14b5VUVY_qgIbBQ"
 
 
+@pytest.mark.asyncio
+async def test_get_request_state(
+    cache: fakeredis.FakeRedis, async_cache: fakeredis.aioredis.FakeRedis
+) -> None:
+    url = "https://www.test.io/{api_key}/search.json"
+    assert await api.utils.fetching.get_request_state(url) == ("", 0)
+    cache.set("token", "abc")
+    cache.incr(f"retried_{url}", 2)
+    assert await api.utils.fetching.get_request_state(url) == ("abc", 2)
+
+
+@pytest.mark.asyncio
+async def test_blocked_http_session_is_replaced(
+    async_cache: fakeredis.aioredis.FakeRedis, mocker: MockerFixture
+) -> None:
+    mocker.patch("asyncio.sleep", return_value=None)
+    blocked_session = mocker.Mock()
+    blocked_session.get.return_value = MockCffiJSONResponse({}, 403)
+    new_session = mocker.Mock()
+    new_session.get.return_value = MockCffiJSONResponse({"pageProps": {}}, 200)
+    mocker.patch.object(api.utils.fetching, "_http_session", blocked_session)
+    mocker.patch("curl_cffi.requests.Session", return_value=new_session)
+
+    status_code, _, session = await api.utils.fetching.make_request(
+        "https://www.test.io/"
+    )
+    assert status_code == 200
+    assert session is new_session
+    # The next scan doesn't start from the blocked session
+    assert get_http_session() is new_session
+
+
+@pytest.mark.asyncio
+async def test_periodic_scan_stops_at_failed_page(
+    _db_session: AsyncSession, mocker: MockerFixture
+) -> None:
+    _db_session.add(Category(name="Plot"))
+    await _db_session.commit()
+    with open("tests/example_files/body_plot.json", "r") as f:
+        body = json.load(f)
+    body["pageProps"]["data"]["searchAds"]["pagination"]["totalPages"] = 3
+    mocker.patch(
+        "api.periodic_tasks.make_request",
+        side_effect=[(200, body, None), (403, {}, None)],
+    )
+    mocker.patch("api.periodic_tasks.async_session", return_value=_db_session)
+    mocker.patch("api.periodic_tasks.get_engine")
+    record_scan_duration = mocker.patch("api.periodic_tasks.record_scan_duration")
+    published = mocker.patch("api.periodic_tasks.publish_scan_progress")
+    failed = mocker.patch("api.periodic_tasks.handle_failed_scan")
+
+    # The coroutine under the Celery task and its worker loop
+    await run_periodic_scan.run.__wrapped__("https://www.test.io/test", 1)
+    assert [call.args[1] for call in published.call_args_list] == [
+        ScanProgressStatus.STARTED,
+        ScanProgressStatus.PAGE_PARSED,
+    ]
+    # Publishes FAILED, nothing after it
+    failed.assert_awaited_once()
+    assert failed.call_args.args[0] == 403
+    record_scan_duration.assert_not_called()
+
+
+def test_get_pool_options(mocker: MockerFixture) -> None:
+    assert get_pool_options()["pool_size"] == settings.db_pool_size
+    mocker.patch.object(settings, "db_pgbouncer", True)
+    options = get_pool_options()
+    assert options["poolclass"] is NullPool
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
+    name_func = options["connect_args"]["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+@pytest.mark.asyncio
+async def test_close_connections_without_engines() -> None:
+    get_engine.cache_clear()
+    await close_connections()
+    assert get_engine.cache_info().currsize == 0
+
+
+@pytest.mark.parametrize(
+    "task,queue,priority",
+    [
+        ("api.periodic_tasks.verify_ip", "interactive", 0),
+        ("api.periodic_tasks.run_periodic_scan", "scheduled", None),
+        ("api.periodic_tasks.maintain_partitions", "maintenance", 9),
+    ],
+)
+def test_task_routes(task: str, queue: str, priority: int | None) -> None:
+    options = create_celery().amqp.router.route({}, task)
+    assert options["queue"].name == queue
+    assert options.get("priority") == priority
+
+
+def test_worker_skips_graphql_imports() -> None:
+    code = (
+        "import sys, api.worker, api.periodic_tasks;"
+        "print(sorted({m.split('.')[0] for m in sys.modules}"
+        " | {m for m in sys.modules if m.startswith('api.')}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    modules = result.stdout
+    for module in ("strawberry", "fastapi", "'api.types", "'api.schema"):
+        assert module not in modules
+
+
+def test_async_task_worker_loop() -> None:
+    loops = []
+
+    @async_task(Celery())  # type: ignore
+    async def record_loop() -> None:
+        loops.append(asyncio.get_running_loop())
+
+    setup_worker_process()
+    assert get_engine.cache_info().currsize
+    record_loop()
+    record_loop()
+    assert loops[0] is loops[1]
+
+    shutdown_worker_process()
+    assert loops[0].is_closed()
+    assert api.utils.fetching._http_session is None
+    # A later task gets a new loop, e.g. with the solo pool
+    record_loop()
+    assert loops[2] is not loops[0]
+    shutdown_worker_process()
+    get_engine.cache_clear()
+
+
+def test_async_cache_per_event_loop() -> None:
+    async def get_clients() -> list[redis.asyncio.Redis]:
+        clients = [get_async_cache(), get_async_cache()]
+        await close_async_cache()
+        return clients
+
+    first, second = asyncio.run(get_clients())
+    assert first is second
+    (other_loop, _) = asyncio.run(get_clients())
+    assert other_loop is not first
+
+
 @pytest.mark.asyncio
 async def test_get_search_event_prices(
     authenticated_client: httpx.AsyncClient,
@@ -340,54 +525,6 @@ async def test_get_user_from_token(_db_session: AsyncSession, add_user: User) ->
     assert user.id == add_user.id
 
 
-@pytest.mark.asyncio
-async def test_get_last_failures(
-    _db_session: AsyncSession, add_category: Category
-) -> None:
-    search_1 = Search(category=add_category, **examples["search"])
-    search_2 = Search(
-        **{
-            **examples["search"],
-            **{"category": add_category, "url": examples["search"]["url"] + "a"},
-        }
-    )
-    failure_1 = ScanFailure(search=search_1, status_code=404)
-    failure_2 = ScanFailure(search=search_2, status_code=404)
-    failure_3 = ScanFailure(search=search_1, status_code=404)
-    _db_session.add_all([search_1, search_2, failure_1, failure_2, failure_3])
-    await _db_session.commit()
-    _db_session.flush()
-    last_failures = await get_last_failures(session=_db_session)
-    assert len(last_failures) == 2
-    assert search_1.id in last_failures and search_2.id in last_failures
-    assert last_failures.get(search_1.id) == failure_3.date
-
-
-@pytest.mark.asyncio
-async def test_get_last_successes(
-    _db_session: AsyncSession, add_category: Category
-) -> None:
-    search_1 = Search(category=add_category, **examples["search"])
-    search_2 = Search(
-        **{
-            **examples["search"],
-            **{"category": add_category, "url": examples["search"]["url"] + "a"},
-        }
-    )
-    estate = Estate(**examples["estate"])
-    price = Price(**examples["price"], estate=estate)
-    success_1 = SearchEvent(estates=[estate], search=search_1, prices=[price])
-    success_2 = SearchEvent(estates=[estate], search=search_2, prices=[price])
-    success_3 = SearchEvent(estates=[estate], search=search_1, prices=[price])
-    _db_session.add_all([search_1, search_2, success_1, success_2, success_3])
-    await _db_session.commit()
-    _db_session.flush()
-    last_successes = await get_last_successes(session=_db_session)
-    assert len(last_successes) == 2
-    assert search_1.id in last_successes and search_2.id in last_successes
-    assert last_successes.get(search_1.id) == success_3.date
-
-
 @pytest.mark.asyncio
 async def test_get_search_id_by_url(
     _db_session: AsyncSession, add_category: Category
@@ -451,3 +588,124 @@ async def test_get_search_successes(
     assert search_1.id in successes
     assert len(successes[search_1.id]) == 2
     assert out_of_scope not in successes[search_1.id]
+
+
+def test_pagination_cursors() -> None:
+    date = datetime(2024, 5, 1, 12, 30)
+    assert decode_id_cursor(encode_cursor(15)) == 15
+    assert decode_date_cursor(encode_cursor(date, 7)) == (date, 7)
+    with pytest.raises(CursorDecodeError):
+        decode_id_cursor(encode_cursor(date, 7))
+    with pytest.raises(CursorDecodeError):
+        decode_date_cursor("not a cursor")
+    with pytest.raises(CursorDecodeError):
+        decode_id_cursor(encode_cursor("²"))
+    with pytest.raises(CursorDecodeError):
+        decode_date_cursor(encode_cursor(date, "-1"))
+    assert split_page([1, 2, 3], 2) == ([1, 2], True)
+    assert split_page([1, 2], 2) == ([1, 2], False)
+    assert split_page([1, 2, 3], None) == ([1, 2, 3], False)
+
+
+def test_partition_helpers() -> None:
+    assert add_months(datetime(2024, 11, 1), 2) == datetime(2025, 1, 1)
+    assert add_months(datetime(2024, 1, 1), -1) == datetime(2023, 12, 1)
+    assert create_partition_statement("price", datetime(2024, 12, 1)) == (
+        "CREATE TABLE IF NOT EXISTS price_p2024_12 PARTITION OF price "
+        "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+    )
+    assert parse_partition_month("price", "price_p2024_12") == datetime(2024, 12, 1)
+    assert parse_partition_month("price", "price_default") is None
+
+
+@pytest.mark.asyncio
+async def test_date_bucket(_db_session: AsyncSession) -> None:
+    sunday = datetime(2024, 3, 10, 18, 45, 12)
+    monday = datetime(2024, 3, 11, 8, 30)
+    expected = {
+        ("hour", sunday): datetime(2024, 3, 10, 18),
+        ("day", sunday): datetime(2024, 3, 10),
+        ("week", sunday): datetime(2024, 3, 4),
+        ("week", monday): datetime(2024, 3, 11),
+    }
+    for (unit, value), start in expected.items():
+        query = select(DateBucket(unit, literal(value)))
+        assert (await _db_session.exec(query)).one() == start
+    with pytest.raises(ValueError):
+        DateBucket("month", literal(sunday))
+
+
+@pytest.mark.asyncio
+async def test_get_read_session(
+    mocker: MockerFixture,
+    cache: fakeredis.FakeRedis,
+    async_cache: fakeredis.aioredis.FakeRedis,
+) -> None:
+    primary, replica = mocker.Mock(), mocker.Mock()
+    token = jwt_utils.create_jwt_token(subject="1", fresh=True)
+    request = mocker.Mock(headers={"Authorization": f"Bearer {token}"})
+    anonymous_request = mocker.Mock(headers={})
+
+    assert await get_read_session(request, primary, None) is primary
+    assert await get_read_session(request, primary, replica) is replica
+
+    await mark_recent_write(1)
+    assert await get_read_session(request, primary, replica) is primary
+    assert await get_read_session(anonymous_request, primary, replica) is replica
+    assert cache.ttl("recent_write:1") == settings.replica_max_lag_seconds
+
+
+@pytest.mark.asyncio
+async def test_metered_executor() -> None:
+    executor = MeteredExecutor("test", max_workers=1)
+    ticks = 0
+
+    async def tick() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    results = await asyncio.gather(
+        executor.run(lambda value: time.sleep(0.1) or value, 1),
+        executor.run(lambda value: time.sleep(0.1) or value, 2),
+    )
+    ticker.cancel()
+    executor.shutdown()
+    assert results == [1, 2]
+    # The event loop kept running while the pool worked
+    assert ticks > 5
+    stats = executor.stats()
+    assert stats["queued"] == stats["running"] == 0
+    assert stats["completed"] == 2
+    # With a single worker the second call waits for the first
+    assert stats["wait_seconds_max"] >= 0.09
+    assert stats["run_seconds_total"] >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_async_password_helpers() -> None:
+    hashed = await user_utils.async_get_password_hash("secret")
+    assert await user_utils.async_verify_password("secret", hashed)
+    assert not await user_utils.async_verify_password("other", hashed)
+    assert user_utils.password_executor.stats()["completed"] >= 3
+
+
+@pytest.mark.asyncio
+async def test_assert_max_queries(
+    _db_session: AsyncSession,
+    assert_max_queries: Callable[[int], ContextManager[QueryStats]],
+) -> None:
+    with collect_queries() as outer:
+        with assert_max_queries(2) as inner:
+            await _db_session.exec(select(Category))
+            await _db_session.exec(select(Search))
+    # Nested blocks count the same statements
+    assert inner.count == outer.count == 2
+    assert inner.statements is not None and "FROM category" in inner.statements[0]
+
+    with pytest.raises(AssertionError, match="3 statements ran, expected at most 2"):
+        with assert_max_queries(2):
+            for _ in range(3):
+                await _db_session.exec(select(Category))
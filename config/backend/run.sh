@@ -3,6 +3,10 @@
 /scripts/wait-for-it.sh -t 15 $DB_HOST:$DB_PORT
 alembic upgrade head || exit 1
 
+# Shared by the server processes, /metrics merges their samples
+export PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus
+rm -rf $PROMETHEUS_MULTIPROC_DIR && mkdir -p $PROMETHEUS_MULTIPROC_DIR
+
 if [ $DEBUG == True ]; then
     uvicorn api.asgi:app --host 0.0.0.0 --port 8000 --reload
 else
@@ -1,9 +1,23 @@
 #!/bin/bash
 
-# Run both celery and celery beat in one container
+# Run the Celery workers and celery beat in one container
 
-# Start Celery worker in the background
-celery -A api.asgi.celery worker --concurrency=1 -l INFO &
+# Worker children write their samples here, the exporter on
+# WORKER_METRICS_PORT merges them
+export PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus
+rm -rf $PROMETHEUS_MULTIPROC_DIR && mkdir -p $PROMETHEUS_MULTIPROC_DIR
+
+# One worker per queue, so a burst of scheduled scans never delays
+# interactive tasks. Only the interactive worker runs the metrics exporter,
+# it reports the samples of every worker. The scheduled worker also drains
+# the celery queue, used by every task before the split, until the next
+# release.
+celery -A api.worker.celery worker -Q interactive -n interactive@%h \
+    --concurrency=${CELERY_INTERACTIVE_CONCURRENCY:-1} -l INFO &
+WORKER_METRICS_PORT=0 celery -A api.worker.celery worker -Q scheduled,celery -n scheduled@%h \
+    --concurrency=${CELERY_SCHEDULED_CONCURRENCY:-1} -l INFO &
+WORKER_METRICS_PORT=0 celery -A api.worker.celery worker -Q maintenance -n maintenance@%h \
+    --concurrency=${CELERY_MAINTENANCE_CONCURRENCY:-1} -l INFO &
 
 # Start Celery beat in the foreground
-celery -A api.asgi.celery beat -S redbeat.RedBeatScheduler --max-interval 30 -l INFO
+celery -A api.worker.celery beat -S redbeat.RedBeatScheduler --max-interval 30 -l INFO